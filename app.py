@@ -5,6 +5,7 @@ Detects: Apple Scab, Black Rot, Cedar Apple Rust, Healthy leaves
 """
 
 import streamlit as st
+import streamlit.components.v1 as components
 import cv2
 import numpy as np
 from PIL import Image
@@ -12,10 +13,39 @@ import time
 import tempfile
 import os
 from pathlib import Path
-import json
 from datetime import datetime
-import io
-import base64
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from leafscan import DISEASE_INFO, Detections, get_disease_info, annotate_image
+from leafscan import CameraWorker, MultiCameraWorker, parse_source
+from leafscan.recording import Recorder, is_recording
+from leafscan.alerts import AlertDispatcher, AlertEngine, build_sinks, severe_classes
+from leafscan.encoding import FORMATS, EncodedCache, mime_and_ext, preview
+from leafscan.tta import IMG_SIZES, tta_predict
+from leafscan.severity import severity_from_dets
+from leafscan.survey import SurveyStore, distance_m, exif_location
+from leafscan.history import HistoryBuffer
+from leafscan.thumbs import ThumbStore
+from leafscan.fastpath import FastPath, LeafClassifier, distill, fastpath_path
+from leafscan.resources import ResourcePlan, apply_plan, cpu_count, plan_resources
+from leafscan.procpool import InferencePool
+from leafscan.dedup import DedupIndex, cached_candidates, remember_candidates
+from leafscan.report import DetectionLog, build_report
+from leafscan.config import ConfigWatcher
+from leafscan.stream import StreamServer, viewer_html
+from leafscan.sessions import SessionRegistry
+from leafscan.evaluate import compute_metrics, evaluate, load_cache, weights_hash
+from leafscan.regression import Tolerances, regress, summary as regression_summary
+from leafscan.postprocess import RAW_CONF, RAW_IOU, apply_thresholds
+from leafscan.calibration import Calibrator, fit as fit_calibration
+from leafscan import load_yolo as _load_yolo
+
+_RUN_T0 = time.perf_counter()
 
 # ══════════════════════════════════════════════
 # PAGE CONFIG
@@ -27,91 +57,10 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-# ══════════════════════════════════════════════
-# DISEASE DATABASE
-# ══════════════════════════════════════════════
-DISEASE_INFO = {
-    "apple_scab": {
-        "display": "Apple Scab",
-        "severity": "Moderate",
-        "color": "#8B6914",
-        "bg": "rgba(139,105,20,0.12)",
-        "icon": "🟤",
-        "description": "Caused by the fungus Venturia inaequalis. Appears as olive-green to brown velvety spots on leaves.",
-        "symptoms": ["Olive-green or brown velvety lesions", "Yellowing around infected areas", "Premature leaf drop", "Distorted leaves"],
-        "treatment": ["Apply fungicide (Captan, Mancozeb) at bud break", "Remove and destroy infected leaves", "Prune for better air circulation", "Apply dormant oil spray in early spring"],
-        "prevention": ["Plant resistant varieties", "Avoid overhead irrigation", "Rake and destroy fallen leaves", "Apply lime sulfur before bud break"],
-        "severity_score": 6,
-    },
-    "black_rot": {
-        "display": "Black Rot",
-        "severity": "Severe",
-        "color": "#c0392b",
-        "bg": "rgba(192,57,43,0.12)",
-        "icon": "🔴",
-        "description": "Caused by Botryosphaeria obtusa. Produces circular lesions with purple margins that turn brown-black.",
-        "symptoms": ["Circular lesions with purple margins", "Brown-black center with concentric rings", "Frog-eye appearance", "Cankers on branches"],
-        "treatment": ["Remove and destroy infected plant parts", "Apply copper-based fungicide", "Prune cankers 15cm beyond visible infection", "Bordeaux mixture applications"],
-        "prevention": ["Remove mummified fruits and dead wood", "Maintain tree vigor through fertilization", "Avoid wounding bark", "Proper spacing for air circulation"],
-        "severity_score": 9,
-    },
-    "cedar_apple_rust": {
-        "display": "Cedar Apple Rust",
-        "severity": "High",
-        "color": "#e67e22",
-        "bg": "rgba(230,126,34,0.12)",
-        "icon": "🟠",
-        "description": "Caused by Gymnosporangium juniperi-virginianae. Requires both cedar/juniper and apple as alternate hosts.",
-        "symptoms": ["Bright orange-yellow spots on upper leaf surface", "Tube-like structures on leaf undersides", "Premature defoliation", "Fruit deformation"],
-        "treatment": ["Apply myclobutanil or triadimefon fungicide", "Start treatments at pink bud stage", "Repeat every 7–10 days during wet spring", "Remove nearby juniper/cedar if possible"],
-        "prevention": ["Plant resistant apple varieties", "Remove nearby juniper galls in winter", "Avoid planting apple near cedar trees", "Apply protective fungicides in spring"],
-        "severity_score": 7,
-    },
-    "healthy": {
-        "display": "Healthy Leaf",
-        "severity": "None",
-        "color": "#27ae60",
-        "bg": "rgba(39,174,96,0.12)",
-        "icon": "🟢",
-        "description": "The leaf shows no signs of disease. Continue regular monitoring and preventive care.",
-        "symptoms": ["No visible lesions", "Uniform green color", "Normal leaf structure", "Healthy veination"],
-        "treatment": ["No treatment required", "Maintain regular watering schedule", "Continue balanced fertilization", "Monitor periodically"],
-        "prevention": ["Regular scouting every 7–10 days", "Maintain tree health with proper nutrition", "Ensure good air circulation", "Remove fallen leaves in autumn"],
-        "severity_score": 0,
-    },
-    "unknown": {
-        "display": "Unknown Class",
-        "severity": "—",
-        "color": "#7f8c8d",
-        "bg": "rgba(127,140,141,0.12)",
-        "icon": "⚪",
-        "description": "The model has detected an object with a custom class label from your training data.",
-        "symptoms": ["Refer to your dataset labels"],
-        "treatment": ["Refer to domain-specific guidance"],
-        "prevention": ["Monitor regularly"],
-        "severity_score": 5,
-    },
-}
-
-def get_disease_info(class_name: str) -> dict:
-    """Match detected class name to disease info."""
-    cn = class_name.lower().replace(" ", "_").replace("-", "_")
-    for key in DISEASE_INFO:
-        if key in cn or cn in key:
-            return DISEASE_INFO[key]
-    # Try partial match
-    for key, val in DISEASE_INFO.items():
-        if key.split("_")[0] in cn:
-            return val
-    info = DISEASE_INFO["unknown"].copy()
-    info["display"] = class_name
-    return info
-
-
 # ══════════════════════════════════════════════
 # CSS  –  Botanical Luxury Theme
 # ══════════════════════════════════════════════
-st.markdown("""
+APP_CSS = """
 <style>
 @import url('https://fonts.googleapis.com/css2?family=Cormorant+Garamond:ital,wght@0,400;0,500;0,600;0,700;1,400;1,600&family=DM+Sans:wght@300;400;500&family=DM+Mono:wght@400;500&display=swap');
 
@@ -524,87 +473,438 @@ hr { border-color: var(--border) !important; }
     border-bottom: 1px solid rgba(255,255,255,0.08);
 }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+
+# ══════════════════════════════════════════════
+# CONFIG  (leafscan.yaml + LEAFSCAN_* env, hot-reloaded)
+# ══════════════════════════════════════════════
+@st.cache_resource(show_spinner=False)
+def config_watcher() -> ConfigWatcher:
+    return ConfigWatcher()
+
+
+cfg = config_watcher().get()
 
 
 # ══════════════════════════════════════════════
 # SESSION STATE
 # ══════════════════════════════════════════════
+HISTORY_CAP = cfg.history.cap      # ~31 bytes per entry; thumbnails live on disk
+HISTORY_PAGE = cfg.history.page
+SESSION_IDLE_EVICT_S = 15 * 60
+POOL_TIMEOUT_S = 30            # an upload never waits longer on the worker processes
+MAX_POOLS = 2                  # distinct weights with live worker processes at once
+WEIGHTS_UPLOAD_DIR = Path(tempfile.gettempdir()) / "leafscan-weights"
+RECORDINGS_DIR = Path("recordings")
+
 ss = st.session_state
 for k, v in {
     "mode": "upload",
     "cam_running": False,
     "frame_count": 0,
     "fps": 0.0,
-    "history": [],        # list of {time, disease, conf}
+    "history": HistoryBuffer(HISTORY_CAP),   # ring buffer of compact records
     "last_dets": [],
     "total_frames": 0,
+    "render_ms": {},      # last measured rerun time per page / fragment
+    "cam_worker": None,   # CameraWorker owned by this session
+    "cam_seq": 0,         # last worker frame consumed by the UI
+    "cam_error": None,
+    "cam_gate": (0.0, 0.0),  # leaf-gate skip rate, saved inference ms
+    "cam_logged": {},     # track id → diagnosis already written to history
+    "cam_lock": None,     # leaf frozen by "Lock on leaf"
+    "stream_id": uuid.uuid4().hex,   # this session's key on the frame stream server
+    "upload_result": None,   # last analysed upload (annotated image + dets)
+    "download_ready": None,  # (result id, format, quality) the user asked to encode
+    "survey_done": set(),    # survey upload file_ids already added to the store
+    "eval_report": None,     # last EvalReport
+    "weights_upload": None,  # (upload file_id, content-addressed path) of uploaded weights
+    "regression": None,      # last RegressionReport (golden-set check)
+    "eval_cache": None,      # (cached raw predictions, model names) behind eval_report
+    "calibrator": None,      # (weights key, Calibrator or None)
+    "report": None,          # (span, html, build ms) of the last scouting report
+    "single_ms": {},         # (weights, img_size) → last single-pass latency, for TTA overhead
 }.items():
     if k not in ss:
         ss[k] = v
 
 
+@st.cache_resource(show_spinner=False)
+def session_registry() -> SessionRegistry:
+    """Server-wide map of session id → heavy per-session objects."""
+    return SessionRegistry()
+
+
+def touch_session():
+    """Mark this session active and (re)register what it holds."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    session_registry().touch(ctx.session_id, history=ss["history"],
+                             upload=ss["upload_result"], camera=ss["cam_worker"])
+
+
+# ══════════════════════════════════════════════
+# STATIC HTML  –  built once, reused on every rerun
+# ══════════════════════════════════════════════
+@contextmanager
+def render_timer(key: str):
+    """Record how long a page section / fragment took to render (also a decorator)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ss["render_ms"][key] = (time.perf_counter() - t0) * 1000
+        touch_session()
+
+
+SIDEBAR_BRAND_HTML = """
+<div style='padding:24px 16px 8px;'>
+    <div style='font-family:"Cormorant Garamond",serif;font-size:1.6rem;
+                font-weight:700;color:#c8d8c8;letter-spacing:-0.3px;'>
+        🍃 LeafScan
+    </div>
+    <div style='font-family:"DM Mono",monospace;font-size:0.58rem;
+                color:rgba(140,170,140,0.6);letter-spacing:2px;
+                text-transform:uppercase;margin-top:3px;'>
+        Apple Disease AI
+    </div>
+</div>
+"""
+
+HERO_HTML = """
+<div class="hero-wrap">
+    <div class="hero-leaf-bg">🍃</div>
+    <div class="hero-tag">🍎 Apple leaf Orchard Intelligence</div>
+    <h1 class="hero-title">Apple Leaf<br><em>Disease Detection</em></h1>
+    <p class="hero-sub">
+        AI-powered plant pathology using YOLO26. Detect Scab, Black Rot, 
+        Cedar Apple Rust and more — in real-time or from images.
+    </p>
+    <div class="hero-stats">
+        <div>
+            <div class="hero-stat-val">4</div>
+            <div class="hero-stat-label">Disease Classes</div>
+        </div>
+        <div>
+            <div class="hero-stat-val">YOLO26</div>
+            <div class="hero-stat-label">Model Backbone</div>
+        </div>
+        <div>
+            <div class="hero-stat-val">Real-time</div>
+            <div class="hero-stat-label">Inference Mode</div>
+        </div>
+    </div>
+</div>
+"""
+
+
+@st.cache_data(show_spinner=False)
+def legend_html() -> str:
+    """Sidebar disease legend as a single HTML block."""
+    rows = "".join(f"""
+    <div style='display:flex;align-items:center;gap:8px;padding:5px 0;
+                border-bottom:1px solid rgba(255,255,255,0.05);'>
+        <span>{info["icon"]}</span>
+        <span style='font-size:0.75rem;color:#c8d8c8;'>{info["display"]}</span>
+        <span style='margin-left:auto;font-family:"DM Mono",monospace;font-size:0.6rem;
+                     color:rgba(140,170,140,0.5);'>
+            sev {info["severity_score"]}/10
+        </span>
+    </div>""" for info in list(DISEASE_INFO.values())[:-1])  # exclude "unknown"
+    return f"""
+    <div style='font-family:"DM Mono",monospace;font-size:0.58rem;text-transform:uppercase;
+                letter-spacing:2px;color:rgba(140,170,140,0.6);margin-bottom:10px;'>
+        Disease Classes
+    </div>{rows}"""
+
+
 # ══════════════════════════════════════════════
 # MODEL LOADER
 # ══════════════════════════════════════════════
 @st.cache_resource(show_spinner=False)
+def _load_model(path: str, mtime: float, device: str):
+    model, err = _load_yolo(path)
+    if model is not None and device:
+        try:
+            model.to(device)
+        except Exception as e:
+            return None, f"device {device!r}: {e}"
+    return model, err
+
+
 def load_yolo(path: str):
+    """Cached per (weights, mtime, device): config reloads never reload the model."""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+    return _load_model(path, mtime, cfg.detection.device)
+
+
+def stored_weights(upload) -> str:
+    """Uploaded weights at a content-addressed path, written once per distinct file."""
+    cached = ss["weights_upload"]
+    if cached and cached[0] == upload.file_id and Path(cached[1]).exists():
+        return cached[1]
+    data = upload.getvalue()
+    path = WEIGHTS_UPLOAD_DIR / f"{hashlib.sha1(data).hexdigest()[:16]}.pt"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    ss["weights_upload"] = (upload.file_id, str(path))
+    return str(path)
+
+
+@st.cache_data(show_spinner=False)
+def weights_key(path: str, mtime: float) -> str:
+    """Content hash of a weights file (recomputed only when it changes)."""
+    return weights_hash(path)
+
+
+def active_calibrator():
+    """Calibrator fitted for the current weights' raw detector scores, if enabled and available."""
+    if not use_calibration or not Path(model_path).exists():
+        return None
+    key = weights_key(model_path, os.path.getmtime(model_path))
+    cached = ss["calibrator"]
+    if cached is None or cached[0] != key:
+        cached = ss["calibrator"] = (key, Calibrator.load(key))
+    return cached[1]
+
+
+@st.cache_resource(show_spinner=False)
+def _encoded_cache(max_mb: int) -> EncodedCache:
+    return EncodedCache(max_bytes=max_mb * 2**20)
+
+
+def encoded_cache() -> EncodedCache:
+    """Server-wide cache of encoded download bytes."""
+    return _encoded_cache(cfg.perf.encoded_cache_mb)
+
+
+@st.cache_resource(show_spinner=False)
+def _fast_path(path: str, mtime: float):
+    clf = LeafClassifier.load(path)
+    return FastPath(clf) if clf is not None else None
+
+
+def fast_path():
+    """Two-tier engine for the current weights, or None until one is distilled."""
+    p = fastpath_path(model_path)
+    return _fast_path(str(p), os.path.getmtime(p)) if p.exists() else None
+
+
+@st.cache_resource(show_spinner=False)
+def detection_log() -> DetectionLog:
+    """Server-wide day-partitioned log behind the scouting reports."""
+    return DetectionLog("detections")
+
+
+def record_detection(disease: str, conf: float, source: str, leaf_pct=None, image_pct=None,
+                     thumb: int = 0):
+    """Session history entry + the same detection in the server-wide log."""
+    ss["history"].append(disease, conf, source, leaf_pct=leaf_pct, image_pct=image_pct,
+                         thumb=thumb)
+    detection_log().append(disease, conf, source, scout_block.strip(), leaf_pct, thumb)
+
+
+@st.cache_resource(show_spinner=False)
+def _dedup_index(namespace: str) -> DedupIndex:
+    return DedupIndex()
+
+
+def dedup_index(namespace: str):
+    """Server-wide near-duplicate index per namespace, or None when disabled."""
+    if not dedup_on:
+        return None
+    return _dedup_index(namespace)
+
+
+def upload_dedup():
+    """Upload index; cached candidates are only valid for these weights and image size."""
+    mtime = os.path.getmtime(model_path) if os.path.exists(model_path) else 0.0
+    return dedup_index(f"upload:{model_path}:{mtime}:{img_size}")
+
+
+@st.cache_resource(show_spinner=False)
+def _pool_holder() -> dict:
+    return {"lock": threading.Lock(), "pools": OrderedDict(), "errors": {}}
+
+
+def inference_pool():
+    """Server-wide worker-process pool for the current weights; None when ``perf.procs`` is 0."""
+    if cfg.perf.procs <= 0 or not Path(model_path).exists():
+        return None
+    # Keyed on content: the same weights under another path share one pool
+    key = (weights_key(model_path, os.path.getmtime(model_path)), cfg.detection.device,
+           cfg.perf.procs)
+    holder = _pool_holder()
+    pools, errors = holder["pools"], holder["errors"]
+    with holder["lock"]:
+        if key not in pools and key not in errors:
+            # Least recently used pools go before the new processes load
+            while len(pools) >= MAX_POOLS:
+                pools.popitem(last=False)[1].close()
+            with st.spinner(f"Starting {cfg.perf.procs} inference processes…"):
+                try:
+                    pools[key] = InferencePool(
+                        model_path, cfg.perf.procs, device=cfg.detection.device,
+                        plan=plan_resources(workers=cfg.perf.procs, pin=cfg.perf.pin))
+                except Exception as e:
+                    errors[key] = str(e) or repr(e)
+        pool = pools.get(key)
+        if pool is not None and pool.error:
+            # Every worker died and could not be restarted: drop the pool for good
+            pools.pop(key).close()
+            errors[key] = pool.error
+            pool = None
+        if pool is not None:
+            pools.move_to_end(key)
+        else:
+            st.warning(f"Inference processes unavailable, predicting in-process — {errors[key]}")
+        return pool
+
+
+@st.cache_resource(show_spinner=False)
+def apply_resources(torch_threads: int, interop_threads: int, cv2_threads: int) -> dict:
+    """Process-wide thread settings; re-applied only when they change."""
+    return apply_plan(ResourcePlan(torch_threads, interop_threads, cv2_threads))
+
+
+@st.cache_resource(show_spinner=False)
+def _thumb_store(max_mb: int) -> ThumbStore:
+    return ThumbStore("history_thumbs", max_bytes=max_mb * 2**20)
+
+
+def thumb_store() -> ThumbStore:
+    """Server-wide on-disk thumbnails referenced by history entries."""
+    return _thumb_store(cfg.perf.thumb_cache_mb)
+
+
+@st.cache_resource(show_spinner=False)
+def _alert_engine(file_path: str, webhook_url: str, mqtt_host: str):
+    """One dispatcher thread per sink configuration, shared by all sessions."""
+    return AlertEngine(AlertDispatcher(build_sinks(file_path, webhook_url, mqtt_host)))
+
+
+def alert_engine():
+    """Engine for the sidebar settings, or None when alerts are off / misconfigured."""
+    if not alerts_on:
+        return None
     try:
-        from ultralytics import YOLO
-        m = YOLO(path)
-        return m, None
-    except ImportError:
-        return None, "ultralytics not installed → pip install ultralytics"
+        engine = _alert_engine(alert_file.strip(), alert_webhook.strip(), alert_mqtt.strip())
     except Exception as e:
-        return None, str(e)
+        st.sidebar.warning(f"Alerts disabled — {e}")
+        return None
+    engine.configure(classes=alert_classes, min_conf=alert_conf, debounce_s=float(alert_debounce))
+    return engine
 
 
 # ══════════════════════════════════════════════
 # SIDEBAR
 # ══════════════════════════════════════════════
 with st.sidebar:
-    st.markdown("""
-    <div style='padding:24px 16px 8px;'>
-        <div style='font-family:"Cormorant Garamond",serif;font-size:1.6rem;
-                    font-weight:700;color:#c8d8c8;letter-spacing:-0.3px;'>
-            🍃 LeafScan
-        </div>
-        <div style='font-family:"DM Mono",monospace;font-size:0.58rem;
-                    color:rgba(140,170,140,0.6);letter-spacing:2px;
-                    text-transform:uppercase;margin-top:3px;'>
-            Apple Disease AI
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(SIDEBAR_BRAND_HTML, unsafe_allow_html=True)
 
     st.markdown('<div class="sidebar-label">Model Weights</div>', unsafe_allow_html=True)
     model_path = st.text_input(
-        "model_path", value="best.pt",
+        "model_path", value=cfg.detection.weights,
         label_visibility="collapsed",
         placeholder="best.pt",
         help="Path to YOLO26s.pt weights",
     )
     uploaded_w = st.file_uploader("Upload .pt", type=["pt"], label_visibility="collapsed")
     if uploaded_w:
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pt")
-        tmp.write(uploaded_w.read())
-        tmp.close()
-        model_path = tmp.name
+        model_path = stored_weights(uploaded_w)
 
     st.markdown('<div class="sidebar-label">Detection Settings</div>', unsafe_allow_html=True)
-    conf_thresh = st.slider("Confidence threshold", 0.10, 0.95, 0.40, 0.01, format="%.2f")
-    iou_thresh  = st.slider("IoU (NMS)", 0.10, 0.90, 0.50, 0.01, format="%.2f")
-    img_size    = st.select_slider("Image size", [320, 416, 512, 640, 768, 1024], value=640)
+    conf_thresh = st.slider("Confidence threshold", 0.10, 0.95, cfg.detection.conf, 0.01, format="%.2f")
+    iou_thresh  = st.slider("IoU (NMS)", 0.10, 0.90, cfg.detection.iou, 0.01, format="%.2f")
+    use_calibration = st.checkbox("Calibrated confidence", True,
+                                  help="Use the calibration fitted in the Evaluate tab for these weights")
+    img_size    = st.select_slider("Image size", IMG_SIZES, value=cfg.detection.img_size)
+
+    st.markdown('<div class="sidebar-label">Upload Accuracy</div>', unsafe_allow_html=True)
+    tta_mode = st.checkbox("Test-time augmentation", False,
+                           help="Flips + neighbouring image sizes in one batch, fused with WBF")
+    ensemble_w = st.text_input("Ensemble weights", placeholder="extra1.pt, extra2.pt",
+                               label_visibility="collapsed",
+                               help="Extra .pt files fused with the main weights on uploads")
+    ensemble_paths = [p.strip() for p in ensemble_w.split(",") if p.strip()]
+    fast_path_on = st.checkbox("Fast path for close-ups", False,
+                               help="Distilled leaf classifier answers confident single-leaf "
+                                    "uploads; distil it in the Evaluate tab")
+    dedup_on = st.checkbox("Skip near-duplicates", True,
+                           help="Repeat shots reuse earlier detections (uploads) or are "
+                                "skipped (survey) instead of running the model again")
+    dedup_dist = st.slider("Near-duplicate distance (bits)", 0, 7, 6, disabled=not dedup_on,
+                           help="Max pHash Hamming distance · 0 = exact repeats only")
+
+    st.markdown('<div class="sidebar-label">Scouting</div>', unsafe_allow_html=True)
+    scout_block = st.text_input("Orchard block", "", placeholder="Orchard block, e.g. B3",
+                                label_visibility="collapsed",
+                                help="Tags recorded detections for the per-block scouting report")
 
     st.markdown('<div class="sidebar-label">Camera</div>', unsafe_allow_html=True)
-    cam_idx  = st.selectbox("Camera index", [0, 1, 2, 3], label_visibility="collapsed")
-    max_fps  = st.slider("Target FPS", 5, 30, 15)
+    cam_idx  = st.selectbox("Camera index", [0, 1, 2, 3], index=cfg.camera.index,
+                            label_visibility="collapsed")
+    multi_cam = st.checkbox("Multi-camera", False,
+                            help="Capture several sources and run one batched predict per tick")
+    cam_sources = [cam_idx]
+    if multi_cam:
+        cam_sources = st.multiselect("Sources", [0, 1, 2, 3], default=[cam_idx],
+                                     label_visibility="collapsed")
+        video_srcs = st.text_input("Video files", placeholder="row1.mp4, row2.mp4",
+                                   label_visibility="collapsed",
+                                   help="Comma-separated video files used as stand-in cameras")
+        cam_sources = cam_sources + [parse_source(v) for v in video_srcs.split(",") if v.strip()]
+    max_fps  = st.slider("Target FPS", 5, 30, cfg.camera.max_fps)
+    stream_view = st.checkbox("Direct frame stream", False,
+                              help=f"Serve frames over HTTP on port {cfg.camera.stream_port} "
+                                   "instead of re-sending images through Streamlit")
+    replays = sorted((p.name for p in RECORDINGS_DIR.glob("*") if is_recording(p)), reverse=True)
+    replay_name = st.selectbox("Replay recording", ["— live camera —"] + replays,
+                               disabled=multi_cam,
+                               help="Feed a recorded session through the pipeline, unthrottled")
+    replay_src = str(RECORDINGS_DIR / replay_name) if replay_name in replays else None
+    min_leaf_pct = st.slider("Leaf gate (min foliage %)", 0, 30, 3,
+                             help="Frames with less foliage skip inference · 0 disables")
+    crop_leaves = st.checkbox("Crop to leaves", False,
+                              help="Run the detector on the padded foliage region only")
+    smooth_frames = st.slider("Diagnosis smoothing (frames)", 0, 60, 15,
+                              help="Per-leaf moving average of class scores · 0 shows raw "
+                                   "per-frame labels")
+    roi_x = st.slider("ROI horizontal %", 0, 100, (0, 100))
+    roi_y = st.slider("ROI vertical %", 0, 100, (0, 100))
+    record_cam = st.checkbox("Record session", False, disabled=multi_cam or replay_src is not None,
+                             help=f"Save raw frames + detections under {RECORDINGS_DIR}/ for replay")
+
+    st.markdown('<div class="sidebar-label">Alerts</div>', unsafe_allow_html=True)
+    alerts_on = st.checkbox("High-severity alerts", False,
+                            help="Debounced per-track alerts, delivered in the background")
+    with st.expander("Alert settings", expanded=False):
+        alert_classes = st.multiselect(
+            "Classes", [v["display"] for k, v in DISEASE_INFO.items() if k != "unknown"],
+            default=severe_classes())
+        alert_conf = st.slider("Min confidence", 0.30, 0.95, 0.60, 0.05, key="alert_conf")
+        alert_debounce = st.number_input("Debounce per track (s)", 1, 3600, 30)
+        alert_file = st.text_input("Event file (JSONL)", "alerts/events.jsonl")
+        alert_webhook = st.text_input("Webhook URL", placeholder="http://localhost:8000/alerts")
+        alert_mqtt = st.text_input("MQTT broker host", placeholder="localhost")
+    if alerts_on and (engine := alert_engine()) is not None:
+        a = engine.dispatcher.stats
+        st.caption(f"{a['delivered']} delivered · {engine.dispatcher.pending()} queued · "
+                   f"{a['retries']} retries · {a['dropped']} dropped · {a['failed']} failed")
 
     st.markdown('<div class="sidebar-label">Display</div>', unsafe_allow_html=True)
-    show_conf   = st.checkbox("Show confidence", True)
-    show_labels = st.checkbox("Show labels", True)
+    show_conf   = st.checkbox("Show confidence", cfg.display.show_conf)
+    show_labels = st.checkbox("Show labels", cfg.display.show_labels)
+    color_names = ["Forest Green", "Gold", "White", "Red"]
     box_color_name = st.selectbox(
-        "Box color", ["Forest Green", "Gold", "White", "Red"],
+        "Box color", color_names,
+        index=color_names.index(cfg.display.box_color) if cfg.display.box_color in color_names else 0,
         label_visibility="collapsed"
     )
     box_colors = {"Forest Green": (45,106,79), "Gold": (80,168,201), "White": (240,237,230), "Red": (46,64,210)}
@@ -612,76 +912,73 @@ with st.sidebar:
 
     st.markdown("---")
     # Disease legend
-    st.markdown("""
-    <div style='font-family:"DM Mono",monospace;font-size:0.58rem;text-transform:uppercase;
-                letter-spacing:2px;color:rgba(140,170,140,0.6);margin-bottom:10px;'>
-        Disease Classes
-    </div>""", unsafe_allow_html=True)
-    for key, info in list(DISEASE_INFO.items())[:-1]:  # exclude "unknown"
-        st.markdown(f"""
-        <div style='display:flex;align-items:center;gap:8px;padding:5px 0;
-                    border-bottom:1px solid rgba(255,255,255,0.05);'>
-            <span>{info["icon"]}</span>
-            <span style='font-size:0.75rem;color:#c8d8c8;'>{info["display"]}</span>
-            <span style='margin-left:auto;font-family:"DM Mono",monospace;font-size:0.6rem;
-                         color:rgba(140,170,140,0.5);'>
-                sev {info["severity_score"]}/10
-            </span>
-        </div>""", unsafe_allow_html=True)
+    st.markdown(legend_html(), unsafe_allow_html=True)
+
+    # Rerun cost of the previous run (page = full script, others = fragments)
+    if ss["render_ms"]:
+        st.caption("  ·  ".join(f"{k} {v:.0f} ms" for k, v in ss["render_ms"].items()))
+
+    watcher = config_watcher()
+    st.caption(f"Config v{watcher.version} · `{watcher.path}`"
+               + ("" if watcher.path.exists() else " (not found — defaults + env)"))
+    if watcher.error:
+        st.warning(f"Config not reloaded — {watcher.error}")
+
+    with st.expander("CPU resources"):
+        res_workers = st.number_input("Inference slots", 1, cpu_count(),
+                                      min(max(1, cfg.perf.workers), cpu_count()),
+                                      help="Concurrent camera workers the cores are split between")
+        res_plan = plan_resources(workers=int(res_workers),
+                                  pin=st.checkbox("Pin threads to cores", cfg.perf.pin))
+        res_plan.interop_threads = cfg.perf.interop_threads
+        res_plan.torch_threads = st.number_input(
+            "Torch threads / slot", 1, cpu_count(),
+            min(cfg.perf.torch_threads or res_plan.torch_threads, cpu_count()))
+        res_plan.cv2_threads = st.number_input(
+            "OpenCV threads", 0, cpu_count(),
+            min(res_plan.cv2_threads if cfg.perf.cv2_threads < 0 else cfg.perf.cv2_threads,
+                cpu_count()))
+        effective = apply_resources(res_plan.torch_threads, res_plan.interop_threads,
+                                    res_plan.cv2_threads)
+        st.caption(f"{effective['cores']} cores · torch {effective['torch_threads']} · "
+                   f"interop {effective['interop_threads']} · OpenCV {effective['cv2_threads']} · "
+                   f"prep cores {res_plan.prep_cores or '—'}  (process-wide, last change wins)")
+        for note in effective["notes"]:
+            st.caption(f"⚠ {note}")
+        for pool in list(_pool_holder()["pools"].values()):
+            ps = pool.stats()
+            st.caption(f"Inference processes {ps['alive']}/{ps['workers']} · "
+                       f"{ps['completed']} jobs · {ps['in_flight']} in flight · "
+                       f"busy ms {ps['busy_ms']}")
+
+    with st.expander("Server memory"):
+        usage = session_registry().usage()
+        st.caption(f"{len(usage)} sessions · {sum(u['bytes'] for u in usage) / 2**20:.1f} MB "
+                   f"· idle sessions released after {SESSION_IDLE_EVICT_S // 60} min")
+        st.dataframe(usage, hide_index=True, use_container_width=True)
 
 
 # ══════════════════════════════════════════════
 # HERO
 # ══════════════════════════════════════════════
-st.markdown("""
-<div class="hero-wrap">
-    <div class="hero-leaf-bg">🍃</div>
-    <div class="hero-tag">🍎 Apple leaf Orchard Intelligence</div>
-    <h1 class="hero-title">Apple Leaf<br><em>Disease Detection</em></h1>
-    <p class="hero-sub">
-        AI-powered plant pathology using YOLO26. Detect Scab, Black Rot, 
-        Cedar Apple Rust and more — in real-time or from images.
-    </p>
-    <div class="hero-stats">
-        <div>
-            <div class="hero-stat-val">4</div>
-            <div class="hero-stat-label">Disease Classes</div>
-        </div>
-        <div>
-            <div class="hero-stat-val">YOLO26</div>
-            <div class="hero-stat-label">Model Backbone</div>
-        </div>
-        <div>
-            <div class="hero-stat-val">Real-time</div>
-            <div class="hero-stat-label">Inference Mode</div>
-        </div>
-    </div>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(HERO_HTML, unsafe_allow_html=True)
 
 
 # ══════════════════════════════════════════════
 # MODE SELECTION
 # ══════════════════════════════════════════════
-tab_upload, tab_camera, tab_history = st.tabs(["📷  Image Upload", "🎥  Live Camera", "📋  History"])
+tab_upload, tab_camera, tab_history, tab_survey, tab_eval = st.tabs(
+    ["📷  Image Upload", "🎥  Live Camera", "📋  History", "🗺  Survey", "📐  Evaluate"])
 
 
 # ══════════════════════════════════════════════
 # HELPER: RENDER DETECTION RESULTS
 # ══════════════════════════════════════════════
-def render_single_result(name: str, conf: float):
+@st.cache_data(show_spinner=False)
+def _result_card_parts(name: str) -> tuple:
+    """Static parts of a result card; confidence meter and severity bar go in between."""
     info = get_disease_info(name)
-    sev_pct = info["severity_score"] * 10
-
-    # Color logic for confidence
-    if conf >= 0.75:
-        conf_color = "#27ae60"
-    elif conf >= 0.50:
-        conf_color = "#f39c12"
-    else:
-        conf_color = "#e74c3c"
-
-    st.markdown(f"""
+    head = f"""
     <div class="result-card" style="border-left:4px solid {info['color']};">
         <div class="result-card-header" style="background:{info['bg']};">
             <span style="font-size:1.8rem;">{info['icon']}</span>
@@ -691,99 +988,318 @@ def render_single_result(name: str, conf: float):
                       color:{info['color']};border:1px solid {info['color']}40;">
                     Severity: {info['severity']}
                 </span>
-            </div>
-            <div class="conf-meter" style="margin-left:auto;min-width:120px;">
-                <div class="conf-val" style="color:{conf_color};">{conf*100:.1f}%</div>
-                <div class="conf-label">Confidence</div>
-            </div>
+            </div>"""
+    tail = f"""
         </div>
         <div class="result-card-body">
             <p style="color:var(--text2);font-size:0.88rem;line-height:1.7;margin-bottom:16px;">
                 {info['description']}
             </p>
-            <div style="margin-bottom:6px;">
+            <div style="margin-bottom:6px;">"""
+    end = """
+            </div>
+        </div>
+    </div>
+    """
+    return head, tail, end
+
+
+@st.cache_data(show_spinner=False)
+def _info_sections_html(name: str) -> tuple:
+    """Symptoms / treatment / prevention blocks, one HTML string per column."""
+    info = get_disease_info(name)
+    sections = []
+    for title, key in (("🔍 Symptoms", "symptoms"),
+                       ("💊 Treatment", "treatment"),
+                       ("🛡 Prevention", "prevention")):
+        items = "".join(f'<div class="info-item">{x}</div>' for x in info[key])
+        sections.append(f'<div class="info-section">'
+                        f'<div class="info-section-title">{title}</div>{items}</div>')
+    return tuple(sections)
+
+
+def render_single_result(name: str, conf: float, severity_pct: float = None):
+    """``severity_pct`` is the measured diseased leaf area; without it the
+    static ``severity_score`` from DISEASE_INFO is shown."""
+    info = get_disease_info(name)
+    head, tail, end = _result_card_parts(name)
+    if severity_pct is None:
+        sev_title, sev_pct = "Severity Score", info["severity_score"] * 10
+    else:
+        sev_title, sev_pct = f"Diseased Leaf Area · {severity_pct:.1f}%", min(severity_pct, 100)
+
+    # Color logic for confidence
+    if conf >= 0.75:
+        conf_color = "#27ae60"
+    elif conf >= 0.50:
+        conf_color = "#f39c12"
+    else:
+        conf_color = "#e74c3c"
+
+    st.markdown(f"""{head}
+            <div class="conf-meter" style="margin-left:auto;min-width:120px;">
+                <div class="conf-val" style="color:{conf_color};">{conf*100:.1f}%</div>
+                <div class="conf-label">Confidence</div>
+            </div>{tail}
                 <div style="font-family:'DM Mono',monospace;font-size:0.6rem;
                             text-transform:uppercase;letter-spacing:2px;color:var(--muted);
-                            margin-bottom:4px;">Severity Score</div>
+                            margin-bottom:4px;">{sev_title}</div>
                 <div class="sev-bar-wrap">
                     <div class="sev-bar-fill"
                          style="width:{sev_pct}%;background:{info['color']};"></div>
-                </div>
-            </div>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+                </div>{end}""", unsafe_allow_html=True)
 
     # 3 columns: symptoms / treatment / prevention
-    c1, c2, c3 = st.columns(3)
-    with c1:
-        st.markdown('<div class="info-section">', unsafe_allow_html=True)
-        st.markdown('<div class="info-section-title">🔍 Symptoms</div>', unsafe_allow_html=True)
-        for s in info["symptoms"]:
-            st.markdown(f'<div class="info-item">{s}</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    with c2:
-        st.markdown('<div class="info-section">', unsafe_allow_html=True)
-        st.markdown('<div class="info-section-title">💊 Treatment</div>', unsafe_allow_html=True)
-        for t in info["treatment"]:
-            st.markdown(f'<div class="info-item">{t}</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    with c3:
-        st.markdown('<div class="info-section">', unsafe_allow_html=True)
-        st.markdown('<div class="info-section-title">🛡 Prevention</div>', unsafe_allow_html=True)
-        for p in info["prevention"]:
-            st.markdown(f'<div class="info-item">{p}</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-
-def annotate_image(image_bgr, results, model, show_lbl=True, show_cf=True, bcolor=(45,106,79), thick=2):
-    """Draw YOLO bounding boxes on image."""
-    out = image_bgr.copy()
-    r = results[0]
-    if r.boxes is None:
-        return out, []
-    dets = []
-    for box in r.boxes:
-        cls_id = int(box.cls[0])
-        conf   = float(box.conf[0])
-        name   = model.names.get(cls_id, str(cls_id))
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        info   = get_disease_info(name)
-
-        # Box
-        cv2.rectangle(out, (x1,y1), (x2,y2), bcolor, thick)
-
-        # Corner accents
-        L = 15
-        cv2.line(out, (x1,y1), (x1+L, y1), bcolor, thick+1)
-        cv2.line(out, (x1,y1), (x1, y1+L), bcolor, thick+1)
-        cv2.line(out, (x2,y1), (x2-L, y1), bcolor, thick+1)
-        cv2.line(out, (x2,y1), (x2, y1+L), bcolor, thick+1)
-        cv2.line(out, (x1,y2), (x1+L, y2), bcolor, thick+1)
-        cv2.line(out, (x1,y2), (x1, y2-L), bcolor, thick+1)
-        cv2.line(out, (x2,y2), (x2-L, y2), bcolor, thick+1)
-        cv2.line(out, (x2,y2), (x2, y2-L), bcolor, thick+1)
-
-        # Label
-        if show_lbl or show_cf:
-            label = ""
-            if show_lbl: label += info["display"]
-            if show_cf:  label += f"  {conf:.2f}"
-            lw, lh = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.55, 1)[0]
-            cv2.rectangle(out, (x1, y1-lh-10), (x1+lw+10, y1), bcolor, -1)
-            cv2.putText(out, label, (x1+5, y1-5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.55,
-                        (240,237,230), 1, cv2.LINE_AA)
-
-        dets.append({"name": name, "conf": conf, "display": info["display"],
-                     "icon": info["icon"], "color": info["color"],
-                     "bg": info["bg"], "severity": info["severity"]})
-    return out, dets
+    for col, html in zip(st.columns(3), _info_sections_html(name)):
+        col.markdown(html, unsafe_allow_html=True)
 
 
 # ══════════════════════════════════════════════
 # TAB 1 — IMAGE UPLOAD
 # ══════════════════════════════════════════════
+def analyse_upload(file_id: str, img_bgr):
+    """Run inference on an uploaded image; the result is kept in session state."""
+    if not Path(model_path).exists():
+        st.error(f"Model not found: `{model_path}`")
+        return
+    with st.spinner("Running inference…"):
+        model, err = load_yolo(model_path)
+        if err:
+            st.error(f"Model error: {err}")
+            return
+        # Candidates at a low floor / loose NMS; sliders re-threshold them later
+        single_key = (model_path, img_size)
+        tta_stats = None
+        fast = None
+        from_fast = False       # scores are fast-path softmax, not detector confidences
+        dup = None
+        dedup = upload_dedup() if not (tta_mode or ensemble_paths) else None
+        if dedup is not None:
+            # Near-duplicate of an earlier upload → its cached candidates, no inference
+            t0 = time.time()
+            img_hash, hit = cached_candidates(dedup, img_bgr, dedup_dist)
+            if hit is not None:
+                dup, raw, from_fast = hit
+                elapsed = (time.time() - t0) * 1000
+        fp = fast_path() if fast_path_on and dup is None and not (tta_mode or ensemble_paths) else None
+        if fp is not None:
+            # Confident single-leaf close-up → classifier answer, no detector
+            t0 = time.time()
+            fast = fp(img_bgr)
+            if fast is not None:
+                raw, elapsed = fast, (time.time() - t0) * 1000
+                from_fast = True
+        if dup is None and fast is None and (not (tta_mode or ensemble_paths)
+                                             or single_key not in ss["single_ms"]):
+            pool = inference_pool()
+            t0 = time.time()
+            raw = None
+            if pool is not None:
+                try:
+                    raw = pool.submit(img_bgr, RAW_CONF, RAW_IOU, img_size).result(POOL_TIMEOUT_S)
+                except (RuntimeError, TimeoutError) as e:
+                    st.warning(f"Inference process failed, predicting in-process — {e}")
+            if raw is None:
+                results = model.predict(
+                    img_bgr,
+                    conf=RAW_CONF,
+                    iou=RAW_IOU,
+                    imgsz=img_size,
+                    verbose=False,
+                )
+                raw = Detections.from_result(results[0])
+            elapsed = (time.time() - t0) * 1000
+            ss["single_ms"][single_key] = elapsed
+        if dedup is not None and dup is None:
+            remember_candidates(dedup, img_hash, img_bgr, raw, from_fast)
+
+        if tta_mode or ensemble_paths:
+            models = [model]
+            for p in ensemble_paths:
+                m, err = load_yolo(p) if Path(p).exists() else (None, f"not found: `{p}`")
+                if err:
+                    st.warning(f"Ensemble weights skipped — {err}")
+                else:
+                    models.append(m)
+            raw, tta_stats = tta_predict(
+                models, img_bgr, RAW_CONF, iou_thresh, img_size,
+                flips=tta_mode, multiscale=tta_mode,
+            )
+            elapsed = tta_stats["ms"]
+            tta_stats["overhead"] = elapsed / max(ss["single_ms"][single_key], 1e-3)
+
+        prev = ss["upload_result"]
+        if prev:
+            encoded_cache().discard(prev["id"])
+        res = {
+            "file_id": file_id,
+            "image_bgr": img_bgr,
+            "raw": raw,
+            "elapsed": elapsed,
+            "tta": tta_stats,
+            "fast": from_fast,
+            "dup": dup,
+            "stamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        }
+        derive_upload(res, model)
+        ss["upload_result"] = res
+        dets, severity = res["dets"], res["severity"]
+        ss["last_dets"] = dets
+        if dup is not None:
+            return      # same leaf as an earlier upload: already alerted and in history
+
+        engine = alert_engine()
+        if engine is not None:
+            engine.observe(dets, "upload", img_bgr.shape)
+
+        # Save to history
+        for i, d in enumerate(dets):
+            record_detection(d["display"], d["conf"], "upload",
+                             leaf_pct=severity.det_pct(i), image_pct=severity.image_pct,
+                             thumb=thumb_store().put(img_bgr, d["box"]))
+
+
+def result_calibrator(res: dict):
+    """
+    The calibrator, unless ``res`` scores are not single-model detector scores:
+    fast-path softmax probabilities and WBF-fused TTA / ensemble scores are
+    not what it was fitted on.
+    """
+    return None if res["fast"] or res["tta"] else active_calibrator()
+
+
+def upload_view_key(res: dict) -> tuple:
+    """Everything that changes the derived result without re-running the model."""
+    calib = result_calibrator(res)
+    return (conf_thresh, iou_thresh, show_labels, show_conf, BOX_COLOR,
+            None if calib is None else (calib.a, calib.b))
+
+
+def derive_upload(res: dict, model):
+    """Threshold + NMS over the cached candidates, then annotate and measure."""
+    t0 = time.perf_counter()
+    final = apply_thresholds(res["raw"], conf_thresh, iou_thresh, result_calibrator(res))
+    annotated_bgr, dets = annotate_image(
+        res["image_bgr"], final, model,
+        show_labels, show_conf, BOX_COLOR
+    )
+    if res.get("id"):
+        encoded_cache().discard(res["id"])
+    res.update(
+        id=uuid.uuid4().hex,
+        view_key=upload_view_key(res),
+        annotated_bgr=annotated_bgr,
+        preview_rgb=cv2.cvtColor(preview(annotated_bgr), cv2.COLOR_BGR2RGB),
+        dets=dets,
+        severity=severity_from_dets(res["image_bgr"], dets),
+        rethreshold_ms=(time.perf_counter() - t0) * 1000,
+    )
+
+
+def render_upload_result(res: dict):
+    dets, elapsed, sev = res["dets"], res["elapsed"], res["severity"]
+    st.markdown("""
+    <div style='font-family:"Cormorant Garamond",serif;font-size:1.5rem;
+                font-weight:600;color:var(--forest);margin-bottom:14px;'>
+        Analysis Results
+    </div>""", unsafe_allow_html=True)
+
+    # Metrics chips
+    st.markdown(f"""
+    <div class="chip-row" style="grid-template-columns:repeat(4,1fr);">
+        <div class="chip">
+            <div class="chip-val">{len(dets)}</div>
+            <div class="chip-lbl">Detections</div>
+        </div>
+        <div class="chip">
+            <div class="chip-val">{elapsed:.0f}ms</div>
+            <div class="chip-lbl">Inference Time</div>
+        </div>
+        <div class="chip">
+            <div class="chip-val">{max((d["conf"] for d in dets), default=0)*100:.0f}%</div>
+            <div class="chip-lbl">Top Confidence</div>
+        </div>
+        <div class="chip">
+            <div class="chip-val">{sev.image_pct:.1f}%</div>
+            <div class="chip-lbl">Diseased Area · {len(sev.leaves)} leaves</div>
+        </div>
+    </div>""", unsafe_allow_html=True)
+
+    if sev.leaves:
+        with st.expander(f"Per-leaf severity ({sev.ms:.0f} ms)"):
+            st.dataframe(
+                [{"leaf": k + 1, "area (px)": l.area_px, "diseased %": round(l.lesion_pct, 1)}
+                 for k, l in enumerate(sev.leaves)],
+                hide_index=True, use_container_width=True,
+            )
+
+    calib = result_calibrator(res)
+    st.caption(f"Re-threshold from cached candidates: {res['rethreshold_ms']:.1f} ms"
+               + (f" · confidences calibrated ({calib.method})" if calib else ""))
+
+    if res.get("dup") is not None:
+        msg = (f"Near-duplicate of an earlier upload ({res['dup']} bits) — cached detections "
+               "reused, not added to history")
+        dedup = upload_dedup()
+        if dedup is not None:
+            msg += f" · {dedup.ratio:.0%} of {dedup.lookups} uploads were duplicates"
+        st.caption(msg)
+
+    fp = fast_path() if fast_path_on else None
+    if fp is not None:
+        st.caption(("Served by the fast-path classifier" if res["fast"]
+                    else "Detector (fast path declined)")
+                   + f" · {fp.served_frac:.0%} of {fp.total} uploads on the fast path · "
+                   f"held-out accuracy Δ {fp.clf.report.get('acc_delta_vs_teacher', 0):+.1%}")
+
+    tta = res["tta"]
+    if tta:
+        st.caption(f"TTA/ensemble: {tta['views']} views × {tta['models']} model(s) in one batch "
+                   f"per model — {tta['overhead']:.1f}× single-pass latency "
+                   f"({ss['single_ms'].get((model_path, img_size), 0):.0f} ms)")
+
+    # Annotated image (display-sized copy)
+    st.image(res["preview_rgb"], caption="Detected Regions", use_container_width=True)
+
+    # Download — encoded only once asked for, then served from the cache
+    fmt_col, q_col, btn_col = st.columns([1, 1, 1.4])
+    fmt = fmt_col.selectbox("Format", list(FORMATS), label_visibility="collapsed")
+    quality = None
+    if fmt != "PNG":
+        quality = q_col.slider("Quality", 50, 100, FORMATS[fmt][3], 5,
+                               label_visibility="collapsed")
+    key = (res["id"], fmt, quality)
+    if ss["download_ready"] != key:
+        if btn_col.button("⬇  Prepare Download", use_container_width=True):
+            ss["download_ready"] = key
+            st.rerun()
+    else:
+        data = encoded_cache().get(res["id"], res["annotated_bgr"], fmt, quality)
+        mime, ext = mime_and_ext(fmt)
+        btn_col.download_button(
+            f"⬇  Download ({len(data) / 1024:.0f} KB)",
+            data=data,
+            file_name=f"leafscan_{res['stamp']}{ext}",
+            mime=mime,
+            use_container_width=True,
+        )
+
+    if dets:
+        st.markdown("<br>", unsafe_allow_html=True)
+        for i in sorted(range(len(dets)), key=lambda i: dets[i]["conf"], reverse=True):
+            render_single_result(dets[i]["name"], dets[i]["conf"], sev.det_pct(i))
+            st.markdown("<br>", unsafe_allow_html=True)
+    else:
+        st.markdown("""
+        <div style='text-align:center;padding:40px;
+                    color:var(--muted);font-size:0.9rem;
+                    background:var(--cream);border-radius:10px;
+                    border:1px dashed var(--border);'>
+            No detections above threshold.<br>
+            Try lowering the confidence threshold in the sidebar.
+        </div>""", unsafe_allow_html=True)
+
+
 with tab_upload:
     st.markdown("<br>", unsafe_allow_html=True)
 
@@ -806,97 +1322,18 @@ with tab_upload:
             img_pil   = Image.open(uploaded_img).convert("RGB")
             img_np    = np.array(img_pil)
             img_bgr   = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-            st.image(img_pil, caption="Original Image", use_container_width=True)
+            st.image(preview(img_np), caption="Original Image", use_container_width=True)
 
             if st.button("🔬  Analyse Leaf", use_container_width=True):
-                if not Path(model_path).exists():
-                    st.error(f"Model not found: `{model_path}`")
-                else:
-                    with st.spinner("Running inference…"):
-                        model, err = load_yolo(model_path)
-                        if err:
-                            st.error(f"Model error: {err}")
-                        else:
-                            t0 = time.time()
-                            results = model.predict(
-                                img_bgr,
-                                conf=conf_thresh,
-                                iou=iou_thresh,
-                                imgsz=img_size,
-                                verbose=False,
-                            )
-                            elapsed = (time.time() - t0) * 1000
-
-                            annotated_bgr, dets = annotate_image(
-                                img_bgr, results, model,
-                                show_labels, show_conf, BOX_COLOR
-                            )
-                            annotated_rgb = cv2.cvtColor(annotated_bgr, cv2.COLOR_BGR2RGB)
-                            ss["last_dets"] = dets
-
-                            # Save to history
-                            for d in dets:
-                                ss["history"].insert(0, {
-                                    "time": datetime.now().strftime("%H:%M:%S"),
-                                    "disease": d["display"],
-                                    "conf": d["conf"],
-                                    "icon": d["icon"],
-                                    "source": "upload",
-                                })
-                            ss["history"] = ss["history"][:100]
-
-                    with res_col:
-                        st.markdown("""
-                        <div style='font-family:"Cormorant Garamond",serif;font-size:1.5rem;
-                                    font-weight:600;color:var(--forest);margin-bottom:14px;'>
-                            Analysis Results
-                        </div>""", unsafe_allow_html=True)
-
-                        # Metrics chips
-                        st.markdown(f"""
-                        <div class="chip-row">
-                            <div class="chip">
-                                <div class="chip-val">{len(dets)}</div>
-                                <div class="chip-lbl">Detections</div>
-                            </div>
-                            <div class="chip">
-                                <div class="chip-val">{elapsed:.0f}ms</div>
-                                <div class="chip-lbl">Inference Time</div>
-                            </div>
-                            <div class="chip">
-                                <div class="chip-val">{max((d["conf"] for d in dets), default=0)*100:.0f}%</div>
-                                <div class="chip-lbl">Top Confidence</div>
-                            </div>
-                        </div>""", unsafe_allow_html=True)
-
-                        # Annotated image
-                        st.image(annotated_rgb, caption="Detected Regions", use_container_width=True)
-
-                        # Download button
-                        buf = io.BytesIO()
-                        Image.fromarray(annotated_rgb).save(buf, format="PNG")
-                        st.download_button(
-                            "⬇  Download Annotated Image",
-                            data=buf.getvalue(),
-                            file_name=f"leafscan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                            mime="image/png",
-                            use_container_width=True,
-                        )
-
-                        if dets:
-                            st.markdown("<br>", unsafe_allow_html=True)
-                            for d in sorted(dets, key=lambda x: x["conf"], reverse=True):
-                                render_single_result(d["name"], d["conf"])
-                                st.markdown("<br>", unsafe_allow_html=True)
-                        else:
-                            st.markdown("""
-                            <div style='text-align:center;padding:40px;
-                                        color:var(--muted);font-size:0.9rem;
-                                        background:var(--cream);border-radius:10px;
-                                        border:1px dashed var(--border);'>
-                                No detections above threshold.<br>
-                                Try lowering the confidence threshold in the sidebar.
-                            </div>""", unsafe_allow_html=True)
+                analyse_upload(uploaded_img.file_id, img_bgr)
+
+            res = ss["upload_result"]
+            if res and res["file_id"] == uploaded_img.file_id:
+                if res["view_key"] != upload_view_key(res):
+                    # Slider moved: instant re-threshold, no predict
+                    derive_upload(res, load_yolo(model_path)[0])
+                with res_col:
+                    render_upload_result(res)
         else:
             st.markdown("""
             <div style='text-align:center;padding:60px 20px;color:var(--muted);
@@ -958,54 +1395,223 @@ with tab_upload:
 # ══════════════════════════════════════════════
 # TAB 2 — LIVE CAMERA
 # ══════════════════════════════════════════════
-with tab_camera:
-    st.markdown("<br>", unsafe_allow_html=True)
+def camera_settings() -> dict:
+    """Sidebar values forwarded to the camera worker."""
+    return dict(conf=conf_thresh, iou=iou_thresh, imgsz=img_size, max_fps=max_fps,
+                show_lbl=show_labels, show_cf=show_conf, bcolor=BOX_COLOR, hud=cfg.camera.hud,
+                min_leaf=min_leaf_pct / 100, crop_leaves=crop_leaves, smooth=smooth_frames,
+                calibrator=active_calibrator(),
+                roi=(roi_x[0] / 100, roi_y[0] / 100, roi_x[1] / 100, roi_y[1] / 100))
 
-    # Controls
-    ctrl1, ctrl2, ctrl3, _ = st.columns([1,1,1,4])
-    start_cam = ctrl1.button("▶  Start Camera", use_container_width=True)
-    stop_cam  = ctrl2.button("■  Stop",         use_container_width=True)
-    clr_cam   = ctrl3.button("↺  Reset",        use_container_width=True)
-
-    if start_cam:
-        ss["cam_running"] = True
-        ss["frame_count"] = 0
-    if stop_cam:
-        ss["cam_running"] = False
-    if clr_cam:
-        ss["cam_running"] = False
-        ss["frame_count"] = 0
-        ss["fps"] = 0.0
-        ss["last_dets"] = []
+
+@st.cache_resource(show_spinner=False)
+def _stream_server(host: str, port: int) -> StreamServer:
+    return StreamServer(host, port)
+
+
+def stream_server():
+    """Shared HTTP frame transport, or None if the port cannot be bound."""
+    try:
+        server = _stream_server(cfg.camera.stream_host, cfg.camera.stream_port)
+    except OSError as e:
+        st.warning(f"Frame stream unavailable on port {cfg.camera.stream_port}: {e}")
+        return None
+    server.quality = cfg.camera.stream_quality      # hot-reloadable without a rebind
+    return server
+
+
+def stream_settings() -> dict:
+    server = stream_server() if stream_view else None
+    if server is None:
+        return {}
+    server.hub.reset_stats(ss["stream_id"])
+    return dict(hub=server.hub, stream_id=ss["stream_id"])
+
+
+def capture_settings() -> dict:
+    """Capture size and idle timeout from the server config."""
+    return dict(width=cfg.camera.width, height=cfg.camera.height,
+                idle_timeout=cfg.camera.idle_timeout)
+
+
+def worker_cores() -> dict:
+    """This session's inference slice and the shared preprocessing cores."""
+    ctx = get_script_run_ctx()
+    slot = hash(ctx.session_id if ctx else "") % len(res_plan.infer_cores)
+    return dict(cores=res_plan.worker_cores(slot),
+                prep_cores=res_plan.prep_cores if res_plan.pin else None)
+
+
+def stop_camera():
+    worker = ss.get("cam_worker")
+    if worker is not None:
+        worker.stop()          # joins the thread → VideoCapture released
+        if worker.hub is not None:
+            n_src = len(worker.source) if isinstance(worker, MultiCameraWorker) else 0
+            for sid in [worker.stream_id] + [f"{worker.stream_id}-{i}" for i in range(n_src)]:
+                worker.hub.drop(sid)
+    ss["cam_worker"] = None
+    ss["cam_running"] = False
+
+
+def start_camera():
+    stop_camera()
+    ss["cam_error"] = None
+    ss["frame_count"] = 0
+    ss["cam_gate"] = (0.0, 0.0)
+    ss["cam_seq"] = 0
+    ss["cam_logged"] = {}
+    if not Path(model_path).exists():
+        ss["cam_error"] = f"Model file not found: `{model_path}`"
+        return
+    model, err = load_yolo(model_path)
+    if err:
+        ss["cam_error"] = f"Model load error: {err}"
+        return
+    model = inference_pool() or model      # same predict() / names shape
+    if multi_cam:
+        if not cam_sources:
+            ss["cam_error"] = "Select at least one camera or video source"
+            return
+        worker = MultiCameraWorker(cam_sources, model, alerts=alert_engine(),
+                                   **capture_settings(), **worker_cores(), **stream_settings(),
+                                   **camera_settings())
+    else:
+        recorder = None
+        if record_cam and replay_src is None:
+            recorder = Recorder(RECORDINGS_DIR / datetime.now().strftime("%Y%m%d_%H%M%S"),
+                                source=cam_idx, weights=model_path, **camera_settings())
+        worker = CameraWorker(replay_src if replay_src is not None else cam_idx, model,
+                              recorder=recorder, alerts=alert_engine(), **capture_settings(),
+                              **worker_cores(), **stream_settings(), **camera_settings())
+    worker.start()
+    ss["cam_worker"] = worker
+    ss["cam_running"] = True
+
+
+def lock_leaf():
+    """Freeze the most confident stable diagnosis for a full result card."""
+    worker = ss["cam_worker"]
+    if worker is None:
+        ss["cam_lock"] = {"name": None}
+        return
+    snaps = worker.snapshots() if isinstance(worker, MultiCameraWorker) else [worker.snapshot()]
+    tracks = [(t, s.frame_rgb) for s in snaps for t in s.stable]
+    if not tracks:
+        ss["cam_lock"] = {"name": None}
+        return
+    t, frame = max(tracks, key=lambda tf: tf[0].conf)
+    crop = None
+    if frame is not None:
+        x1, y1, x2, y2 = t.box
+        crop = frame[max(y1, 0):y2, max(x1, 0):x2].copy()
+    ss["cam_lock"] = {"name": t.name, "conf": t.conf, "id": t.id, "hits": t.hits, "crop": crop}
+
+
+def reset_camera():
+    stop_camera()
+    ss["cam_error"] = None
+    ss["frame_count"] = 0
+    ss["fps"] = 0.0
+    ss["last_dets"] = []
+    ss["cam_lock"] = None
+
+
+def status_html(dot: str, text: str) -> str:
+    return f'<div class="live-dot"><span class="dot dot-{dot}"></span> {text}</div>'
+
+
+def chip_html(val, lbl: str) -> str:
+    return f"""
+    <div class="chip" style="margin-bottom:8px;">
+        <div class="chip-val">{val}</div>
+        <div class="chip-lbl">{lbl}</div>
+    </div>"""
+
+
+# Live view polls the worker on a timer; only this fragment reruns per tick.
+# With the direct frame stream the browser pulls frames itself; the fragment
+# only refreshes metrics once a second.
+_streaming = ss["cam_worker"] is not None and ss["cam_worker"].hub is not None
+
+
+@st.fragment(run_every=(1.0 if _streaming else 1.0 / max_fps) if ss["cam_running"] else None)
+@render_timer("camera")
+def camera_live():
+    worker = ss["cam_worker"]
+    hub_port = stream_server().port if worker is not None and worker.hub is not None else None
+    snap = worker.snapshot() if worker is not None else None
+
+    if snap is not None and snap.seq != ss["cam_seq"]:
+        ss["cam_seq"] = snap.seq
+        ss["last_dets"] = snap.stable if smooth_frames else snap.dets
+        ss["frame_count"] = snap.frame_count
+        ss["fps"] = snap.fps
+        ss["cam_gate"] = (snap.skip_rate, snap.saved_ms)
+        # Add to history
+        # One entry per tracked leaf and diagnosis when smoothing, else per label change
+        logged, ss["cam_logged"] = ss["cam_logged"], {t.id: t.name for t in snap.stable}
+        for d in (snap.stable if smooth_frames else snap.dets):
+            if smooth_frames:
+                if logged.get(d.id) == d.name:
+                    continue
+            elif ss["history"].last_disease() == d["display"] and time.time() % 3 >= 0.1:
+                continue
+            thumb = 0 if snap.frame_rgb is None else \
+                thumb_store().put(snap.frame_rgb, d["box"], rgb=True)
+            record_detection(d["display"], d["conf"], "camera", thumb=thumb)
+
+    if snap is not None and snap.error:
+        ss["cam_error"] = snap.error
+    if snap is not None and not snap.running and ss["cam_running"]:
+        # Worker ended on its own (camera error / unplugged / idle timeout)
+        stop_camera()
+        st.rerun()
 
     # Layout
     cam_col, info_col = st.columns([2.2, 1], gap="large")
 
     with cam_col:
         # Status
-        status_ph = st.empty()
-        if ss["cam_running"]:
-            status_ph.markdown(
-                '<div class="live-dot"><span class="dot dot-live"></span> LIVE DETECTION</div>',
-                unsafe_allow_html=True,
-            )
+        if ss["cam_error"] and ss["cam_error"].startswith("Replay finished"):
+            st.markdown(status_html("idle", "REPLAY DONE"), unsafe_allow_html=True)
+            st.info(ss["cam_error"])
+        elif ss["cam_error"]:
+            label = "MODEL NOT FOUND" if "not found" in ss["cam_error"] else "CAMERA ERROR"
+            st.markdown(status_html("error", label), unsafe_allow_html=True)
+            st.error(ss["cam_error"])
+        elif ss["cam_running"]:
+            st.markdown(status_html("live", "LIVE DETECTION"), unsafe_allow_html=True)
         else:
-            status_ph.markdown(
-                '<div class="live-dot"><span class="dot dot-idle"></span> CAMERA IDLE</div>',
-                unsafe_allow_html=True,
-            )
-
-        frame_ph = st.empty()
-        frame_ph.markdown("""
-        <div style='background:#1a2a1a;border:1px solid #2d5a3d;border-radius:10px;
-                    height:420px;display:flex;align-items:center;justify-content:center;
-                    flex-direction:column;gap:12px;'>
-            <div style='font-size:4rem;opacity:0.2;'>🎥</div>
-            <div style='font-family:"DM Mono",monospace;font-size:0.68rem;
-                        color:rgba(82,183,136,0.3);letter-spacing:2px;text-transform:uppercase;'>
-                Press START CAMERA to begin
-            </div>
-        </div>""", unsafe_allow_html=True)
+            st.markdown(status_html("idle", "CAMERA IDLE"), unsafe_allow_html=True)
+
+        if isinstance(worker, MultiCameraWorker):
+            # Grid of annotated streams, two per row
+            grid = st.columns(2)
+            for k, (src, cs) in enumerate(zip(worker.source, worker.snapshots())):
+                with grid[k % 2]:
+                    st.caption(f"CAM {src}  ·  {cs.fps:.1f} fps  ·  {len(cs.dets)} det"
+                               + (f"  ·  ⚠ {cs.error}" if cs.error else ""))
+                    if hub_port is not None:
+                        components.html(viewer_html(hub_port, f"{worker.stream_id}-{k}", 300),
+                                        height=310)
+                    elif cs.frame_rgb is not None:
+                        st.image(cs.frame_rgb, channels="RGB", use_container_width=True)
+        elif hub_port is not None:
+            components.html(viewer_html(hub_port, worker.stream_id, 480), height=490)
+        elif snap is not None and snap.frame_rgb is not None:
+            st.image(snap.frame_rgb, channels="RGB", use_container_width=True)
+        else:
+            st.markdown("""
+            <div style='background:#1a2a1a;border:1px solid #2d5a3d;border-radius:10px;
+                        height:420px;display:flex;align-items:center;justify-content:center;
+                        flex-direction:column;gap:12px;'>
+                <div style='font-size:4rem;opacity:0.2;'>🎥</div>
+                <div style='font-family:"DM Mono",monospace;font-size:0.68rem;
+                            color:rgba(82,183,136,0.3);letter-spacing:2px;text-transform:uppercase;'>
+                    Press START CAMERA to begin
+                </div>
+            </div>""", unsafe_allow_html=True)
 
     with info_col:
         # Live metrics
@@ -1015,9 +1621,16 @@ with tab_camera:
             Live Metrics
         </div>""", unsafe_allow_html=True)
 
-        fps_ph   = st.empty()
-        det_ph   = st.empty()
-        frame_ph2 = st.empty()
+        st.markdown(chip_html(f"{ss['fps']:.1f}", "FPS"), unsafe_allow_html=True)
+        st.markdown(chip_html(len(ss["last_dets"]), "Detections"), unsafe_allow_html=True)
+        st.markdown(chip_html(ss["frame_count"], "Frames"), unsafe_allow_html=True)
+        skip_rate, saved_ms = ss["cam_gate"]
+        st.markdown(chip_html(f"{skip_rate:.0%}", "Frames Skipped"), unsafe_allow_html=True)
+        st.markdown(chip_html(f"{saved_ms / 1000:.1f}s", "Inference Saved"), unsafe_allow_html=True)
+        if hub_port is not None and not isinstance(worker, MultiCameraWorker):
+            tx = worker.hub.stats(worker.stream_id)
+            st.markdown(chip_html(f"{tx['fps']:.1f} · {tx['kbps'] / 1000:.1f}",
+                                  "Stream fps · Mbit/s"), unsafe_allow_html=True)
 
         st.markdown("""
         <div style='font-family:"DM Mono",monospace;font-size:0.62rem;text-transform:uppercase;
@@ -1025,145 +1638,63 @@ with tab_camera:
             Current Detections
         </div>""", unsafe_allow_html=True)
 
-        det_list_ph = st.empty()
-        det_list_ph.markdown(
-            '<div style="color:var(--muted);font-size:0.8rem;padding:10px 0;">'
-            'No detections yet…</div>', unsafe_allow_html=True
-        )
+        # Detection list
+        dets = ss["last_dets"]
+        if dets:
+            html = "".join(
+                f'<div class="det-row">'
+                f'<span style="font-size:1.1rem;">{d["icon"]}</span>'
+                f'<span class="det-name">{d["display"]}</span>'
+                f'<span class="det-conf-pill" style="background:{d["bg"]};color:{d["color"]};">'
+                f'{d["conf"]*100:.1f}%</span></div>'
+                for d in sorted(dets, key=lambda x: x["conf"], reverse=True)
+            )
+            st.markdown(html, unsafe_allow_html=True)
+        else:
+            msg = "No detections" if ss["frame_count"] else "No detections yet…"
+            st.markdown(
+                '<div style="color:var(--muted);font-size:0.8rem;'
+                f'padding:10px 0;">{msg}</div>', unsafe_allow_html=True
+            )
 
-    def update_cam_metrics():
-        fps_ph.markdown(f"""
-        <div class="chip" style="margin-bottom:8px;">
-            <div class="chip-val">{ss['fps']:.1f}</div>
-            <div class="chip-lbl">FPS</div>
-        </div>""", unsafe_allow_html=True)
-        det_ph.markdown(f"""
-        <div class="chip" style="margin-bottom:8px;">
-            <div class="chip-val">{len(ss['last_dets'])}</div>
-            <div class="chip-lbl">Detections</div>
-        </div>""", unsafe_allow_html=True)
-        frame_ph2.markdown(f"""
-        <div class="chip" style="margin-bottom:8px;">
-            <div class="chip-val">{ss['frame_count']}</div>
-            <div class="chip-lbl">Frames</div>
-        </div>""", unsafe_allow_html=True)
 
-    update_cam_metrics()
+with tab_camera:
+    st.markdown("<br>", unsafe_allow_html=True)
 
-    # ── Camera loop ───────────────────────────
-    if ss["cam_running"]:
-        if not Path(model_path).exists():
-            status_ph.markdown(
-                '<div class="live-dot"><span class="dot dot-error"></span> MODEL NOT FOUND</div>',
-                unsafe_allow_html=True,
-            )
-            st.error(f"Model file not found: `{model_path}`")
+    # Controls — full rerun, so the live fragment re-registers its timer
+    ctrl1, ctrl2, ctrl3, ctrl4, _ = st.columns([1,1,1,1,3])
+    ctrl1.button("▶  Start Camera", use_container_width=True, on_click=start_camera)
+    ctrl2.button("■  Stop",         use_container_width=True, on_click=stop_camera)
+    ctrl3.button("↺  Reset",        use_container_width=True, on_click=reset_camera)
+    ctrl4.button("◎  Lock on Leaf", use_container_width=True, on_click=lock_leaf,
+                 disabled=not smooth_frames,
+                 help="Diagnose the most confident tracked leaf from its smoothed scores")
+
+    if ss["cam_worker"] is not None:
+        ss["cam_worker"].configure(**camera_settings())
+
+    camera_live()
+
+    lock = ss["cam_lock"]
+    if lock is not None:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if lock["name"] is None:
+            st.info("No leaf has a stable diagnosis yet — hold the camera on a leaf for a moment.")
         else:
-            model, err = load_yolo(model_path)
-            if err:
-                st.error(f"Model load error: {err}")
-            else:
-                cap = cv2.VideoCapture(cam_idx)
-                if not cap.isOpened():
-                    status_ph.markdown(
-                        '<div class="live-dot"><span class="dot dot-error"></span> CAMERA ERROR</div>',
-                        unsafe_allow_html=True,
-                    )
-                    st.error(f"Cannot open camera {cam_idx}")
-                else:
-                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
-                    t_start = time.time()
-                    frame_interval = 1.0 / max_fps
-
-                    try:
-                        while ss["cam_running"]:
-                            t_loop = time.time()
-                            ret, frame = cap.read()
-                            if not ret:
-                                time.sleep(0.05)
-                                continue
-
-                            results = model.predict(
-                                frame, conf=conf_thresh, iou=iou_thresh,
-                                imgsz=img_size, verbose=False
-                            )
-
-                            annotated, dets = annotate_image(
-                                frame, results, model,
-                                show_labels, show_conf, BOX_COLOR
-                            )
-
-                            ss["last_dets"] = dets
-                            ss["frame_count"] += 1
-                            elapsed_total = time.time() - t_start
-                            ss["fps"] = ss["frame_count"] / elapsed_total if elapsed_total > 0 else 0
-
-                            # Overlay HUD
-                            h, w = annotated.shape[:2]
-                            overlay = annotated.copy()
-                            cv2.rectangle(overlay, (0, h-36), (w, h), (26,42,26), -1)
-                            annotated = cv2.addWeighted(overlay, 0.6, annotated, 0.4, 0)
-                            ts = datetime.now().strftime("%H:%M:%S")
-                            cv2.putText(annotated,
-                                f"LeafScan  |  {ts}  |  {ss['fps']:.1f} fps  |  {len(dets)} det",
-                                (10, h-10), cv2.FONT_HERSHEY_SIMPLEX, 0.45,
-                                (180,220,180), 1, cv2.LINE_AA)
-
-                            img_rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-                            frame_ph.image(img_rgb, channels="RGB", use_container_width=True)
-
-                            update_cam_metrics()
-
-                            # Detection list
-                            if dets:
-                                html = "".join(
-                                    f'<div class="det-row">'
-                                    f'<span style="font-size:1.1rem;">{d["icon"]}</span>'
-                                    f'<span class="det-name">{d["display"]}</span>'
-                                    f'<span class="det-conf-pill" style="background:{d["bg"]};color:{d["color"]};">'
-                                    f'{d["conf"]*100:.1f}%</span></div>'
-                                    for d in sorted(dets, key=lambda x: x["conf"], reverse=True)
-                                )
-                                det_list_ph.markdown(html, unsafe_allow_html=True)
-
-                                # Add to history
-                                for d in dets:
-                                    if (not ss["history"] or
-                                            ss["history"][0].get("disease") != d["display"] or
-                                            time.time() % 3 < 0.1):
-                                        ss["history"].insert(0, {
-                                            "time": datetime.now().strftime("%H:%M:%S"),
-                                            "disease": d["display"],
-                                            "conf": d["conf"],
-                                            "icon": d["icon"],
-                                            "source": "camera",
-                                        })
-                                ss["history"] = ss["history"][:100]
-                            else:
-                                det_list_ph.markdown(
-                                    '<div style="color:var(--muted);font-size:0.8rem;'
-                                    'padding:10px 0;">No detections</div>', unsafe_allow_html=True
-                                )
-
-                            # Throttle
-                            sleep_t = frame_interval - (time.time() - t_loop)
-                            if sleep_t > 0:
-                                time.sleep(sleep_t)
-
-                    finally:
-                        cap.release()
-                        status_ph.markdown(
-                            '<div class="live-dot"><span class="dot dot-idle"></span> STOPPED</div>',
-                            unsafe_allow_html=True,
-                        )
+            img_col, card_col = st.columns([1, 3], gap="large")
+            if lock["crop"] is not None and lock["crop"].size:
+                img_col.image(lock["crop"], channels="RGB", use_container_width=True,
+                              caption=f"Leaf #{lock['id']} · seen in {lock['hits']} frames")
+            with card_col:
+                render_single_result(lock["name"], lock["conf"])
 
 
 # ══════════════════════════════════════════════
 # TAB 3 — HISTORY
 # ══════════════════════════════════════════════
-with tab_history:
+@st.fragment
+@render_timer("history")
+def history_panel():
     st.markdown("<br>", unsafe_allow_html=True)
 
     h_col, stats_col = st.columns([2, 1], gap="large")
@@ -1176,10 +1707,24 @@ with tab_history:
         </div>""", unsafe_allow_html=True)
 
         if st.button("🗑  Clear History"):
-            ss["history"] = []
+            ss["history"].clear()
 
         if ss["history"]:
-            for h in ss["history"][:40]:
+            n_pages = (len(ss["history"]) - 1) // HISTORY_PAGE + 1
+            pg_col, view_col = st.columns([1, 2])
+            page = pg_col.number_input(f"Page (of {n_pages})", 1, n_pages, 1) - 1
+            gallery = view_col.radio("View", ["List", "Gallery"], horizontal=True) == "Gallery"
+            rows = ss["history"].rows(page * HISTORY_PAGE, HISTORY_PAGE)
+        if ss["history"] and gallery:
+            # Only this page's thumbnails are read from disk
+            cols = st.columns(6)
+            for k, (h, data) in enumerate(zip(rows, thumb_store().get_many(r["thumb"] for r in rows))):
+                with cols[k % 6]:
+                    if data is not None:
+                        st.image(data, use_container_width=True)
+                    st.caption(f"{h['icon']} {h['disease']} · {h['conf']*100:.0f}% · {h['time']}")
+        elif ss["history"]:
+            for h in rows:
                 conf_col = "#27ae60" if h["conf"]>=0.75 else "#f39c12" if h["conf"]>=0.5 else "#e74c3c"
                 src_icon = "📷" if h["source"]=="upload" else "🎥"
                 st.markdown(f"""
@@ -1212,12 +1757,8 @@ with tab_history:
 
         if ss["history"]:
             # Count by disease
-            counts = {}
-            confs  = {}
-            for h in ss["history"]:
-                d = h["disease"]
-                counts[d] = counts.get(d, 0) + 1
-                confs.setdefault(d, []).append(h["conf"])
+            summary = ss["history"].summary()
+            counts = {d: c for d, (c, _) in summary.items()}
 
             st.markdown(f"""
             <div class="chip-row" style="grid-template-columns:1fr 1fr;">
@@ -1241,7 +1782,7 @@ with tab_history:
             for disease, cnt in sorted(counts.items(), key=lambda x: -x[1]):
                 pct = cnt / total * 100
                 info = get_disease_info(disease)
-                avg_conf = sum(confs[disease]) / len(confs[disease])
+                avg_conf = summary[disease][1]
                 st.markdown(f"""
                 <div style='margin-bottom:14px;'>
                     <div style='display:flex;justify-content:space-between;
@@ -1260,7 +1801,7 @@ with tab_history:
                 </div>""", unsafe_allow_html=True)
 
             # Export JSON
-            export_data = json.dumps(ss["history"], indent=2)
+            export_data = ss["history"].to_json()
             st.download_button(
                 "⬇  Export History (JSON)",
                 data=export_data,
@@ -1272,4 +1813,374 @@ with tab_history:
             st.markdown("""
             <div style='color:var(--muted);font-size:0.85rem;text-align:center;padding:20px;'>
                 Statistics will appear after detections
-            </div>""", unsafe_allow_html=True)
\ No newline at end of file
+            </div>""", unsafe_allow_html=True)
+
+    # Server-wide report over every session's detections, from cached per-day aggregates
+    st.markdown("""
+    <div style='font-family:"Cormorant Garamond",serif;font-size:1.5rem;
+                font-weight:600;color:var(--forest);margin:24px 0 14px;'>
+        Scouting Report
+    </div>""", unsafe_allow_html=True)
+    log = detection_log()
+    days = log.days()
+    r1, r2, r3 = st.columns([1.2, 1.5, 1])
+    today = datetime.now().date()
+    span = r1.date_input("Days", (today, today), key="report_span")
+    blocks = r2.multiselect("Blocks", [b for b in log.blocks if b], placeholder="All blocks")
+    if r3.button("📄  Build Report", use_container_width=True, disabled=not days):
+        start, end = (span[0], span[-1]) if isinstance(span, (tuple, list)) and span else (span, span)
+        t0 = time.perf_counter()
+        ss["report"] = (f"{start}_{end}", build_report(log, start, end, blocks, thumb_store()),
+                        (time.perf_counter() - t0) * 1000)
+    if ss["report"] is not None:
+        name, doc, ms = ss["report"]
+        st.download_button("⬇  Download Report (HTML)", data=doc,
+                           file_name=f"leafscan_report_{name}.html", mime="text/html")
+        st.caption(f"Built in {ms:.0f} ms from {len(days)} logged day(s) · open in a browser "
+                   "and print to PDF")
+
+
+with tab_history:
+    history_panel()
+
+
+# ══════════════════════════════════════════════
+# TAB 4 — FIELD SURVEY
+# ══════════════════════════════════════════════
+SURVEY_BATCH = cfg.perf.batch
+SURVEY_DUP_M = 3.0     # a near-duplicate photo only counts as a repeat shot within this range
+
+
+@st.cache_resource(show_spinner=False)
+def survey_store() -> SurveyStore:
+    """Server-wide survey points, shared by all scouts."""
+    return SurveyStore(cell_m=10.0, path="survey_data/points.jsonl")
+
+
+def process_survey(files):
+    """EXIF → batched predict → geotagged points in the survey store."""
+    model, err = load_yolo(model_path) if Path(model_path).exists() else (None, f"Model not found: `{model_path}`")
+    if err:
+        st.error(err)
+        return
+    store = survey_store()
+    todo = [f for f in files if f.file_id not in ss["survey_done"]]
+    # One index per batch: a repeat shot is the same scout, same leaf, same spot
+    dedup = DedupIndex(dedup_dist) if dedup_on else None
+    no_gps = 0
+    dups = 0
+    failed = []
+    added = 0
+    progress = st.progress(0.0, text="Processing survey photos…")
+    for start in range(0, len(todo), SURVEY_BATCH):
+        chunk, metas, frames, done = todo[start:start + SURVEY_BATCH], [], [], []
+        for f in chunk:
+            try:
+                img = Image.open(f)
+                loc = exif_location(img)
+                frame = None if loc is None else cv2.cvtColor(np.array(img.convert("RGB")),
+                                                              cv2.COLOR_RGB2BGR)
+            except Exception:
+                failed.append(f.name)   # not marked done: reported again on the next run
+                continue
+            done.append(f.file_id)
+            if loc is None:
+                no_gps += 1
+                continue
+            if dedup is not None:
+                h, hit = dedup.check(frame, accept=lambda p: distance_m(*p[:2], *loc[:2])
+                                     <= SURVEY_DUP_M)
+                if hit is not None:
+                    dups += 1           # repeat shot of a leaf already in this batch
+                    continue
+                dedup.add(h, loc)
+            metas.append((f.name, loc))
+            frames.append(frame)
+        if frames:
+            results = model.predict(frames, conf=conf_thresh, iou=iou_thresh,
+                                    imgsz=img_size, verbose=False)
+            rows = []
+            for (name, (lat, lon, ts)), r in zip(metas, results):
+                d = Detections.from_result(r)
+                for conf, cls_id in zip(d.conf.tolist(), d.cls.tolist()):
+                    info = get_disease_info(model.names.get(cls_id, str(cls_id)))
+                    rows.append({"lat": lat, "lon": lon, "ts": ts, "disease": info["display"],
+                                 "conf": round(conf, 4), "diseased": info["severity_score"] > 0,
+                                 "image": name})
+            added += store.add(rows)
+            detection_log().append_many(
+                dict(disease=r["disease"], conf=r["conf"], source="survey",
+                     block=scout_block.strip(), t=r["ts"]) for r in rows)
+        ss["survey_done"].update(done)
+        progress.progress(min(1.0, (start + len(chunk)) / len(todo)))
+    progress.empty()
+    read = len(todo) - len(failed)
+    st.success(f"{read - no_gps - dups} geotagged photos · {added} detections added"
+               + (f" · {no_gps} skipped (no GPS EXIF)" if no_gps else "")
+               + (f" · {dups} near-duplicates skipped "
+                  f"({dups / max(1, read - no_gps):.0%} dedup)" if dups else "")
+               + (f" · {len(failed)} unreadable" if failed else ""))
+    if failed:
+        st.warning("Could not read: " + ", ".join(failed[:10])
+                   + (f" … and {len(failed) - 10} more" if len(failed) > 10 else ""))
+
+
+@st.fragment
+@render_timer("survey")
+def survey_panel():
+    st.markdown("<br>", unsafe_allow_html=True)
+    store = survey_store()
+    map_col, q_col = st.columns([2, 1], gap="large")
+
+    with q_col:
+        st.markdown("""
+        <div style='font-family:"Cormorant Garamond",serif;font-size:1.5rem;
+                    font-weight:600;color:var(--forest);margin-bottom:14px;'>
+            Survey Photos
+        </div>""", unsafe_allow_html=True)
+        files = st.file_uploader("Geotagged photos", type=["jpg", "jpeg", "tiff", "webp"],
+                                 accept_multiple_files=True, label_visibility="collapsed")
+        if files and st.button("🗺  Add to Survey", use_container_width=True):
+            process_survey(files)
+
+        st.markdown(chip_html(f"{len(store):,}", "Survey Points"), unsafe_allow_html=True)
+
+        if len(store):
+            st.markdown('<div class="sidebar-label" style="color:var(--muted);">'
+                        'Nearest points</div>', unsafe_allow_html=True)
+            lat0, lon0 = store.origin
+            nlat = st.number_input("Latitude", value=lat0, format="%.6f")
+            nlon = st.number_input("Longitude", value=lon0, format="%.6f")
+            k = st.slider("Neighbours", 1, 25, 5)
+            t0 = time.perf_counter()
+            near = store.nearest(nlat, nlon, k)
+            st.caption(f"{(time.perf_counter() - t0) * 1000:.1f} ms")
+            st.dataframe(near, hide_index=True, use_container_width=True,
+                         column_order=["disease", "conf", "dist_m", "image"])
+
+            st.markdown('<div class="sidebar-label" style="color:var(--muted);">'
+                        'Bounding box</div>', unsafe_allow_html=True)
+            b1, b2 = st.columns(2)
+            lat_min = b1.number_input("Lat min", value=nlat - 0.001, format="%.6f")
+            lat_max = b2.number_input("Lat max", value=nlat + 0.001, format="%.6f")
+            lon_min = b1.number_input("Lon min", value=nlon - 0.001, format="%.6f")
+            lon_max = b2.number_input("Lon max", value=nlon + 0.001, format="%.6f")
+            t0 = time.perf_counter()
+            box_rows = store.query_bbox(lat_min, lon_min, lat_max, lon_max)
+            ms = (time.perf_counter() - t0) * 1000
+            bad = sum(r["diseased"] for r in box_rows)
+            st.caption(f"{len(box_rows):,} points · {bad:,} diseased · {ms:.1f} ms")
+
+    with map_col:
+        st.markdown("""
+        <div style='font-family:"Cormorant Garamond",serif;font-size:1.5rem;
+                    font-weight:600;color:var(--forest);margin-bottom:14px;'>
+            Orchard Disease Density
+        </div>""", unsafe_allow_html=True)
+        cells = store.heat_cells()
+        if cells:
+            import pydeck as pdk
+            lats = [c[0] for c in cells]
+            lons = [c[1] for c in cells]
+            st.pydeck_chart(pdk.Deck(
+                map_style=None,
+                initial_view_state=pdk.ViewState(
+                    latitude=sum(lats) / len(lats), longitude=sum(lons) / len(lons), zoom=17),
+                layers=[pdk.Layer(
+                    "HeatmapLayer",
+                    data=[{"lat": la, "lon": lo, "w": w} for la, lo, w in cells],
+                    get_position="[lon, lat]", get_weight="w",
+                    radius_pixels=40, aggregation="SUM",
+                )],
+            ))
+        else:
+            st.markdown("""
+            <div style='text-align:center;padding:60px;color:var(--muted);
+                        background:var(--cream);border-radius:10px;
+                        border:1px dashed var(--border);font-size:0.9rem;'>
+                No geotagged detections yet.<br>
+                Upload photos with GPS EXIF to build the orchard map.
+            </div>""", unsafe_allow_html=True)
+
+
+with tab_survey:
+    survey_panel()
+
+
+# ══════════════════════════════════════════════
+# TAB 5 — EVALUATE
+# ══════════════════════════════════════════════
+@st.fragment
+@render_timer("evaluate")
+def evaluate_panel():
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.markdown("""
+    <div style='font-family:"Cormorant Garamond",serif;font-size:1.5rem;
+                font-weight:600;color:var(--forest);margin-bottom:14px;'>
+        Evaluate on Labelled Orchard Data
+    </div>""", unsafe_allow_html=True)
+
+    ds_col, btn_col = st.columns([3, 1])
+    dataset_dir = ds_col.text_input("YOLO dataset folder", placeholder="datasets/orchard/val",
+                                    label_visibility="collapsed")
+    run = btn_col.button("📐  Evaluate", use_container_width=True)
+    st.caption(f"Uses the sidebar settings: conf {conf_thresh:.2f} · IoU {iou_thresh:.2f} · "
+               f"{img_size}px. Raw predictions are cached per weights hash, so changing the "
+               f"confidence threshold re-scores instantly.")
+
+    if run:
+        if not Path(model_path).exists():
+            st.error(f"Model not found: `{model_path}`")
+        elif not dataset_dir or not Path(dataset_dir).is_dir():
+            st.error(f"Dataset folder not found: `{dataset_dir}`")
+        else:
+            model, err = load_yolo(model_path)
+            if err:
+                st.error(f"Model error: {err}")
+            else:
+                bar = st.progress(0.0, text="Running batched inference…")
+                try:
+                    ss["eval_report"] = evaluate(dataset_dir, model_path, conf_thresh, iou_thresh,
+                                                 img_size, model=model, batch=cfg.perf.batch,
+                                                 progress=lambda f: bar.progress(f))
+                    ss["eval_cache"] = (load_cache(ss["eval_report"].key), dict(model.names))
+                except (FileNotFoundError, RuntimeError) as e:
+                    st.error(str(e))
+                bar.empty()
+
+    r = ss["eval_report"]
+    if r is None:
+        return
+    if r.conf != conf_thresh:
+        # Same raw predictions, new threshold: re-score only, no model or dataset pass
+        cache, names = ss["eval_cache"]
+        cached = r.cached
+        r = compute_metrics(cache, names, conf_thresh, r.key)
+        r.cached = cached
+        ss["eval_report"] = r
+
+    st.markdown(f"""
+    <div class="chip-row" style="grid-template-columns:repeat(4,1fr);">
+        <div class="chip"><div class="chip-val">{r.map50:.3f}</div>
+            <div class="chip-lbl">mAP@0.5</div></div>
+        <div class="chip"><div class="chip-val">{r.map50_95:.3f}</div>
+            <div class="chip-lbl">mAP@0.5:0.95</div></div>
+        <div class="chip"><div class="chip-val">{r.images_per_s:.1f}</div>
+            <div class="chip-lbl">Images / s</div></div>
+        <div class="chip"><div class="chip-val">{r.best_conf:.2f}</div>
+            <div class="chip-lbl">Suggested Conf</div></div>
+    </div>""", unsafe_allow_html=True)
+
+    st.dataframe(r.per_class, hide_index=True, use_container_width=True,
+                 column_order=["display", "gt", "precision", "recall", "ap50", "ap50_95"])
+    st.line_chart({"precision": [s["precision"] for s in r.sweep],
+                   "recall":    [s["recall"] for s in r.sweep],
+                   "F1":        [s["f1"] for s in r.sweep]})
+    st.caption(f"Confidence sweep 0.05 → 0.95 · {r.images} images · "
+               f"{r.ms_per_image:.1f} ms/img{' · from cache' if r.cached else ''} · key {r.key}"
+               + (f" · {r.skipped} unreadable images skipped" if r.skipped else ""))
+
+    # Calibration: raw scores vs. "matched a ground-truth box at IoU 0.5"
+    st.markdown('<div class="sidebar-label" style="color:var(--muted);">'
+                'Confidence calibration</div>', unsafe_allow_html=True)
+    m_col, b_col = st.columns([3, 1])
+    method = m_col.radio("Method", ["platt", "temperature"], horizontal=True,
+                         label_visibility="collapsed")
+    if b_col.button("Fit", use_container_width=True):
+        cache = load_cache(r.key)
+        if cache is None or not len(cache["pred_conf"]):
+            st.error("No cached predictions to fit on — run the evaluation first.")
+        else:
+            calib = fit_calibration(cache["pred_conf"], cache["tp"][:, 0], method)
+            wkey = r.key.split("-")[0]
+            calib.save(wkey)
+            ss["calibrator"] = (wkey, calib)
+            ss["eval_calib"] = calib
+    calib = ss.get("eval_calib")
+    if calib is not None:
+        st.caption(f"{calib.method}: a={calib.a:.3f} b={calib.b:.3f} on {calib.n:,} detections · "
+                   f"log-loss {calib.nll_before:.3f} → {calib.nll_after:.3f} · "
+                   f"ECE {calib.ece_before:.3f} → {calib.ece_after:.3f}")
+
+
+@st.fragment
+def fastpath_panel():
+    st.markdown('<div class="sidebar-label" style="color:var(--muted);">'
+                'Fast path — distil a single-leaf classifier</div>', unsafe_allow_html=True)
+    f_col, b_col = st.columns([3, 1])
+    folder = f_col.text_input("Image folder", placeholder="photos/closeups",
+                              label_visibility="collapsed")
+    if b_col.button("Distil", use_container_width=True):
+        model, err = load_yolo(model_path) if Path(model_path).exists() \
+            else (None, f"Model not found: `{model_path}`")
+        if err:
+            st.error(err)
+        elif not folder or not Path(folder).is_dir():
+            st.error(f"Folder not found: `{folder}`")
+        else:
+            bar = st.progress(0.0, text="Labelling with the detector…")
+            try:
+                clf = distill(folder, model, img_size, conf_thresh, iou_thresh,
+                              progress=lambda f: bar.progress(f))
+                clf.save(fastpath_path(model_path))
+            except RuntimeError as e:
+                st.error(str(e))
+            bar.empty()
+    fp = fast_path()
+    if fp is not None:
+        r = fp.clf.report
+        st.caption(f"Held out {r['val']} of {r['images']} images: fast path serves "
+                   f"{r['fast_frac']:.0%} · agrees with the detector on {r['agree_on_served']:.0%} "
+                   f"of those · accuracy Δ {r['acc_delta_vs_teacher']:+.1%} · "
+                   f"{r['classifier_ms']:.1f} vs {r['detector_ms']:.0f} ms/img"
+                   + (f" · vs ground truth {r['acc_delta']:+.1%}" if "acc_delta" in r else ""))
+
+
+@st.fragment
+def regression_panel():
+    st.markdown('<div class="sidebar-label" style="color:var(--muted);">'
+                'Golden-set regression — candidate vs. current weights (CPU)</div>',
+                unsafe_allow_html=True)
+    g_col, c_col, b_col = st.columns([2, 2, 1])
+    golden = g_col.text_input("Golden image folder", placeholder="golden/",
+                              label_visibility="collapsed")
+    candidate = c_col.text_input("Candidate weights", placeholder="runs/train/weights/best.pt",
+                                 label_visibility="collapsed")
+    t1, t2, t3 = st.columns(3)
+    max_diff = t1.number_input("Max missing / extra", 0.0, 1.0, 0.02, 0.01)
+    tol = Tolerances(
+        max_missing=max_diff, max_extra=max_diff,
+        min_mean_iou=t2.number_input("Min mean IoU", 0.0, 1.0, 0.90, 0.01),
+        max_p95_ratio=t3.number_input("Max p95 latency ratio", 1.0, 5.0, 1.25, 0.05))
+    if b_col.button("Compare", use_container_width=True):
+        if not golden or not Path(golden).is_dir():
+            st.error(f"Folder not found: `{golden}`")
+        elif not Path(model_path).exists() or not Path(candidate or "").is_file():
+            st.error(f"Weights not found: `{model_path}` / `{candidate}`")
+        else:
+            bar = st.progress(0.0, text="Running both weights on CPU…")
+            try:
+                ss["regression"] = regress(golden, model_path, candidate, conf_thresh, iou_thresh,
+                                           img_size, tol=tol, progress=lambda f: bar.progress(f))
+            except (FileNotFoundError, RuntimeError) as e:
+                st.error(str(e))
+            bar.empty()
+    r = ss["regression"]
+    if r is not None:
+        if r.passed:
+            st.success("PASS")
+        else:
+            st.error(f"FAIL · {len(r.failures)} check(s)")
+        st.code(regression_summary(r), language=None)
+        if r.changed:
+            st.dataframe(r.changed, hide_index=True, use_container_width=True)
+
+
+with tab_eval:
+    evaluate_panel()
+    fastpath_panel()
+    regression_panel()
+
+touch_session()
+session_registry().evict_idle(SESSION_IDLE_EVICT_S)
+ss["render_ms"]["page"] = (time.perf_counter() - _RUN_T0) * 1000
@@ -0,0 +1,8 @@
+"""
+LeafScan engine — detection, drawing and worker code used by ``app.py``.
+"""
+
+from .core import (DISEASE_INFO, Det, Detections, annotate_image, as_detections, draw_hud,
+                   get_disease_info, load_yolo)
+from .camera import (CameraSnapshot, CameraWorker, FrameGrabber, MultiCameraWorker,
+                     parse_source)
@@ -0,0 +1,284 @@
+"""
+Debounced alerts for high-severity detections, delivered off the hot path.
+
+``AlertEngine.observe(dets, source, shape)`` is called from the camera loop and
+the upload path. A detection raises an alert when its class is in the
+configured set (default: ``severity_score >= 7``) and its confidence clears
+``min_conf``. Alerts are debounced per *track* — class + coarse grid cell of
+the box centre + source — so a lesion that stays in view fires once per
+``debounce_s``, not once per frame.
+
+``observe`` only does a ``put_nowait`` on a bounded queue; a dispatcher
+thread drains it in batches and delivers to the sinks with exponential-backoff
+retry. When the queue is full the oldest event is dropped and counted, so
+alert I/O can never stall the caller.
+
+Sinks: ``FileSink`` (JSONL a local consumer can tail), ``WebhookSink`` (HTTP
+POST of a JSON list) and ``MqttSink`` (needs ``paho-mqtt``).
+
+Throughput check::
+
+    python -m leafscan.alerts --rate 500 --seconds 5
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+from .core import DISEASE_INFO, get_disease_info
+
+DEFAULT_MIN_SEVERITY = 7
+
+
+def severe_classes(min_score: int = DEFAULT_MIN_SEVERITY) -> list:
+    """Display names of the classes at or above ``min_score``."""
+    return [v["display"] for k, v in DISEASE_INFO.items()
+            if k != "unknown" and v["severity_score"] >= min_score]
+
+
+# ══════════════════════════════════════════════
+# SINKS
+# ══════════════════════════════════════════════
+class FileSink:
+    """Append one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def send(self, events: list):
+        with self.path.open("a") as f:
+            f.write("".join(json.dumps(e) + "\n" for e in events))
+
+
+class WebhookSink:
+    """POST the batch as a JSON list; any non-2xx status raises and is retried."""
+
+    def __init__(self, url: str, timeout: float = 3.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, events: list):
+        req = urllib.request.Request(self.url, data=json.dumps(events).encode(),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as r:
+            if r.status >= 300:
+                raise OSError(f"webhook returned {r.status}")
+
+
+class MqttSink:
+    def __init__(self, host: str, topic: str = "leafscan/alerts", port: int = 1883):
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError:
+            raise ImportError("paho-mqtt not installed → pip install paho-mqtt")
+        self.topic = topic
+        self.client = mqtt.Client()
+        self.client.connect(host, port)
+        self.client.loop_start()
+
+    def send(self, events: list):
+        for e in events:
+            info = self.client.publish(self.topic, json.dumps(e), qos=1)
+            if info.rc != 0:
+                raise OSError(f"mqtt publish failed (rc={info.rc})")
+
+
+# ══════════════════════════════════════════════
+# DISPATCH
+# ══════════════════════════════════════════════
+class AlertDispatcher:
+    """Bounded queue + delivery thread with per-batch retry."""
+
+    def __init__(self, sinks, maxsize: int = 1000, batch: int = 64,
+                 retries: int = 4, backoff: float = 0.25):
+        self.sinks = list(sinks)
+        self.batch = batch
+        self.retries = retries
+        self.backoff = backoff
+        self._q = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {"queued": 0, "delivered": 0, "dropped": 0, "failed": 0, "retries": 0}
+        self._thread = threading.Thread(target=self._run, name="leafscan-alerts", daemon=True)
+        self._thread.start()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def submit(self, event: dict):
+        """Never blocks: on a full queue the oldest pending event is dropped."""
+        while True:
+            try:
+                self._q.put_nowait(event)
+                self._count("queued")
+                return
+            except queue.Full:
+                try:
+                    self._q.get_nowait()
+                    self._count("dropped")
+                except queue.Empty:
+                    pass
+
+    def pending(self) -> int:
+        return self._q.qsize()
+
+    def close(self, timeout: float = 5.0):
+        """Deliver what is queued (within ``timeout``) and stop."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _deliver(self, sink, events):
+        for attempt in range(self.retries + 1):
+            try:
+                sink.send(events)
+                return True
+            except Exception:
+                if attempt == self.retries:
+                    return False
+                self._count("retries")
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _run(self):
+        while not (self._stop.is_set() and self._q.empty()):
+            try:
+                events = [self._q.get(timeout=0.2)]
+            except queue.Empty:
+                continue
+            while len(events) < self.batch:
+                try:
+                    events.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            ok = all([self._deliver(s, events) for s in self.sinks])
+            self._count("delivered" if ok else "failed", len(events))
+
+
+class AlertEngine:
+    """Rule check + per-track debounce in front of an ``AlertDispatcher``."""
+
+    def __init__(self, dispatcher: AlertDispatcher, classes=None, min_conf: float = 0.6,
+                 debounce_s: float = 30.0, grid: int = 4):
+        self.dispatcher = dispatcher
+        self.classes = set(severe_classes() if classes is None else classes)
+        self.min_conf = min_conf
+        self.debounce_s = debounce_s
+        self.grid = grid
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._last = {}     # track key → last alert time
+
+    def configure(self, **settings):
+        with self._lock:
+            for k, v in settings.items():
+                setattr(self, k, set(v) if k == "classes" else v)
+
+    def _track(self, det, source, shape) -> tuple:
+        h, w = shape[:2]
+        x1, y1, x2, y2 = det["box"]
+        gx = min(self.grid - 1, int((x1 + x2) / 2 / max(w, 1) * self.grid))
+        gy = min(self.grid - 1, int((y1 + y2) / 2 / max(h, 1) * self.grid))
+        return source, det["display"], gx, gy
+
+    def observe(self, dets, source="camera", shape=(1, 1)) -> int:
+        """Queue alerts for qualifying detections; returns how many were raised."""
+        if not self.enabled or not dets:
+            return 0
+        now = time.time()
+        raised = 0
+        with self._lock:
+            for d in dets:
+                if d["display"] not in self.classes or d["conf"] < self.min_conf:
+                    continue
+                key = self._track(d, source, shape)
+                if now - self._last.get(key, 0.0) < self.debounce_s:
+                    continue
+                self._last[key] = now
+                info = get_disease_info(d["name"])
+                self.dispatcher.submit({
+                    "ts": now, "source": str(source), "class": d["display"],
+                    "conf": round(float(d["conf"]), 4), "box": [round(float(v), 1) for v in d["box"]],
+                    "severity": info["severity"], "severity_score": info["severity_score"],
+                    "track": f"{key[1]}@{key[2]},{key[3]}",
+                })
+                raised += 1
+            if len(self._last) > 10_000:    # forget stale tracks
+                cutoff = now - self.debounce_s
+                self._last = {k: t for k, t in self._last.items() if t >= cutoff}
+        return raised
+
+
+def build_sinks(file_path=None, webhook_url=None, mqtt_host=None, mqtt_topic="leafscan/alerts"):
+    sinks = []
+    if file_path:
+        sinks.append(FileSink(file_path))
+    if webhook_url:
+        sinks.append(WebhookSink(webhook_url))
+    if mqtt_host:
+        sinks.append(MqttSink(mqtt_host, mqtt_topic))
+    return sinks
+
+
+# ══════════════════════════════════════════════
+# THROUGHPUT CHECK
+# ══════════════════════════════════════════════
+class _FlakySink:
+    """Slow, failing-every-few-calls stand-in for a remote endpoint."""
+
+    def __init__(self, latency: float, fail_every: int):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+        self.received = 0
+
+    def send(self, events):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise OSError("simulated failure")
+        self.received += len(events)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Alert pipeline throughput check")
+    ap.add_argument("--rate", type=int, default=500, help="events per second offered")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--latency", type=float, default=0.02, help="simulated sink latency (s)")
+    ap.add_argument("--fail-every", type=int, default=7)
+    ap.add_argument("--queue", type=int, default=1000)
+    args = ap.parse_args(argv)
+
+    sink = _FlakySink(args.latency, args.fail_every)
+    disp = AlertDispatcher([sink], maxsize=args.queue, backoff=0.01)
+    engine = AlertEngine(disp, min_conf=0.0, debounce_s=0.0)
+    det = {"name": "black_rot", "display": "Black Rot", "conf": 0.9, "box": (10, 10, 50, 50)}
+
+    n = int(args.rate * args.seconds)
+    worst = 0.0
+    t0 = time.perf_counter()
+    for i in range(n):
+        ts = time.perf_counter()
+        engine.observe([det], source=i)
+        worst = max(worst, time.perf_counter() - ts)
+        lag = t0 + (i + 1) / args.rate - time.perf_counter()
+        if lag > 0:
+            time.sleep(lag)
+    offered_s = time.perf_counter() - t0
+    disp.close(timeout=30)
+    drain_s = time.perf_counter() - t0
+
+    s = disp.stats
+    print(f"offered {n} events in {offered_s:.2f}s ({n / offered_s:.0f}/s) · "
+          f"worst observe() {worst * 1e3:.2f} ms")
+    print(f"delivered {s['delivered']} · failed {s['failed']} · dropped {s['dropped']} · "
+          f"retries {s['retries']} · drained after {drain_s:.2f}s "
+          f"({s['delivered'] / drain_s:.0f}/s delivered)")
+
+
+if __name__ == "__main__":
+    main()
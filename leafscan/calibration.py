@@ -0,0 +1,104 @@
+"""
+Confidence calibration fitted on a local labelled set.
+
+A detection's label is whether it matched a ground-truth box at IoU 0.5 (the
+evaluation cache from ``leafscan.evaluate`` already holds exactly that). Two
+one-dimensional maps on the logit of the raw score are supported:
+
+* temperature — ``p = σ(logit / T)``
+* Platt       — ``p = σ(a · logit + b)``
+
+Both are fitted by Newton's method on the log-loss, fully vectorized. Fitted
+parameters are stored per weights hash, so a calibration follows the weights
+it was fitted for.
+"""
+
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+CALIB_DIR = Path(".leafscan_cache") / "calib"
+EPS = 1e-6
+
+
+def _logit(p):
+    p = np.clip(np.asarray(p, np.float64), EPS, 1 - EPS)
+    return np.log(p / (1 - p))
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+@dataclass
+class Calibrator:
+    method: str = "platt"     # "platt" | "temperature"
+    a: float = 1.0            # slope (1/T for temperature)
+    b: float = 0.0
+    nll_before: float = 0.0
+    nll_after: float = 0.0
+    ece_before: float = 0.0
+    ece_after: float = 0.0
+    n: int = 0
+
+    def __call__(self, conf):
+        out = _sigmoid(self.a * _logit(conf) + self.b)
+        return out.astype(np.float32) if isinstance(conf, np.ndarray) else float(out)
+
+    def raw_threshold(self, p: float) -> float:
+        """Raw score whose calibrated value is ``p`` (the map is increasing for ``a`` > 0)."""
+        return float(_sigmoid((_logit(p) - self.b) / max(self.a, EPS)))
+
+    def save(self, weights_key: str, root=CALIB_DIR):
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        (root / f"{weights_key}.json").write_text(json.dumps(asdict(self), indent=2))
+
+    @classmethod
+    def load(cls, weights_key: str, root=CALIB_DIR):
+        p = Path(root) / f"{weights_key}.json"
+        return cls(**json.loads(p.read_text())) if p.exists() else None
+
+
+def log_loss(p, y) -> float:
+    p = np.clip(p, EPS, 1 - EPS)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def expected_calibration_error(p, y, bins: int = 10) -> float:
+    idx = np.minimum((p * bins).astype(int), bins - 1)
+    n = np.bincount(idx, minlength=bins)
+    conf_sum = np.bincount(idx, weights=p, minlength=bins)
+    acc_sum = np.bincount(idx, weights=y, minlength=bins)
+    nz = n > 0
+    return float(np.sum(np.abs(acc_sum[nz] - conf_sum[nz])) / max(len(p), 1))
+
+
+def fit(conf, is_tp, method: str = "platt", iters: int = 50) -> Calibrator:
+    """Fit on raw scores ``conf`` and 0/1 labels ``is_tp``."""
+    z = _logit(conf)
+    y = np.asarray(is_tp, np.float64)
+    if method == "temperature":
+        params = np.array([1.0])
+        design = z[:, None]
+    else:
+        params = np.array([1.0, 0.0])
+        design = np.stack([z, np.ones_like(z)], 1)
+    for _ in range(iters):
+        p = _sigmoid(design @ params)
+        grad = design.T @ (p - y) / len(y)
+        w = p * (1 - p)
+        hess = (design * w[:, None]).T @ design / len(y) + 1e-6 * np.eye(len(params))
+        step = np.linalg.solve(hess, grad)
+        params -= step
+        if np.abs(step).max() < 1e-7:
+            break
+    a, b = (params[0], 0.0) if method == "temperature" else (params[0], params[1])
+    raw = np.clip(np.asarray(conf, np.float64), EPS, 1 - EPS)
+    cal = _sigmoid(a * z + b)
+    return Calibrator(method=method, a=float(a), b=float(b),
+                      nll_before=log_loss(raw, y), nll_after=log_loss(cal, y),
+                      ece_before=expected_calibration_error(raw, y),
+                      ece_after=expected_calibration_error(cal, y), n=len(y))
@@ -0,0 +1,484 @@
+"""
+Background camera worker.
+
+Capture + inference run on a daemon thread owned by the browser session. The
+Streamlit script never blocks on the camera: it polls ``snapshot()`` from a
+timer-driven fragment and renders whatever the worker produced last.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+from .core import Detections, annotate_image, as_detections, draw_hud
+from .prefilter import GateStats, gate_frame
+from .recording import is_recording, open_capture
+from .resources import pin_current_thread
+from .smoothing import TemporalSmoother
+
+
+@dataclass
+class CameraSnapshot:
+    """Latest output of a worker. ``seq`` increases by one per processed frame."""
+    seq: int = 0
+    frame_rgb: object = None      # annotated RGB ndarray, or None before the first frame
+    dets: list = field(default_factory=list)
+    fps: float = 0.0
+    frame_count: int = 0
+    infer_ms: float = 0.0
+    error: str = None
+    running: bool = False
+    skip_rate: float = 0.0        # share of frames the leaf gate kept from the model
+    saved_ms: float = 0.0         # estimated inference time saved by skipping
+    stable: list = field(default_factory=list)   # smoothed per-leaf diagnoses (LeafTrack)
+
+
+class CameraWorker:
+    """
+    Owns one ``cv2.VideoCapture`` and runs predict → annotate → HUD in a thread.
+
+    Lifecycle: ``start()`` → poll ``snapshot()`` → ``stop()``. ``stop()`` joins
+    the thread, so the capture device is released by the time it returns.
+    Settings (thresholds, display options, fps cap) can be changed while
+    running via ``configure()``; they are picked up on the next frame.
+
+    Each frame first passes ``leafscan.prefilter.gate_frame``: frames with too
+    little foliage (``min_leaf``, 0 disables) skip ``model.predict``, the rest
+    are optionally cropped to ``roi`` / the leaf region before inference.
+
+    With a ``calibrator`` setting (``leafscan.calibration.Calibrator``) the
+    ``conf`` threshold applies to calibrated scores and every detection carries
+    its calibrated confidence, as on uploads.
+
+    Detections also feed a ``leafscan.smoothing.TemporalSmoother`` (``smooth``
+    = EMA window in frames, 0 disables); its stable per-leaf diagnoses are
+    published as ``snapshot().stable``.
+
+    If nobody polls for ``idle_timeout`` seconds (browser tab closed, session
+    gone) the worker stops itself.
+
+    With a ``recorder`` (``leafscan.recording.Recorder``) every raw frame and its
+    detections are appended to disk; the recorder is closed when the thread
+    exits. A recording directory as ``source`` is replayed through the same
+    pipeline unthrottled, and the worker stops at its end.
+
+    ``alerts`` (``leafscan.alerts.AlertEngine``) sees every frame's detections;
+    it only enqueues, so delivery never slows the loop.
+
+    ``cores`` / ``prep_cores`` (from ``leafscan.resources.ResourcePlan``) pin
+    the inference thread and any frame-grabber threads to disjoint core sets.
+
+    With a ``hub`` (``leafscan.stream.FrameHub``) each annotated frame is also
+    published under ``stream_id`` for the HTTP transport.
+    """
+
+    def __init__(self, source, model, *, width=1280, height=720,
+                 idle_timeout=30.0, recorder=None, alerts=None, cores=None,
+                 prep_cores=None, hub=None, stream_id=None, **settings):
+        self.source = source
+        self.model = model
+        self.hub = hub
+        self.stream_id = stream_id
+        self.cores = cores
+        self.prep_cores = prep_cores
+        self.recorder = recorder
+        self.alerts = alerts
+        self.width = width
+        self.height = height
+        self.idle_timeout = idle_timeout
+        self._settings = {
+            "conf": 0.40, "iou": 0.50, "imgsz": 640, "max_fps": 15,
+            "show_lbl": True, "show_cf": True, "bcolor": (45,106,79),
+            "min_leaf": 0.0, "roi": None, "crop_leaves": False, "hud": "bottom",
+            "smooth": 15, "calibrator": None,
+        }
+        self._settings.update(settings)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._snap = CameraSnapshot()
+        self._last_poll = time.time()
+
+    # ── lifecycle ─────────────────────────────
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._last_poll = time.time()
+        with self._lock:
+            self._snap = CameraSnapshot(running=True)
+        self._thread = threading.Thread(target=self._run, name=f"leafscan-cam-{self.source}",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the latest annotated frame(s)."""
+        with self._lock:
+            snaps = [self._snap] + list(getattr(self, "_snaps", []))
+        return sum(sn.frame_rgb.nbytes for sn in snaps if sn.frame_rgb is not None)
+
+    def configure(self, **settings):
+        with self._lock:
+            self._settings.update(settings)
+
+    def snapshot(self) -> CameraSnapshot:
+        self._last_poll = time.time()
+        with self._lock:
+            return self._snap
+
+    # ── thread body ───────────────────────────
+    @staticmethod
+    def _raw_conf(cfg) -> float:
+        """Detector threshold: the raw score that calibrates to ``conf``."""
+        calib = cfg["calibrator"]
+        return cfg["conf"] if calib is None else calib.raw_threshold(cfg["conf"])
+
+    @staticmethod
+    def _calibrate(det: Detections, cfg) -> Detections:
+        if cfg["calibrator"] is not None and len(det):
+            det.conf = cfg["calibrator"](det.conf)
+        return det
+
+    def _predict(self, frame, box, cfg) -> Detections:
+        """Predict on ``frame`` or its ``box`` crop; boxes in frame pixels."""
+        crop = frame if box is None else frame[box[1]:box[3], box[0]:box[2]]
+        det = as_detections(self.model.predict(
+            crop, conf=self._raw_conf(cfg), iou=cfg["iou"], imgsz=cfg["imgsz"], verbose=False
+        ))
+        if box is not None and len(det):
+            det.xyxy = det.xyxy + np.array([box[0], box[1], box[0], box[1]], np.float32)
+        return self._calibrate(det, cfg)
+
+    def _publish(self, **fields):
+        with self._lock:
+            snap = self._snap
+            self._snap = CameraSnapshot(**{**snap.__dict__, **fields})
+
+    def _run(self):
+        pin_current_thread(self.cores)
+        cap = open_capture(self.source)
+        replay = is_recording(self.source)
+        try:
+            if not cap.isOpened():
+                self._publish(error=f"Cannot open camera {self.source}", running=False)
+                return
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+
+            t_start = time.time()
+            n = 0
+            gate = GateStats()
+            smoother = TemporalSmoother(self.model.names)
+            while not self._stop.is_set():
+                if time.time() - self._last_poll > self.idle_timeout:
+                    break
+                t_loop = time.time()
+                ret, frame = cap.read()
+                if not ret:
+                    if replay:
+                        self._publish(error=f"Replay finished ({n} frames)")
+                        break
+                    time.sleep(0.05)
+                    continue
+
+                with self._lock:
+                    cfg = dict(self._settings)
+                decision = gate_frame(frame, cfg["min_leaf"], cfg["roi"], cfg["crop_leaves"])
+                infer_ms = 0.0
+                det = Detections()
+                if decision.run:
+                    t0 = time.time()
+                    det = self._predict(frame, decision.box, cfg)
+                    infer_ms = (time.time() - t0) * 1000
+                gate.record(decision, infer_ms)
+                stable = []
+                if cfg["smooth"]:
+                    smoother.configure(window=cfg["smooth"])
+                    stable = smoother.update(det)
+                if self.recorder is not None:
+                    self.recorder.write(frame, det)
+                annotated, dets = annotate_image(
+                    frame, det, self.model,
+                    cfg["show_lbl"], cfg["show_cf"], cfg["bcolor"]
+                )
+
+                if self.alerts is not None:
+                    self.alerts.observe(dets, self.source, frame.shape)
+
+                n += 1
+                elapsed_total = time.time() - t_start
+                fps = n / elapsed_total if elapsed_total > 0 else 0
+                annotated = draw_hud(annotated, fps, len(dets), cfg["hud"])
+                if self.hub is not None:
+                    self.hub.publish(self.stream_id, annotated, dets)
+
+                self._publish(
+                    seq=self._snap.seq + 1,
+                    frame_rgb=cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB),
+                    dets=dets, fps=fps, frame_count=n, infer_ms=infer_ms,
+                    skip_rate=gate.skip_rate, saved_ms=gate.saved_ms, stable=stable,
+                )
+
+                # Throttle (replays run as fast as inference allows)
+                sleep_t = 1.0 / cfg["max_fps"] - (time.time() - t_loop)
+                if sleep_t > 0 and not replay:
+                    self._stop.wait(sleep_t)
+        except Exception as e:
+            self._publish(error=str(e))
+        finally:
+            cap.release()
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
+            self._publish(running=False)
+
+
+# ══════════════════════════════════════════════
+# MULTI-SOURCE
+# ══════════════════════════════════════════════
+def parse_source(text):
+    """``"0"`` → camera index 0, anything else is used as a file path / URL."""
+    text = str(text).strip()
+    return int(text) if text.isdigit() else text
+
+
+def is_file_source(source) -> bool:
+    return not isinstance(source, int)
+
+
+class FrameGrabber:
+    """
+    Reads one source as fast as it delivers frames and keeps only the newest.
+
+    Video files and recording directories stand in for cameras: they are paced
+    at their native frame rate and loop at the end, so a recording behaves like
+    a live feed.
+    """
+
+    def __init__(self, source, width=1280, height=720, cores=None):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.cores = cores
+        self.error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._frame = None
+        self._seq = 0
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"leafscan-grab-{self.source}",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def latest(self):
+        """(seq, frame) of the newest frame; frame is None before the first read."""
+        with self._lock:
+            return self._seq, self._frame
+
+    def _run(self):
+        pin_current_thread(self.cores)
+        cap = open_capture(self.source)
+        try:
+            if not cap.isOpened():
+                self.error = f"Cannot open source {self.source}"
+                return
+            file_src = is_file_source(self.source)
+            if file_src:
+                src_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+                frame_interval = 1.0 / src_fps
+            else:
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+                frame_interval = 0.0
+            while not self._stop.is_set():
+                t_loop = time.time()
+                ret, frame = cap.read()
+                if not ret:
+                    if file_src:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)   # loop the recording
+                    else:
+                        self._stop.wait(0.05)
+                    continue
+                with self._lock:
+                    self._frame = frame
+                    self._seq += 1
+                sleep_t = frame_interval - (time.time() - t_loop)
+                if sleep_t > 0:
+                    self._stop.wait(sleep_t)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            cap.release()
+
+
+class MultiCameraWorker(CameraWorker):
+    """
+    Several sources, one model. Each source has its own ``FrameGrabber``; a
+    single inference thread takes the newest frame from every source that has
+    a new one and runs them through one batched ``model.predict`` per tick.
+
+    ``snapshots()`` returns one ``CameraSnapshot`` per source (per-camera FPS
+    and detections); ``snapshot()`` returns an aggregate for the page metrics.
+    """
+
+    def __init__(self, sources, model, **kwargs):
+        super().__init__(list(sources), model, **kwargs)
+        self._snaps = [CameraSnapshot() for _ in self.source]
+
+    def start(self):
+        if self.running:
+            return
+        self._snaps = [CameraSnapshot(running=True) for _ in self.source]
+        super().start()
+
+    def snapshots(self) -> list:
+        self._last_poll = time.time()
+        with self._lock:
+            return list(self._snaps)
+
+    def _run(self):
+        pin_current_thread(self.cores)
+        grabbers = [FrameGrabber(s, self.width, self.height, self.prep_cores)
+                    for s in self.source]
+        for g in grabbers:
+            g.start()
+        n_src = len(grabbers)
+        last_seq = [0] * n_src
+        counts = [0] * n_src
+        gates = [GateStats() for _ in grabbers]
+        smoothers = [TemporalSmoother(self.model.names) for _ in grabbers]
+        t_start = time.time()
+        n_ticks = 0
+        try:
+            while not self._stop.is_set():
+                if time.time() - self._last_poll > self.idle_timeout:
+                    break
+                t_loop = time.time()
+
+                # Newest unseen frame from every source
+                batch_idx, batch = [], []
+                for i, g in enumerate(grabbers):
+                    seq, frame = g.latest()
+                    if frame is not None and seq != last_seq[i]:
+                        last_seq[i] = seq
+                        batch_idx.append(i)
+                        batch.append(frame)
+
+                if batch:
+                    with self._lock:
+                        cfg = dict(self._settings)
+                    # Leaf gate: only frames with foliage go into the batch
+                    decisions = [gate_frame(f, cfg["min_leaf"], cfg["roi"], cfg["crop_leaves"])
+                                 for f in batch]
+                    crops = [f if d.box is None else f[d.box[1]:d.box[3], d.box[0]:d.box[2]]
+                             for f, d in zip(batch, decisions) if d.run]
+                    t0 = time.time()
+                    results = iter(self.model.predict(
+                        crops, conf=self._raw_conf(cfg), iou=cfg["iou"],
+                        imgsz=cfg["imgsz"], verbose=False
+                    ) if crops else [])
+                    infer_ms = (time.time() - t0) * 1000
+                    per_frame_ms = infer_ms / len(crops) if crops else 0.0
+                    n_ticks += 1
+                    elapsed_total = time.time() - t_start
+
+                    updates = {}
+                    for i, frame, d in zip(batch_idx, batch, decisions):
+                        det = Detections()
+                        if d.run:
+                            r = next(results)
+                            det = r if isinstance(r, Detections) else Detections.from_result(r)
+                            det = self._calibrate(det, cfg)
+                            if d.box is not None and len(det):
+                                det.xyxy = det.xyxy + np.array(
+                                    [d.box[0], d.box[1], d.box[0], d.box[1]], np.float32)
+                        gates[i].record(d, per_frame_ms)
+                        stable = []
+                        if cfg["smooth"]:
+                            smoothers[i].configure(window=cfg["smooth"])
+                            stable = smoothers[i].update(det)
+                        annotated, dets = annotate_image(
+                            frame, det, self.model,
+                            cfg["show_lbl"], cfg["show_cf"], cfg["bcolor"]
+                        )
+                        if self.alerts is not None:
+                            self.alerts.observe(dets, self.source[i], frame.shape)
+                        counts[i] += 1
+                        fps = counts[i] / elapsed_total if elapsed_total > 0 else 0
+                        annotated = draw_hud(annotated, fps, len(dets), cfg["hud"])
+                        if self.hub is not None:
+                            self.hub.publish(f"{self.stream_id}-{i}", annotated, dets)
+                        updates[i] = dict(
+                            frame_rgb=cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB),
+                            dets=dets, fps=fps, frame_count=counts[i], infer_ms=infer_ms,
+                            skip_rate=gates[i].skip_rate, saved_ms=gates[i].saved_ms,
+                            stable=stable,
+                        )
+
+                    with self._lock:
+                        for i, u in updates.items():
+                            s = self._snaps[i]
+                            self._snaps[i] = CameraSnapshot(**{**s.__dict__, **u, "seq": s.seq + 1})
+                        self._snap = CameraSnapshot(
+                            seq=self._snap.seq + 1, running=True,
+                            dets=[d for s in self._snaps for d in s.dets],
+                            stable=[t for s in self._snaps for t in s.stable],
+                            fps=n_ticks / elapsed_total if elapsed_total > 0 else 0,
+                            frame_count=sum(counts), infer_ms=infer_ms,
+                            skip_rate=(sum(g.skipped for g in gates)
+                                       / max(1, sum(g.frames for g in gates))),
+                            saved_ms=sum(g.saved_ms for g in gates),
+                        )
+
+                with self._lock:
+                    for i, g in enumerate(grabbers):
+                        if g.error and self._snaps[i].error != g.error:
+                            self._snaps[i] = CameraSnapshot(**{**self._snaps[i].__dict__,
+                                                               "error": g.error})
+                if all(g.error or not g.alive for g in grabbers):
+                    self._publish(error="; ".join(g.error for g in grabbers if g.error)
+                                  or "All sources ended")
+                    break
+
+                # Throttle
+                with self._lock:
+                    max_fps = self._settings["max_fps"]
+                sleep_t = 1.0 / max_fps - (time.time() - t_loop)
+                if sleep_t > 0:
+                    self._stop.wait(sleep_t)
+        except Exception as e:
+            self._publish(error=str(e))
+        finally:
+            for g in grabbers:
+                g.stop()
+            with self._lock:
+                self._snaps = [CameraSnapshot(**{**s.__dict__, "running": False})
+                               for s in self._snaps]
+            self._publish(running=False)
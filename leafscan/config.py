@@ -0,0 +1,213 @@
+"""
+Server-wide defaults: typed config from a YAML file and environment variables.
+
+Precedence, lowest first: dataclass defaults → ``leafscan.yaml`` (or the file
+named by ``LEAFSCAN_CONFIG``) → ``LEAFSCAN_<SECTION>_<FIELD>`` variables, e.g.
+``LEAFSCAN_DETECTION_CONF=0.5`` or ``LEAFSCAN_PERF_TORCH_THREADS=4``. Values
+are coerced to the field's type; unknown keys and values outside ``LIMITS``
+(the ranges and choices the sidebar widgets accept) are an error.
+
+Example ``leafscan.yaml``::
+
+    detection:
+      weights: models/orchard_v3.pt
+      conf: 0.45
+    camera:
+      width: 1920
+      height: 1080
+    perf:
+      torch_threads: 4
+      pin: true
+
+``ConfigWatcher`` re-reads the file when its mtime changes, so edits apply to
+the next script run of every session without a restart. A file that fails to
+parse leaves the last good config in place and sets ``error``.
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+
+ENV_PREFIX = "LEAFSCAN_"
+DEFAULT_PATH = "leafscan.yaml"
+IMG_SIZES = [320, 416, 512, 640, 768, 1024]
+
+# "section.field" → (min, max) inclusive, or a set of allowed values
+LIMITS = {
+    "detection.conf": (0.10, 0.95),
+    "detection.iou": (0.10, 0.90),
+    "detection.img_size": set(IMG_SIZES),
+    "camera.index": (0, 3),
+    "camera.width": (1, 8192),
+    "camera.height": (1, 8192),
+    "camera.max_fps": (5, 30),
+    "camera.idle_timeout": (1.0, float("inf")),
+    "camera.hud": {"bottom", "top", "off"},
+    "camera.stream_port": (1, 65535),
+    "camera.stream_quality": (1, 100),
+    "history.cap": (1, float("inf")),
+    "history.page": (1, float("inf")),
+    "perf.workers": (1, float("inf")),
+    "perf.torch_threads": (0, float("inf")),
+    "perf.interop_threads": (0, float("inf")),
+    "perf.cv2_threads": (-1, float("inf")),
+    "perf.procs": (0, float("inf")),
+    "perf.batch": (1, float("inf")),
+    "perf.encoded_cache_mb": (0, float("inf")),
+    "perf.thumb_cache_mb": (0, float("inf")),
+}
+
+
+@dataclass(frozen=True)
+class DetectionConfig:
+    weights: str = "best.pt"
+    conf: float = 0.40
+    iou: float = 0.50
+    img_size: int = 640
+    device: str = ""              # "" = ultralytics default, "cpu", "cuda:0", "mps"
+
+
+@dataclass(frozen=True)
+class CameraConfig:
+    index: int = 0
+    width: int = 1280
+    height: int = 720
+    max_fps: int = 15
+    idle_timeout: float = 30.0
+    hud: str = "bottom"           # "bottom" | "top" | "off"
+    stream_host: str = "127.0.0.1"   # HTTP frame transport (leafscan.stream)
+    stream_port: int = 8765
+    stream_quality: int = 80
+
+
+@dataclass(frozen=True)
+class DisplayConfig:
+    show_conf: bool = True
+    show_labels: bool = True
+    box_color: str = "Forest Green"
+
+
+@dataclass(frozen=True)
+class HistoryConfig:
+    cap: int = 20_000
+    page: int = 24
+
+
+@dataclass(frozen=True)
+class PerfConfig:
+    workers: int = 1              # inference slots the cores are split between
+    torch_threads: int = 0        # 0 = derived from the core split
+    interop_threads: int = 1
+    cv2_threads: int = -1         # -1 = derived from the core split
+    pin: bool = False
+    procs: int = 0                # inference worker processes (0 = predict in the app process)
+    batch: int = 8                # survey / evaluation batch size
+    encoded_cache_mb: int = 64
+    thumb_cache_mb: int = 256
+
+
+@dataclass(frozen=True)
+class Config:
+    detection: DetectionConfig = field(default_factory=DetectionConfig)
+    camera: CameraConfig = field(default_factory=CameraConfig)
+    display: DisplayConfig = field(default_factory=DisplayConfig)
+    history: HistoryConfig = field(default_factory=HistoryConfig)
+    perf: PerfConfig = field(default_factory=PerfConfig)
+
+
+def _coerce(value, typ, where: str):
+    if typ is bool:
+        if isinstance(value, bool):
+            return value
+        s = str(value).strip().lower()
+        if s in ("1", "true", "yes", "on"):
+            return True
+        if s in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(f"{where}: expected a boolean, got {value!r}")
+    try:
+        return typ(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: expected {typ.__name__}, got {value!r}")
+
+
+def _section(cls, values: dict, where: str):
+    types = {f.name: f.type for f in fields(cls)}
+    unknown = set(values) - set(types)
+    if unknown:
+        raise ValueError(f"{where}: unknown key(s) {', '.join(sorted(unknown))}")
+    return {k: _coerce(v, types[k], f"{where}.{k}") for k, v in values.items()}
+
+
+def _validate(cfg: Config):
+    for key, limit in LIMITS.items():
+        section, name = key.split(".")
+        value = getattr(getattr(cfg, section), name)
+        if isinstance(limit, set):
+            if value not in limit:
+                raise ValueError(f"{key}: {value!r} not one of {', '.join(map(str, sorted(limit)))}")
+        elif not limit[0] <= value <= limit[1]:
+            raise ValueError(f"{key}: {value!r} outside [{limit[0]}, {limit[1]}]")
+
+
+def load_config(path=None, env=None) -> Config:
+    env = os.environ if env is None else env
+    path = Path(path or env.get(ENV_PREFIX + "CONFIG", DEFAULT_PATH))
+    raw = {}
+    if path.exists():
+        import yaml     # ships with ultralytics
+        raw = yaml.safe_load(path.read_text()) or {}
+        if not isinstance(raw, dict):
+            raise ValueError(f"{path}: top level must be a mapping")
+    sections = {f.name: f for f in fields(Config)}
+    unknown = set(raw) - set(sections)
+    if unknown:
+        raise ValueError(f"{path}: unknown section(s) {', '.join(sorted(unknown))}")
+
+    cfg = Config()
+    for name in sections:
+        current = getattr(cfg, name)
+        values = _section(type(current), raw.get(name) or {}, f"{path.name}:{name}")
+        for f in fields(current):
+            key = f"{ENV_PREFIX}{name}_{f.name}".upper()
+            if key in env:
+                values[f.name] = _coerce(env[key], f.type, key)
+        cfg = replace(cfg, **{name: replace(current, **values)})
+    _validate(cfg)
+    return cfg
+
+
+class ConfigWatcher:
+    """Hot-reloading holder; ``get()`` costs one ``stat`` when nothing changed."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.environ.get(ENV_PREFIX + "CONFIG", DEFAULT_PATH))
+        self._lock = threading.Lock()
+        self._stamp = None
+        self.config = Config()
+        self.version = 0
+        self.error = None
+
+    def _current_stamp(self):
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        env = tuple(sorted((k, v) for k, v in os.environ.items() if k.startswith(ENV_PREFIX)))
+        return mtime, env
+
+    def get(self) -> Config:
+        stamp = self._current_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._stamp = stamp
+                try:
+                    cfg = load_config(self.path)
+                    self.error = None
+                    if cfg != self.config or self.version == 0:
+                        self.config = cfg
+                        self.version += 1
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+            return self.config
@@ -0,0 +1,231 @@
+"""
+Core detection helpers shared by the Streamlit app and the background workers.
+Nothing in here imports streamlit, so it is safe to use from threads and tools.
+"""
+
+import cv2
+import numpy as np
+from datetime import datetime
+from functools import lru_cache
+
+from .render import draw_boxes, draw_label
+
+
+# ══════════════════════════════════════════════
+# DISEASE DATABASE
+# ══════════════════════════════════════════════
+DISEASE_INFO = {
+    "apple_scab": {
+        "display": "Apple Scab",
+        "severity": "Moderate",
+        "color": "#8B6914",
+        "bg": "rgba(139,105,20,0.12)",
+        "icon": "🟤",
+        "description": "Caused by the fungus Venturia inaequalis. Appears as olive-green to brown velvety spots on leaves.",
+        "symptoms": ["Olive-green or brown velvety lesions", "Yellowing around infected areas", "Premature leaf drop", "Distorted leaves"],
+        "treatment": ["Apply fungicide (Captan, Mancozeb) at bud break", "Remove and destroy infected leaves", "Prune for better air circulation", "Apply dormant oil spray in early spring"],
+        "prevention": ["Plant resistant varieties", "Avoid overhead irrigation", "Rake and destroy fallen leaves", "Apply lime sulfur before bud break"],
+        "severity_score": 6,
+    },
+    "black_rot": {
+        "display": "Black Rot",
+        "severity": "Severe",
+        "color": "#c0392b",
+        "bg": "rgba(192,57,43,0.12)",
+        "icon": "🔴",
+        "description": "Caused by Botryosphaeria obtusa. Produces circular lesions with purple margins that turn brown-black.",
+        "symptoms": ["Circular lesions with purple margins", "Brown-black center with concentric rings", "Frog-eye appearance", "Cankers on branches"],
+        "treatment": ["Remove and destroy infected plant parts", "Apply copper-based fungicide", "Prune cankers 15cm beyond visible infection", "Bordeaux mixture applications"],
+        "prevention": ["Remove mummified fruits and dead wood", "Maintain tree vigor through fertilization", "Avoid wounding bark", "Proper spacing for air circulation"],
+        "severity_score": 9,
+    },
+    "cedar_apple_rust": {
+        "display": "Cedar Apple Rust",
+        "severity": "High",
+        "color": "#e67e22",
+        "bg": "rgba(230,126,34,0.12)",
+        "icon": "🟠",
+        "description": "Caused by Gymnosporangium juniperi-virginianae. Requires both cedar/juniper and apple as alternate hosts.",
+        "symptoms": ["Bright orange-yellow spots on upper leaf surface", "Tube-like structures on leaf undersides", "Premature defoliation", "Fruit deformation"],
+        "treatment": ["Apply myclobutanil or triadimefon fungicide", "Start treatments at pink bud stage", "Repeat every 7–10 days during wet spring", "Remove nearby juniper/cedar if possible"],
+        "prevention": ["Plant resistant apple varieties", "Remove nearby juniper galls in winter", "Avoid planting apple near cedar trees", "Apply protective fungicides in spring"],
+        "severity_score": 7,
+    },
+    "healthy": {
+        "display": "Healthy Leaf",
+        "severity": "None",
+        "color": "#27ae60",
+        "bg": "rgba(39,174,96,0.12)",
+        "icon": "🟢",
+        "description": "The leaf shows no signs of disease. Continue regular monitoring and preventive care.",
+        "symptoms": ["No visible lesions", "Uniform green color", "Normal leaf structure", "Healthy veination"],
+        "treatment": ["No treatment required", "Maintain regular watering schedule", "Continue balanced fertilization", "Monitor periodically"],
+        "prevention": ["Regular scouting every 7–10 days", "Maintain tree health with proper nutrition", "Ensure good air circulation", "Remove fallen leaves in autumn"],
+        "severity_score": 0,
+    },
+    "unknown": {
+        "display": "Unknown Class",
+        "severity": "—",
+        "color": "#7f8c8d",
+        "bg": "rgba(127,140,141,0.12)",
+        "icon": "⚪",
+        "description": "The model has detected an object with a custom class label from your training data.",
+        "symptoms": ["Refer to your dataset labels"],
+        "treatment": ["Refer to domain-specific guidance"],
+        "prevention": ["Monitor regularly"],
+        "severity_score": 5,
+    },
+}
+
+@lru_cache(maxsize=256)
+def get_disease_info(class_name: str) -> dict:
+    """Match detected class name to disease info."""
+    cn = class_name.lower().replace(" ", "_").replace("-", "_")
+    for key in DISEASE_INFO:
+        if key in cn or cn in key:
+            return DISEASE_INFO[key]
+    # Try partial match
+    for key, val in DISEASE_INFO.items():
+        if key.split("_")[0] in cn:
+            return val
+    info = DISEASE_INFO["unknown"].copy()
+    info["display"] = class_name
+    return info
+
+
+# ══════════════════════════════════════════════
+# MODEL LOADER
+# ══════════════════════════════════════════════
+def load_yolo(path: str):
+    """Load YOLO weights. Returns (model, error_message)."""
+    try:
+        from ultralytics import YOLO
+        m = YOLO(path)
+        return m, None
+    except ImportError:
+        return None, "ultralytics not installed → pip install ultralytics"
+    except Exception as e:
+        return None, str(e)
+
+
+# ══════════════════════════════════════════════
+# DETECTIONS
+# ══════════════════════════════════════════════
+class Detections:
+    """
+    Plain NumPy detections for one image: ``xyxy`` (N,4) float32 in pixels,
+    ``conf`` (N,) float32 and ``cls`` (N,) int32 class ids of the model.
+    Used wherever boxes are produced by something other than a single
+    ``model.predict`` call (fusion, cached predictions, worker processes).
+    """
+    __slots__ = ("xyxy", "conf", "cls")
+
+    def __init__(self, xyxy=None, conf=None, cls=None):
+        self.xyxy = np.zeros((0, 4), np.float32) if xyxy is None else np.asarray(xyxy, np.float32).reshape(-1, 4)
+        self.conf = np.zeros(0, np.float32) if conf is None else np.asarray(conf, np.float32).reshape(-1)
+        self.cls  = np.zeros(0, np.int32) if cls is None else np.asarray(cls, np.int32).reshape(-1)
+
+    @classmethod
+    def from_result(cls, r):
+        """From one ultralytics ``Results`` object."""
+        b = r.boxes
+        if b is None or len(b) == 0:
+            return cls()
+        return cls(b.xyxy.cpu().numpy(), b.conf.cpu().numpy(), b.cls.cpu().numpy())
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, idx):
+        return Detections(self.xyxy[idx], self.conf[idx], self.cls[idx])
+
+
+class Det:
+    """
+    One drawn detection. Only the class name, confidence and box are stored;
+    display fields (``display``, ``icon``, ``color``, ``bg``, ``severity``)
+    are looked up in DISEASE_INFO on access. Supports ``d["key"]`` access.
+    """
+    __slots__ = ("name", "conf", "box")
+
+    def __init__(self, name: str, conf: float, box: tuple):
+        self.name = name
+        self.conf = conf
+        self.box = box
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    @property
+    def display(self):
+        return get_disease_info(self.name)["display"]
+
+    @property
+    def icon(self):
+        return get_disease_info(self.name)["icon"]
+
+    @property
+    def color(self):
+        return get_disease_info(self.name)["color"]
+
+    @property
+    def bg(self):
+        return get_disease_info(self.name)["bg"]
+
+    @property
+    def severity(self):
+        return get_disease_info(self.name)["severity"]
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "conf": self.conf, "box": list(self.box)}
+
+
+def as_detections(results) -> Detections:
+    """Accept either ``model.predict`` output or ``Detections``."""
+    if isinstance(results, Detections):
+        return results
+    return Detections.from_result(results[0])
+
+
+# ══════════════════════════════════════════════
+# DRAWING
+# ══════════════════════════════════════════════
+def annotate_image(image_bgr, results, model, show_lbl=True, show_cf=True, bcolor=(45,106,79), thick=2):
+    """Draw YOLO bounding boxes on image. ``results`` is predict output or ``Detections``."""
+    out = image_bgr.copy()
+    det = as_detections(results)
+    boxes = det.xyxy.astype(np.int32)
+    draw_boxes(out, boxes, bcolor, thick)
+    dets = []
+    for (x1, y1, x2, y2), conf, cls_id in zip(boxes.tolist(), det.conf.tolist(), det.cls.tolist()):
+        name = model.names.get(cls_id, str(cls_id))
+
+        # Label (cached sprite per text / colour)
+        if show_lbl or show_cf:
+            label = ""
+            if show_lbl: label += get_disease_info(name)["display"]
+            if show_cf:  label += f"  {conf:.2f}"
+            draw_label(out, label, x1, y1, bcolor)
+
+        dets.append(Det(name, conf, (x1, y1, x2, y2)))
+    return out, dets
+
+
+def draw_hud(annotated, fps: float, n_dets: int, position: str = "bottom"):
+    """Translucent status bar along the bottom (or top) of a camera frame; ``"off"`` skips it."""
+    if position == "off":
+        return annotated
+    h, w = annotated.shape[:2]
+    y0 = 0 if position == "top" else h - 36
+    overlay = annotated.copy()
+    cv2.rectangle(overlay, (0, y0), (w, y0 + 36), (26,42,26), -1)
+    annotated = cv2.addWeighted(overlay, 0.6, annotated, 0.4, 0)
+    ts = datetime.now().strftime("%H:%M:%S")
+    cv2.putText(annotated,
+        f"LeafScan  |  {ts}  |  {fps:.1f} fps  |  {n_dets} det",
+        (10, y0 + 26), cv2.FONT_HERSHEY_SIMPLEX, 0.45,
+        (180,220,180), 1, cv2.LINE_AA)
+    return annotated
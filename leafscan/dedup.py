@@ -0,0 +1,248 @@
+"""
+Near-duplicate detection for uploads and survey batches.
+
+Scouts photograph the same leaf several times in a burst. Each image is
+reduced to a 64-bit perceptual hash — pHash (sign of the low 8×8 DCT band
+of a 32×32 grey copy against its median) or dHash (horizontal gradient signs
+of a 9×8 grey copy) — and looked up under Hamming distance.
+Anything within ``max_distance`` bits of an earlier image is a near-duplicate:
+the upload path reuses that image's cached candidates, the survey path skips
+it (if it was also taken at the same spot, via ``check(accept=…)``). Hashes
+are kept for every image; payloads only for the most recent ``max_payloads``.
+
+Lookups use multi-index hashing rather than a BK-tree: with 64-bit hashes
+and radii around 6, a BK-tree walk still visits a large share of the nodes,
+while probing four 16-bit substring tables stays well under a millisecond at
+100k+ images for radii up to 7. ``python -m leafscan.dedup`` measures both
+that and a NumPy linear scan.
+"""
+
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import combinations
+
+import cv2
+import numpy as np
+
+from .core import Detections
+
+
+def dhash(image_bgr) -> int:
+    grey = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY) if image_bgr.ndim == 3 else image_bgr
+    small = cv2.resize(grey, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def phash(image_bgr) -> int:
+    grey = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY) if image_bgr.ndim == 3 else image_bgr
+    small = cv2.resize(grey, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].ravel()
+    bits = low > np.median(low[1:])       # DC term excluded from the threshold
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+HASHES = {"phash": phash, "dhash": dhash}
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(bits: int, radius: int) -> tuple:
+    """XOR masks of every ``bits``-wide word within ``radius`` of zero."""
+    return tuple(sum(1 << b for b in c) for r in range(radius + 1)
+                 for c in combinations(range(bits), r))
+
+
+class MultiIndexHash:
+    """
+    Hamming-radius search over 64-bit ints (multi-index hashing).
+
+    Each hash is split into ``chunks`` 16-bit substrings, each with its own
+    table. Two hashes within ``radius`` bits agree to within ``radius //
+    chunks`` bits on at least one substring (pigeonhole), so a query probes
+    only those neighbourhoods of its own substrings and verifies the few
+    candidates found — no full scan, no tree walk.
+    """
+
+    def __init__(self, chunks: int = 4):
+        self.chunks = chunks
+        self.width = 64 // chunks
+        self._mask = (1 << self.width) - 1
+        self._tables = [{} for _ in range(chunks)]
+        self._hash = []
+        self._value = []
+
+    def __len__(self):
+        return len(self._hash)
+
+    def _keys(self, h: int):
+        return [(h >> (i * self.width)) & self._mask for i in range(self.chunks)]
+
+    def add(self, h: int, value=None):
+        idx = len(self._hash)
+        self._hash.append(h)
+        self._value.append(value)
+        for table, key in zip(self._tables, self._keys(h)):
+            table.setdefault(key, []).append(idx)
+
+    def search(self, h: int, radius: int) -> list:
+        """[(distance, hash, value)] within ``radius``, nearest first."""
+        masks = _flip_masks(self.width, radius // self.chunks)
+        cand = set()
+        for table, key in zip(self._tables, self._keys(h)):
+            for m in masks:
+                ids = table.get(key ^ m)
+                if ids:
+                    cand.update(ids)
+        out = []
+        for i in cand:
+            d = (h ^ self._hash[i]).bit_count()
+            if d <= radius:
+                out.append((d, self._hash[i], self._value[i]))
+        out.sort(key=lambda r: r[0])
+        return out
+
+    def nearest(self, h: int, radius: int):
+        found = self.search(h, radius)
+        return found[0] if found else None
+
+
+class DedupIndex:
+    """Hash index of seen images plus hit counters for the dedup ratio; thread-safe."""
+
+    def __init__(self, max_distance: int = 6, kind: str = "phash", max_payloads: int = 4096):
+        self.max_distance = max_distance
+        self.kind = kind
+        self.max_payloads = max_payloads
+        self.index = MultiIndexHash()
+        self._payloads = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.duplicates = 0
+        self.lookup_ms = 0.0
+
+    def __len__(self):
+        return len(self.index)
+
+    def hash(self, image_bgr) -> int:
+        return HASHES[self.kind](image_bgr)
+
+    def check(self, image_bgr, max_distance: int = None, accept=None):
+        """
+        (hash, None) for a new image, else (hash, (distance, payload)).
+
+        ``max_distance`` overrides the index default for this lookup only, so
+        callers sharing one index never change each other's matching. Hits
+        whose payload was evicted, or fails ``accept(payload)``, are misses.
+        """
+        h = self.hash(image_bgr)
+        radius = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            t0 = time.perf_counter()
+            hit = next((r for r in self.index.search(h, radius) if r[2] in self._payloads
+                        and (accept is None or accept(self._payloads[r[2]]))), None)
+            self.lookup_ms += (time.perf_counter() - t0) * 1000
+            self.lookups += 1
+            if hit is None:
+                return h, None
+            # Only a returned payload saves work, so only that counts as a duplicate
+            self.duplicates += 1
+            self._payloads.move_to_end(hit[2])
+            return h, (hit[0], self._payloads[hit[2]])
+
+    def add(self, h: int, payload=None):
+        with self._lock:
+            key = len(self.index)
+            self.index.add(h, key)
+            if payload is not None:
+                self._payloads[key] = payload
+                while len(self._payloads) > self.max_payloads:
+                    self._payloads.popitem(last=False)
+
+    @property
+    def ratio(self) -> float:
+        return self.duplicates / self.lookups if self.lookups else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"images": len(self), "lookups": self.lookups, "duplicates": self.duplicates,
+                    "ratio": self.ratio,
+                    "lookup_ms": self.lookup_ms / self.lookups if self.lookups else 0.0}
+
+
+def rescale_boxes(xyxy, src_shape, dst_shape):
+    """Boxes from an image of ``src_shape`` onto a near-duplicate of ``dst_shape``."""
+    sy, sx = dst_shape[0] / src_shape[0], dst_shape[1] / src_shape[1]
+    return np.asarray(xyxy, np.float32) * np.array([sx, sy, sx, sy], np.float32)
+
+
+def cached_candidates(index: DedupIndex, image_bgr, max_distance: int = None):
+    """
+    Upload lookup: ``(hash, None)``, or ``(hash, (distance, raw, from_fast))``
+    with the earlier image's candidates rescaled onto ``image_bgr``.
+    ``from_fast`` marks fast-path softmax scores, which the detector
+    calibrator must not be applied to.
+    """
+    h, hit = index.check(image_bgr, max_distance)
+    if hit is None:
+        return h, None
+    dist, (shape, raw, from_fast) = hit
+    return h, (dist, Detections(rescale_boxes(raw.xyxy, shape, image_bgr.shape),
+                                raw.conf, raw.cls), from_fast)
+
+
+def remember_candidates(index: DedupIndex, h: int, image_bgr, raw, from_fast: bool = False):
+    index.add(h, (image_bgr.shape, raw, from_fast))
+
+
+# ══════════════════════════════════════════════
+# BENCHMARK
+# ══════════════════════════════════════════════
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Multi-index hash lookup latency vs. linear scan")
+    ap.add_argument("--images", type=int, default=100_000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--distance", type=int, default=6)
+    ap.add_argument("--burst", type=int, default=5, help="near-duplicates per scene")
+    args = ap.parse_args(argv)
+
+    # Scenes with bursts of near-identical shots: a few flipped bits per copy
+    rng = np.random.default_rng(0)
+    n_scenes = args.images // args.burst
+    scenes = np.frombuffer(rng.bytes(8 * n_scenes), np.uint64)
+
+    def jitter(h, k):
+        for b in rng.choice(64, k, replace=False):
+            h ^= 1 << int(b)
+        return h
+
+    hashes = [jitter(int(s), int(rng.integers(0, 4))) for s in scenes for _ in range(args.burst)]
+    index = MultiIndexHash()
+    t0 = time.perf_counter()
+    for i, h in enumerate(hashes):
+        index.add(h, i)
+    build_s = time.perf_counter() - t0
+
+    queries = [jitter(int(scenes[i]), int(rng.integers(0, 8)))
+               for i in rng.integers(0, n_scenes, args.queries)]
+    t0 = time.perf_counter()
+    hits = sum(index.nearest(q, args.distance) is not None for q in queries)
+    mih_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+    arr = np.array(hashes, np.uint64)
+    popcount = np.array([bin(i).count("1") for i in range(256)], np.uint8)
+    t0 = time.perf_counter()
+    for q in queries[:200]:
+        x = (arr ^ np.uint64(q)).view(np.uint8).reshape(-1, 8)
+        int(popcount[x].sum(1, dtype=np.uint8).min())
+    scan_ms = (time.perf_counter() - t0) * 1000 / min(200, len(queries))
+
+    print(f"{len(index):,} hashes · built in {build_s:.2f}s · radius {args.distance}")
+    print(f"multi-index: {mih_ms:.3f} ms/lookup · {hits / len(queries):.0%} of queries matched")
+    print(f"linear scan (NumPy popcount): {scan_ms:.3f} ms/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Offline evaluation against a local YOLO-format dataset.
+
+    dataset/
+        data.yaml            (optional: ``names``, ``path``, ``val``)
+        images/val/*.jpg
+        labels/val/*.txt     one ``cls cx cy w h`` line per box, normalised
+
+Given the dataset root, only the ``val`` split is evaluated: the ``val:``
+entry of data.yaml (folders or image-list files, relative to ``path:``),
+else ``images/val``. A split folder is evaluated as is. Images that cannot
+be decoded are skipped and counted.
+
+Inference runs once per (weights hash, dataset, img_size, NMS IoU) at a very
+low confidence floor and the raw boxes are cached on disk. mAP@0.5,
+mAP@0.5:0.95, per-class precision/recall at the chosen confidence threshold
+and the confidence sweep are all computed from that cache, so moving the
+threshold never re-runs the model.
+
+CLI::
+
+    python -m leafscan.evaluate path/to/dataset --weights best.pt --imgsz 640
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .core import Detections, get_disease_info, load_yolo
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+CONF_FLOOR = 0.001
+CACHE_DIR = Path(".leafscan_cache") / "eval"
+
+
+# ══════════════════════════════════════════════
+# DATASET
+# ══════════════════════════════════════════════
+def label_path(img_path: Path) -> Path:
+    """YOLO convention: …/images/… → …/labels/…, same stem, ``.txt``."""
+    parts = list(img_path.parts)
+    if "images" in parts:
+        i = len(parts) - 1 - parts[::-1].index("images")
+        parts[i] = "labels"
+    return Path(*parts).with_suffix(".txt")
+
+
+def data_yaml(root: Path):
+    """data.yaml of the dataset at (or one level above) ``root``, if any."""
+    for cand in (root / "data.yaml", root.parent / "data.yaml"):
+        if cand.exists():
+            return cand
+    return None
+
+
+def _read_yaml(path: Path) -> dict:
+    import yaml     # ships with ultralytics
+    data = yaml.safe_load(path.read_text()) or {}
+    return data if isinstance(data, dict) else {}
+
+
+def read_names(root: Path):
+    cand = data_yaml(root)
+    if cand is not None:
+        names = _read_yaml(cand).get("names")
+        if isinstance(names, list):
+            return dict(enumerate(names))
+        if isinstance(names, dict):
+            return {int(k): v for k, v in names.items()}
+    return None
+
+
+def _images_under(path: Path) -> list:
+    if path.is_dir():
+        return [p for p in path.rglob("*") if p.suffix.lower() in IMAGE_EXTS]
+    if path.suffix == ".txt" and path.exists():
+        # Image-list file: one path per line, relative to the list's folder
+        return [(path.parent / l.strip()).resolve() for l in path.read_text().splitlines()
+                if l.strip()]
+    return []
+
+
+def split_images(root: Path, split: str = "val") -> list:
+    """Images of ``split`` when ``root`` is a dataset root, else everything under ``root``."""
+    yaml_path = root / "data.yaml"
+    if split and yaml_path.exists():
+        data = _read_yaml(yaml_path)
+        entries = data.get(split)
+        if entries:
+            base = Path(data.get("path") or "")
+            base = base if base.is_absolute() else root / base
+            entries = entries if isinstance(entries, list) else [entries]
+            return sorted({p for e in entries for p in _images_under(base / e)})
+    if split and (root / "images" / split).is_dir():
+        return sorted(_images_under(root / "images" / split))
+    return sorted(_images_under(root))
+
+
+def load_dataset(root, split: str = "val"):
+    """
+    (image paths, labels, names) for ``split`` (None = every image under
+    ``root``). ``labels[i]`` is (n,5): cls + normalised xyxy.
+    """
+    root = Path(root)
+    images = split_images(root, split)
+    labels = []
+    for p in images:
+        lp = label_path(p)
+        arr = np.zeros((0, 5), np.float32)
+        if lp.exists():
+            rows = [l.split() for l in lp.read_text().splitlines() if l.strip()]
+            if rows:
+                a = np.array([r[:5] for r in rows], np.float32)
+                cx, cy, w, h = a[:, 1], a[:, 2], a[:, 3], a[:, 4]
+                arr = np.stack([a[:, 0], cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], 1)
+        labels.append(arr)
+    return images, labels, read_names(root)
+
+
+def dataset_signature(images, root=None) -> str:
+    h = hashlib.sha1()
+    cand = data_yaml(Path(root)) if root is not None else None
+    if cand is not None:
+        h.update(cand.read_bytes())       # split and names both live here
+    for p in images:
+        st = p.stat()
+        h.update(f"{p}:{st.st_size}:{st.st_mtime_ns}".encode())
+        lp = label_path(p)
+        if lp.exists():
+            h.update(str(lp.stat().st_mtime_ns).encode())
+    return h.hexdigest()[:16]
+
+
+def weights_hash(path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+# ══════════════════════════════════════════════
+# METRICS
+# ══════════════════════════════════════════════
+def box_iou(a, b):
+    """IoU matrix between (N,4) and (M,4) xyxy boxes."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / np.maximum(area_a[:, None] + area_b[None] - inter, 1e-9)
+
+
+def match_image(pred_xyxy, pred_conf, pred_cls, gt_xyxy, gt_cls):
+    """
+    (n_pred, len(IOU_THRESHOLDS)) true-positive matrix. Predictions are taken
+    in descending confidence and matched greedily to the best unmatched
+    ground truth of the same class at each IoU threshold.
+    """
+    tp = np.zeros((len(pred_conf), len(IOU_THRESHOLDS)), bool)
+    if len(pred_conf) == 0 or len(gt_cls) == 0:
+        return tp
+    iou = box_iou(pred_xyxy, gt_xyxy)
+    iou[pred_cls[:, None] != gt_cls[None, :]] = 0.0
+    order = np.argsort(-pred_conf)
+    for t, thr in enumerate(IOU_THRESHOLDS):
+        taken = np.zeros(len(gt_cls), bool)
+        for i in order:
+            cand = np.where(taken, 0.0, iou[i])
+            j = int(np.argmax(cand))
+            if cand[j] >= thr:
+                taken[j] = True
+                tp[i, t] = True
+    return tp
+
+
+def average_precision(tp, conf, n_gt: int):
+    """AP per IoU threshold (101-point interpolated) for one class."""
+    if n_gt == 0 or len(conf) == 0:
+        return np.zeros(tp.shape[1])
+    order = np.argsort(-conf)
+    tpc = np.cumsum(tp[order], 0)
+    fpc = np.cumsum(~tp[order], 0)
+    recall = tpc / n_gt
+    precision = tpc / np.maximum(tpc + fpc, 1e-9)
+    grid = np.linspace(0, 1, 101)
+    ap = np.zeros(tp.shape[1])
+    for t in range(tp.shape[1]):
+        # precision envelope, then sample at recall grid
+        env = np.flip(np.maximum.accumulate(np.flip(precision[:, t])))
+        idx = np.searchsorted(recall[:, t], grid, side="left")
+        ap[t] = np.where(idx < len(env), env[np.minimum(idx, len(env) - 1)], 0).mean()
+    return ap
+
+
+@dataclass
+class EvalReport:
+    key: str
+    images: int
+    ms_per_image: float
+    map50: float = 0.0
+    map50_95: float = 0.0
+    conf: float = 0.4
+    per_class: list = field(default_factory=list)
+    sweep: list = field(default_factory=list)
+    best_conf: float = 0.4
+    cached: bool = False
+    skipped: int = 0        # images that could not be decoded
+
+    @property
+    def images_per_s(self) -> float:
+        return 1000.0 / self.ms_per_image if self.ms_per_image else 0.0
+
+
+def compute_metrics(cache: dict, names: dict, conf: float, key: str = "") -> EvalReport:
+    """All metrics from cached raw predictions and labels."""
+    pc, pconf, tp = cache["pred_cls"], cache["pred_conf"], cache["tp"]
+    gt_cls = cache["gt_cls"]
+    rows, aps = [], []
+    classes = set(np.unique(gt_cls).tolist()) | set(np.unique(pc).tolist())
+    for c in sorted(c for c in classes if c >= 0):    # -1: dataset class the model lacks
+        m = pc == c
+        n_gt = int((gt_cls == c).sum())
+        ap = average_precision(tp[m], pconf[m], n_gt)
+        keep = m & (pconf >= conf)
+        n_tp = int(tp[keep, 0].sum())
+        n_pred = int(keep.sum())
+        name = names.get(int(c), str(c))
+        rows.append({
+            "class": name, "display": get_disease_info(name)["display"], "gt": n_gt,
+            "precision": n_tp / n_pred if n_pred else 0.0,
+            "recall": n_tp / n_gt if n_gt else 0.0,
+            "ap50": float(ap[0]), "ap50_95": float(ap.mean()),
+        })
+        if n_gt:
+            aps.append(ap)
+    aps = np.array(aps) if aps else np.zeros((1, len(IOU_THRESHOLDS)))
+
+    # Confidence sweep (micro-averaged over classes, TP at IoU 0.5)
+    n_gt_all = max(len(gt_cls), 1)
+    sweep = []
+    for c in np.round(np.arange(0.05, 0.96, 0.05), 2):
+        keep = pconf >= c
+        n_tp = int(tp[keep, 0].sum())
+        p = n_tp / max(int(keep.sum()), 1)
+        r = n_tp / n_gt_all
+        sweep.append({"conf": float(c), "precision": p, "recall": r,
+                      "f1": 2 * p * r / max(p + r, 1e-9)})
+    best = max(sweep, key=lambda s: s["f1"])["conf"] if sweep else conf
+
+    return EvalReport(key=key, images=int(cache["n_images"]),
+                      ms_per_image=float(cache["ms_per_image"]),
+                      map50=float(aps[:, 0].mean()), map50_95=float(aps.mean()),
+                      conf=conf, per_class=rows, sweep=sweep, best_conf=best,
+                      skipped=int(cache.get("skipped", 0)))
+
+
+# ══════════════════════════════════════════════
+# RUN
+# ══════════════════════════════════════════════
+def _remap(gt_cls, ds_names, model_names):
+    """Dataset class ids → model class ids (by name when data.yaml is present)."""
+    if not ds_names:
+        return gt_cls
+    by_name = {v: k for k, v in model_names.items()}
+    lut = {k: by_name.get(v, -1) for k, v in ds_names.items()}
+    return np.array([lut.get(int(c), -1) for c in gt_cls], np.int32)
+
+
+def run_predictions(model, images, labels, ds_names, imgsz: int, iou: float,
+                    batch: int = 8, progress=None) -> dict:
+    """Batched inference + matching; returns the cacheable arrays."""
+    p_cls, p_conf, tps, g_cls = [], [], [], []
+    infer_s = 0.0
+    skipped = 0
+    for start in range(0, len(images), batch):
+        paths = images[start:start + batch]
+        frames = [cv2.imread(str(p)) for p in paths]
+        # Unreadable / corrupt files are skipped, not fatal
+        ok = [i for i, f in enumerate(frames) if f is not None]
+        skipped += len(frames) - len(ok)
+        frames = [frames[i] for i in ok]
+        batch_labels = [labels[start + i] for i in ok]
+        t0 = time.perf_counter()
+        results = model.predict(frames, conf=CONF_FLOOR, iou=iou, imgsz=imgsz,
+                                verbose=False) if frames else []
+        infer_s += time.perf_counter() - t0
+        for frame, r, lab in zip(frames, results, batch_labels):
+            h, w = frame.shape[:2]
+            d = Detections.from_result(r)
+            gcls = _remap(lab[:, 0].astype(np.int32), ds_names, model.names)
+            gxy = lab[:, 1:] * np.array([w, h, w, h], np.float32)
+            tps.append(match_image(d.xyxy, d.conf, d.cls, gxy, gcls))
+            p_cls.append(d.cls); p_conf.append(d.conf); g_cls.append(gcls)
+        if progress:
+            progress(min(1.0, (start + len(paths)) / len(images)))
+    cat = lambda xs, dt: np.concatenate(xs).astype(dt) if xs else np.zeros(0, dt)
+    return {
+        "pred_cls": cat(p_cls, np.int32), "pred_conf": cat(p_conf, np.float32),
+        "tp": np.concatenate(tps) if tps else np.zeros((0, len(IOU_THRESHOLDS)), bool),
+        "gt_cls": cat(g_cls, np.int32),
+        "n_images": len(images) - skipped,
+        "skipped": skipped,
+        "ms_per_image": 1000.0 * infer_s / max(len(images) - skipped, 1),
+    }
+
+
+def load_cache(key: str, cache_dir=CACHE_DIR):
+    """Cached arrays for an ``EvalReport.key`` (None if missing)."""
+    f = Path(cache_dir) / f"{key}.npz"
+    if not f.exists():
+        return None
+    with np.load(f) as z:
+        return {k: z[k] for k in z.files}
+
+
+def evaluate(dataset, weights, conf: float = 0.4, iou: float = 0.5, imgsz: int = 640,
+             model=None, batch: int = 8, progress=None, cache_dir=CACHE_DIR) -> EvalReport:
+    images, labels, ds_names = load_dataset(dataset)
+    if not images:
+        raise FileNotFoundError(f"No images under {dataset}")
+    key = f"{weights_hash(weights)}-{dataset_signature(images, dataset)}-{imgsz}-{iou:.2f}"
+    cache_file = Path(cache_dir) / f"{key}.npz"
+    if model is None:
+        model, err = load_yolo(str(weights))
+        if err:
+            raise RuntimeError(err)
+
+    cache = load_cache(key, cache_dir)
+    cached = cache is not None
+    if not cached:
+        cache = run_predictions(model, images, labels, ds_names, imgsz, iou, batch, progress)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(cache_file, **cache)
+
+    report = compute_metrics(cache, model.names, conf, key)
+    report.cached = cached
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Evaluate weights on a YOLO-format dataset")
+    ap.add_argument("dataset")
+    ap.add_argument("--weights", default="best.pt")
+    ap.add_argument("--conf", type=float, default=0.40)
+    ap.add_argument("--iou", type=float, default=0.50)
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--batch", type=int, default=8)
+    args = ap.parse_args(argv)
+
+    r = evaluate(args.dataset, args.weights, args.conf, args.iou, args.imgsz, batch=args.batch)
+    print(f"{r.images} images · {r.ms_per_image:.1f} ms/img ({r.images_per_s:.1f} img/s)"
+          f"{' · cached' if r.cached else ''}"
+          f"{f' · {r.skipped} unreadable skipped' if r.skipped else ''}")
+    print(f"mAP@0.5 {r.map50:.4f}   mAP@0.5:0.95 {r.map50_95:.4f}")
+    for row in r.per_class:
+        print(f"  {row['display']:<20} gt {row['gt']:>5}  P {row['precision']:.3f}  "
+              f"R {row['recall']:.3f}  AP50 {row['ap50']:.3f}  AP50-95 {row['ap50_95']:.3f}")
+    print(f"Suggested confidence threshold (max F1): {r.best_conf:.2f}")
+    print(json.dumps({"map50": r.map50, "map50_95": r.map50_95, "best_conf": r.best_conf}))
+
+
+if __name__ == "__main__":
+    main()
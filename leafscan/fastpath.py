@@ -0,0 +1,238 @@
+"""
+Two-tier upload inference: a tiny CPU classifier in front of the detector.
+
+Most uploads are single-leaf close-ups. For those a linear softmax classifier
+over colour features of the segmented leaf answers in a few ms; the YOLO
+detector runs only when the image does not look like one leaf or the
+classifier is unsure.
+
+Features (128 px work copy, same HSV foliage band as ``leafscan.severity``):
+square-rooted H×S×V histogram of leaf pixels, hue histogram of the whole
+frame, leaf fraction and non-green share of the leaf.
+
+Distillation: the teacher (``best.pt``) labels a local image folder. Images
+where it finds exactly one box are labelled with that class; everything else
+is labelled ``ROUTE`` ("send to the detector"), so the student also learns
+when not to answer. Training is full-batch Adam on the cross-entropy, in NumPy.
+
+The held-out report gives the share of images served by the fast path and the
+accuracy delta against the detector alone — versus the teacher, and versus
+ground truth when the folder has YOLO labels.
+
+CLI::
+
+    python -m leafscan.fastpath photos/ --weights best.pt
+"""
+
+import argparse
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .core import Detections
+from .evaluate import _remap, load_dataset
+from .severity import GREEN_HI, GREEN_LO, leaf_mask
+
+ROUTE = -1              # "not a single-leaf close-up" label
+WORK_SIZE = 128
+MIN_LEAF_FRAC = 0.05    # components below this share of the frame are ignored
+
+
+def image_features(image_bgr):
+    """(feature vector, number of leaves, largest leaf box in image pixels)."""
+    h, w = image_bgr.shape[:2]
+    scale = WORK_SIZE / max(h, w)
+    small = cv2.resize(image_bgr, (max(1, round(w * scale)), max(1, round(h * scale))),
+                       interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    mask = leaf_mask(hsv)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    big = np.flatnonzero(areas >= MIN_LEAF_FRAC * mask.size) + 1
+    box = None
+    if len(big):
+        x, y, bw, bh = stats[big[np.argmax(stats[big, cv2.CC_STAT_AREA])], :4]
+        box = (x / scale, y / scale, (x + bw) / scale, (y + bh) / scale)
+
+    leaf_hist = cv2.calcHist([hsv], [0, 1, 2], mask, [8, 4, 4], [0, 180, 0, 256, 0, 256]).ravel()
+    hue_hist = cv2.calcHist([hsv], [0], None, [16], [0, 180]).ravel()
+    leaf_px = max(float(leaf_hist.sum()), 1.0)
+    green = cv2.inRange(hsv, GREEN_LO, GREEN_HI)
+    not_green = 1.0 - np.count_nonzero(green & mask) / leaf_px
+    feat = np.concatenate([
+        np.sqrt(leaf_hist / leaf_px), np.sqrt(hue_hist / mask.size),
+        [leaf_px / mask.size, not_green, len(big)],
+    ]).astype(np.float32)
+    return feat, len(big), box
+
+
+@dataclass
+class LeafClassifier:
+    labels: np.ndarray              # (K,) teacher class ids, ROUTE included
+    W: np.ndarray                   # (D, K)
+    b: np.ndarray                   # (K,)
+    mu: np.ndarray                  # feature standardisation
+    sigma: np.ndarray
+    threshold: float = 0.85         # min probability to answer without the detector
+    report: dict = field(default_factory=dict)
+
+    def proba(self, feats):
+        z = ((np.atleast_2d(feats) - self.mu) / self.sigma) @ self.W + self.b
+        z = np.exp(z - z.max(1, keepdims=True))
+        return z / z.sum(1, keepdims=True)
+
+    def save(self, path):
+        np.savez(path, labels=self.labels, W=self.W, b=self.b, mu=self.mu, sigma=self.sigma,
+                 threshold=self.threshold, report=json.dumps(self.report))
+
+    @classmethod
+    def load(cls, path):
+        if not Path(path).exists():
+            return None
+        z = np.load(path)
+        return cls(z["labels"], z["W"], z["b"], z["mu"], z["sigma"],
+                   float(z["threshold"]), json.loads(str(z["report"])))
+
+
+def fastpath_path(weights) -> Path:
+    """Student file stored next to the teacher weights."""
+    return Path(weights).with_suffix(".fastpath.npz")
+
+
+class FastPath:
+    """``__call__`` → ``Detections`` when the classifier answers, else None."""
+
+    def __init__(self, clf: LeafClassifier):
+        self.clf = clf
+        self.served = 0
+        self.total = 0
+
+    def __call__(self, image_bgr):
+        self.total += 1
+        feat, n_leaves, box = image_features(image_bgr)
+        if n_leaves != 1:
+            return None
+        p = self.clf.proba(feat)[0]
+        k = int(p.argmax())
+        label = int(self.clf.labels[k])
+        if label == ROUTE or p[k] < self.clf.threshold:
+            return None
+        self.served += 1
+        return Detections([box], [p[k]], [label])
+
+    @property
+    def served_frac(self) -> float:
+        return self.served / self.total if self.total else 0.0
+
+
+def _train(X, y, K, epochs: int = 400, lr: float = 0.05, l2: float = 1e-3):
+    n, d = X.shape
+    W, b = np.zeros((d, K), np.float32), np.zeros(K, np.float32)
+    Y = np.eye(K, dtype=np.float32)[y]
+    mW, vW, mb, vb = (np.zeros_like(W), np.zeros_like(W), np.zeros_like(b), np.zeros_like(b))
+    for t in range(1, epochs + 1):
+        z = X @ W + b
+        z = np.exp(z - z.max(1, keepdims=True))
+        g = (z / z.sum(1, keepdims=True) - Y) / n
+        gW, gb = X.T @ g + l2 * W, g.sum(0)
+        for p, gr, m, v in ((W, gW, mW, vW), (b, gb, mb, vb)):
+            m[...] = 0.9 * m + 0.1 * gr
+            v[...] = 0.999 * v + 0.001 * gr * gr
+            p -= lr * (m / (1 - 0.9 ** t)) / (np.sqrt(v / (1 - 0.999 ** t)) + 1e-8)
+    return W, b
+
+
+def distill(folder, model, imgsz: int = 640, conf: float = 0.4, iou: float = 0.5,
+            val_frac: float = 0.2, threshold: float = 0.85, batch: int = 8,
+            progress=None, seed: int = 0) -> LeafClassifier:
+    images, gt, ds_names = load_dataset(folder, split=None)
+    if len(images) < 10:
+        raise RuntimeError(f"Need at least 10 images in {folder}, found {len(images)}")
+
+    feats, n_leaves, teacher, truth, det_ms, feat_ms = [], [], [], [], [], []
+    for start in range(0, len(images), batch):
+        frames = [cv2.imread(str(p)) for p in images[start:start + batch]]
+        t0 = time.perf_counter()
+        results = model.predict(frames, conf=conf, iou=iou, imgsz=imgsz, verbose=False)
+        det_ms.append((time.perf_counter() - t0) * 1000 / len(frames))
+        for frame, r, lab in zip(frames, results, gt[start:start + batch]):
+            d = Detections.from_result(r)
+            t0 = time.perf_counter()
+            f, nl, _ = image_features(frame)
+            feat_ms.append((time.perf_counter() - t0) * 1000)
+            feats.append(f)
+            n_leaves.append(nl)
+            teacher.append(int(d.cls[0]) if len(d) == 1 else ROUTE)
+            g = _remap(lab[:, 0].astype(np.int32), ds_names, model.names)
+            truth.append(int(g[0]) if len(g) == 1 else ROUTE)
+        if progress:
+            progress(min(1.0, (start + len(frames)) / len(images)))
+    X, teacher, truth = np.stack(feats), np.array(teacher), np.array(truth)
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(X))
+    n_val = max(1, int(len(X) * val_frac))
+    val, tr = order[:n_val], order[n_val:]
+
+    labels = np.unique(np.append(teacher[tr], ROUTE))
+    y = np.searchsorted(labels, teacher[tr])
+    mu, sigma = X[tr].mean(0), X[tr].std(0) + 1e-6
+    W, b = _train((X[tr] - mu) / sigma, y, len(labels))
+    clf = LeafClassifier(labels, W, b, mu, sigma, threshold)
+
+    # Held-out: which images the fast path would serve, and what it would say
+    t0 = time.perf_counter()
+    p = clf.proba(X[val])
+    pred = labels[p.argmax(1)]
+    fast_ms = (time.perf_counter() - t0) * 1000 / len(val) + float(np.mean(feat_ms))
+    served = (np.array(n_leaves)[val] == 1) & (pred != ROUTE) & (p.max(1) >= threshold)
+    two_tier = np.where(served, pred, teacher[val])        # fallback = teacher answer
+    report = {
+        "images": int(len(X)), "val": int(len(val)),
+        "fast_frac": float(served.mean()),
+        "agree_on_served": float((pred[served] == teacher[val][served]).mean()) if served.any() else 1.0,
+        "acc_delta_vs_teacher": float((two_tier == teacher[val]).mean() - 1.0),
+        "detector_ms": float(np.mean(det_ms)), "classifier_ms": fast_ms,
+    }
+    has_gt = truth[val] != ROUTE
+    if has_gt.any():
+        acc_det = float((teacher[val][has_gt] == truth[val][has_gt]).mean())
+        acc_two = float((two_tier[has_gt] == truth[val][has_gt]).mean())
+        report.update(acc_detector=acc_det, acc_two_tier=acc_two, acc_delta=acc_two - acc_det)
+    clf.report = report
+    return clf
+
+
+def main(argv=None):
+    from .core import load_yolo
+    ap = argparse.ArgumentParser(description="Distil a fast single-leaf classifier from YOLO weights")
+    ap.add_argument("folder")
+    ap.add_argument("--weights", default="best.pt")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--conf", type=float, default=0.40)
+    ap.add_argument("--threshold", type=float, default=0.85)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args(argv)
+
+    model, err = load_yolo(args.weights)
+    if err:
+        raise SystemExit(err)
+    clf = distill(args.folder, model, args.imgsz, args.conf, threshold=args.threshold)
+    out = args.out or fastpath_path(args.weights)
+    clf.save(out)
+    r = clf.report
+    print(f"{r['images']} images ({r['val']} held out) → {out}")
+    print(f"fast path serves {r['fast_frac']:.1%} · agrees with detector on {r['agree_on_served']:.1%} "
+          f"of those · accuracy Δ vs detector {r['acc_delta_vs_teacher']:+.1%}")
+    print(f"detector {r['detector_ms']:.1f} ms/img · fast path {r['classifier_ms']:.2f} ms/img")
+    if "acc_delta" in r:
+        print(f"ground truth: detector {r['acc_detector']:.1%} · two-tier {r['acc_two_tier']:.1%} "
+              f"({r['acc_delta']:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
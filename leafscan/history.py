@@ -0,0 +1,119 @@
+"""
+Fixed-capacity detection history.
+
+Entries live in a NumPy structured ring buffer: a class id into a small name
+table instead of display / icon / colour strings per row, so a session's
+history costs ``capacity * 31`` bytes no matter how long the camera runs.
+Rows are turned back into dicts only when the UI or an export asks for them.
+Image evidence is not kept here: ``thumb`` is a key into
+``leafscan.thumbs.ThumbStore`` on disk.
+"""
+
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from .core import get_disease_info
+
+SOURCES = ("upload", "camera")
+
+HISTORY_DTYPE = np.dtype([
+    ("t",         np.float64),   # epoch seconds
+    ("cls",       np.int16),     # index into HistoryBuffer.classes
+    ("source",    np.uint8),     # index into SOURCES
+    ("conf",      np.float32),
+    ("leaf_pct",  np.float32),   # NaN when not measured
+    ("image_pct", np.float32),
+    ("thumb",     np.uint64),    # ThumbStore key, 0 = none
+])
+
+
+class HistoryBuffer:
+    """Newest-first view over a ring buffer of ``capacity`` entries."""
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.classes = []             # display names; index = cls
+        self._cls_idx = {}
+        self._buf = np.zeros(capacity, HISTORY_DTYPE)
+        self._head = 0                # next write position
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __bool__(self):
+        return self._len > 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._buf.nbytes
+
+    def _class_id(self, disease: str) -> int:
+        i = self._cls_idx.get(disease)
+        if i is None:
+            i = self._cls_idx[disease] = len(self.classes)
+            self.classes.append(disease)
+        return i
+
+    def append(self, disease: str, conf: float, source: str = "upload",
+               leaf_pct=None, image_pct=None, t: float = None, thumb: int = 0):
+        rec = self._buf[self._head]
+        rec["t"] = time.time() if t is None else t
+        rec["cls"] = self._class_id(disease)
+        rec["source"] = SOURCES.index(source)
+        rec["conf"] = conf
+        rec["leaf_pct"] = np.nan if leaf_pct is None else leaf_pct
+        rec["image_pct"] = np.nan if image_pct is None else image_pct
+        rec["thumb"] = thumb
+        self._head = (self._head + 1) % self.capacity
+        self._len = min(self._len + 1, self.capacity)
+
+    def clear(self):
+        self._head = 0
+        self._len = 0
+
+    def _order(self):
+        """Buffer indices, newest first."""
+        return (self._head - 1 - np.arange(self._len)) % self.capacity
+
+    def last_disease(self):
+        if not self._len:
+            return None
+        return self.classes[self._buf[(self._head - 1) % self.capacity]["cls"]]
+
+    def records(self):
+        """Structured array copy, newest first."""
+        return self._buf[self._order()]
+
+    def rows(self, start: int = 0, n: int = None) -> list:
+        """Entries ``start`` … ``start+n`` (newest first) as display dicts."""
+        idx = self._order()[start: None if n is None else start + n]
+        out = []
+        for r in self._buf[idx]:
+            name = self.classes[r["cls"]]
+            out.append({
+                "time": datetime.fromtimestamp(r["t"]).strftime("%H:%M:%S"),
+                "disease": name,
+                "conf": float(r["conf"]),
+                "icon": get_disease_info(name)["icon"],
+                "source": SOURCES[r["source"]],
+                "leaf_pct": None if np.isnan(r["leaf_pct"]) else round(float(r["leaf_pct"]), 2),
+                "image_pct": None if np.isnan(r["image_pct"]) else round(float(r["image_pct"]), 2),
+                "thumb": int(r["thumb"]),
+            })
+        return out
+
+    def summary(self):
+        """{disease: (count, mean conf)}, computed with bincount."""
+        recs = self._buf[self._order()]
+        n = len(self.classes)
+        counts = np.bincount(recs["cls"], minlength=n)
+        sums = np.bincount(recs["cls"], weights=recs["conf"], minlength=n)
+        return {self.classes[i]: (int(counts[i]), float(sums[i] / counts[i]))
+                for i in np.flatnonzero(counts)}
+
+    def to_json(self) -> str:
+        return json.dumps(self.rows(), indent=2)
@@ -0,0 +1,52 @@
+"""
+Threshold + NMS in NumPy over cached candidate boxes.
+
+The model is run once per image with a very low confidence floor and a loose
+NMS IoU (``RAW_CONF`` / ``RAW_IOU``), which keeps practically every candidate
+the network emits. Moving the confidence or IoU sliders then only re-applies
+thresholding and class-aware NMS here — a few milliseconds — instead of
+running ``model.predict`` again.
+"""
+
+import numpy as np
+
+from .core import Detections
+
+RAW_CONF = 0.01
+RAW_IOU = 0.95
+
+
+def nms(xyxy, conf, cls, iou_thr: float):
+    """
+    Class-aware greedy NMS. Boxes of different classes are shifted apart so a
+    single IoU matrix serves all classes. Returns kept indices by confidence.
+    """
+    n = len(conf)
+    if n == 0:
+        return np.zeros(0, np.int64)
+    order = np.argsort(-conf)
+    b = xyxy[order] + (cls[order].astype(np.float32) * (xyxy.max() + 1.0))[:, None]
+    tl = np.maximum(b[:, None, :2], b[None, :, :2])
+    br = np.minimum(b[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(2)
+    area = (b[:, 2:] - b[:, :2]).prod(1)
+    iou = inter / np.maximum(area[:, None] + area[None] - inter, 1e-9)
+    suppressed = np.zeros(n, bool)
+    keep = []
+    for i in range(n):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= iou[i] > iou_thr
+    return order[np.array(keep, np.int64)]
+
+
+def apply_thresholds(raw: Detections, conf: float, iou: float, calibrator=None) -> Detections:
+    """
+    Re-derive final detections from cached candidates. With a calibrator the
+    threshold applies to — and the result carries — calibrated probabilities.
+    """
+    scores = raw.conf if calibrator is None else calibrator(raw.conf)
+    m = scores >= conf
+    cand = Detections(raw.xyxy[m], scores[m], raw.cls[m])
+    return cand[nms(cand.xyxy, cand.conf, cand.cls, iou)]
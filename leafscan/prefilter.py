@@ -0,0 +1,95 @@
+"""
+Cheap leaf-presence gate in front of ``model.predict`` for the camera loop.
+
+A frame is probed at ``probe_size`` px on the long side: the share of pixels
+in the foliage HSV band (the same band ``leafscan.severity`` segments with) is
+computed inside the region of interest. Below ``min_leaf_frac`` the frame is
+skipped — sky, trunks and soil never reach the detector. Otherwise the frame
+may be cropped to the ROI, or further to the padded bounding box of its leaf
+pixels, before inference.
+
+Cropping does not reduce YOLO compute (the input is letterboxed to ``imgsz``
+either way); it spends those pixels on foliage instead. Saved compute comes
+from skipped frames and is estimated from the running mean inference time.
+"""
+
+import time
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from .severity import FOLIAGE_HI, FOLIAGE_LO
+
+
+@dataclass
+class GateDecision:
+    run: bool
+    box: tuple = None         # x1, y1, x2, y2 crop in frame pixels, None = whole frame
+    leaf_frac: float = 0.0
+    ms: float = 0.0
+
+
+def roi_box(shape, roi):
+    """``roi`` as fractions (x1, y1, x2, y2) → pixel box, None for the full frame."""
+    if roi is None or tuple(roi) == (0.0, 0.0, 1.0, 1.0):
+        return None
+    h, w = shape[:2]
+    x1, y1, x2, y2 = roi
+    return (int(x1 * w), int(y1 * h), max(int(x2 * w), int(x1 * w) + 1),
+            max(int(y2 * h), int(y1 * h) + 1))
+
+
+def gate_frame(frame_bgr, min_leaf_frac: float = 0.03, roi=None, crop_to_leaves: bool = False,
+               probe_size: int = 160, pad: float = 0.08) -> GateDecision:
+    t0 = time.time()
+    box = roi_box(frame_bgr.shape, roi)
+    x0, y0 = (box[0], box[1]) if box else (0, 0)
+    region = frame_bgr[box[1]:box[3], box[0]:box[2]] if box else frame_bgr
+    rh, rw = region.shape[:2]
+    scale = min(1.0, probe_size / max(rh, rw))
+    probe = cv2.resize(region, (max(1, int(rw * scale)), max(1, int(rh * scale))),
+                       interpolation=cv2.INTER_AREA) if scale < 1.0 else region
+    mask = cv2.inRange(cv2.cvtColor(probe, cv2.COLOR_BGR2HSV), FOLIAGE_LO, FOLIAGE_HI)
+    leaf_frac = float(np.count_nonzero(mask)) / mask.size
+
+    if leaf_frac < min_leaf_frac:
+        return GateDecision(False, box, leaf_frac, (time.time() - t0) * 1000)
+
+    if crop_to_leaves:
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+        x, y, bw, bh = cv2.boundingRect(mask)
+        if bw and bh:
+            px, py = pad * bw, pad * bh
+            box = (x0 + max(0, int((x - px) / scale)), y0 + max(0, int((y - py) / scale)),
+                   x0 + min(rw, int((x + bw + px) / scale)), y0 + min(rh, int((y + bh + py) / scale)))
+    return GateDecision(True, box, leaf_frac, (time.time() - t0) * 1000)
+
+
+class GateStats:
+    """Skip rate and estimated saved inference time for the live metrics."""
+
+    def __init__(self):
+        self.frames = 0
+        self.skipped = 0
+        self.gate_ms = 0.0
+        self._infer_ms = 0.0
+        self._runs = 0
+
+    def record(self, decision: GateDecision, infer_ms: float = None):
+        self.frames += 1
+        self.gate_ms += decision.ms
+        if decision.run:
+            self._runs += 1
+            self._infer_ms += (infer_ms - self._infer_ms) / self._runs
+        else:
+            self.skipped += 1
+
+    @property
+    def skip_rate(self) -> float:
+        return self.skipped / self.frames if self.frames else 0.0
+
+    @property
+    def saved_ms(self) -> float:
+        """Inference time not spent, net of the gate's own cost."""
+        return max(0.0, self.skipped * self._infer_ms - self.gate_ms)
@@ -0,0 +1,418 @@
+"""
+Inference in worker processes, with frames passed through shared memory.
+
+Everything in the Streamlit process — predict, NumPy drawing, OpenCV — shares
+one GIL. ``InferencePool`` moves predict into ``workers`` spawned processes,
+each holding its own model from ``load_yolo`` and pinned to its slice of a
+``ResourcePlan``.
+
+Per worker there are two ``multiprocessing.shared_memory`` rings of ``slots``
+entries: frames in (``frame_mb`` each, uint8 BGR) and detections out
+(``MAX_DET`` rows of x1 y1 x2 y2 conf cls, float32). Only a few integers per
+job travel through the queues; pixels and boxes are never pickled. A slot is
+owned by the caller from ``submit`` until its result has been copied out, so
+a full ring is backpressure: ``submit`` blocks until a slot frees up.
+
+Frames larger than a slot are downscaled to fit and the boxes scaled back —
+the detector resizes to ``imgsz`` anyway.
+
+A worker that dies (OOM kill, a crash inside torch) fails its in-flight jobs
+and is restarted up to ``max_restarts`` times; after that its slots are
+retired, and once no worker is left the pool sets ``error`` and every call
+raises. ``predict`` and ``result`` always wait with a finite timeout.
+
+``InferencePool.predict`` has the ``model.predict`` call shape (returning
+``Detections``) and ``names``, so the pool can stand in for the model in the
+camera workers.
+
+Scaling demo::
+
+    python -m leafscan.procpool --weights best.pt --workers 1 2 4 8 --seconds 15
+"""
+
+import argparse
+import itertools
+import math
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from .core import Detections
+from .resources import ResourcePlan, plan_resources
+
+MAX_DET = 300           # ultralytics' default max_det
+_ROW = 6                # x1 y1 x2 y2 conf cls
+RESULT_TIMEOUT = 60.0   # seconds ``predict`` waits for a frame
+_POLL = 0.5             # seconds between worker liveness checks
+
+
+def _attach(name: str):
+    """Attach to an existing block without the child's tracker unlinking it at exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)     # 3.13+
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _worker_main(idx, weights, device, plan, cores, in_name, out_name, slot_bytes,
+                 tasks, results):
+    import os
+    from .core import as_detections, load_yolo
+    from .resources import apply_plan
+
+    try:
+        apply_plan(plan)
+        if cores and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, set(cores))
+        inp, out = _attach(in_name), _attach(out_name)
+        model, err = load_yolo(weights)
+        if model is not None and device:
+            model.to(device)
+        if err:
+            raise RuntimeError(err)
+        model.predict(np.zeros((64, 64, 3), np.uint8), verbose=False)    # warm-up
+    except Exception as e:
+        results.put(("ready", idx, None, repr(e)))
+        return
+    results.put(("ready", idx, dict(model.names), None))
+    det_bytes = MAX_DET * _ROW * 4
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            job, slot, h, w, conf, iou, imgsz = task
+            frame = np.ndarray((h, w, 3), np.uint8, inp.buf, slot * slot_bytes)
+            rows = np.ndarray((MAX_DET, _ROW), np.float32, out.buf, slot * det_bytes)
+            t0 = time.perf_counter()
+            try:
+                det = as_detections(model.predict(frame, conf=conf, iou=iou, imgsz=imgsz,
+                                                  max_det=MAX_DET, verbose=False))
+                n = len(det)
+                rows[:n, :4], rows[:n, 4], rows[:n, 5] = det.xyxy, det.conf, det.cls
+                results.put((job, idx, slot, n, (time.perf_counter() - t0) * 1000, None))
+            except Exception as e:
+                results.put((job, idx, slot, 0, 0.0, f"{type(e).__name__}: {e}"))
+            del frame, rows
+    finally:
+        inp.close()
+        out.close()
+
+
+class PendingResult:
+    """Handle returned by ``submit``; ``result()`` waits for the ``Detections``."""
+
+    __slots__ = ("_event", "_det", "_error", "scale", "ms", "worker", "slot")
+
+    def __init__(self, scale: float, worker: int, slot: int):
+        self._event = threading.Event()
+        self._det = None
+        self._error = None
+        self.scale = scale
+        self.ms = 0.0
+        self.worker = worker
+        self.slot = slot
+
+    def done(self) -> bool:
+        return self._event.is_set()
+
+    def _fail(self, error: str):
+        self._error = error
+        self._event.set()
+
+    def result(self, timeout: float = RESULT_TIMEOUT) -> Detections:
+        if not self._event.wait(timeout):
+            raise TimeoutError("inference worker did not answer in time")
+        if self._error:
+            raise RuntimeError(self._error)
+        return self._det
+
+
+class InferencePool:
+    """``workers`` model processes fed through shared-memory frame rings."""
+
+    def __init__(self, weights: str, workers: int = 2, *, device: str = "",
+                 plan: ResourcePlan = None, slots: int = 2, frame_mb: int = 24,
+                 start_timeout: float = 120.0, max_restarts: int = 3):
+        self.weights = weights
+        self.device = device
+        self.workers = max(1, workers)
+        self.plan = plan or plan_resources(workers=self.workers)
+        self.slots = slots
+        self.slot_bytes = frame_mb * 2**20
+        self.max_restarts = max_restarts
+        self._ctx = mp.get_context("spawn")   # never fork a process that runs threads
+        self._in = [shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+                    for _ in range(self.workers)]
+        self._out = [shared_memory.SharedMemory(create=True, size=slots * MAX_DET * _ROW * 4)
+                     for _ in range(self.workers)]
+        self._tasks = [None] * self.workers
+        self._procs = [None] * self.workers
+        self._results = self._ctx.Queue()
+        self._free = queue.Queue()
+        self._pending = {}
+        self._parked = [[] for _ in range(self.workers)]     # slots held back while restarting
+        self._jobs = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.error = None
+        self.completed = 0
+        self.restarts = [0] * self.workers
+        self.retired = [False] * self.workers
+        self.busy_ms = [0.0] * self.workers
+
+        # Each process gets its own torch thread budget; pinning happens in the child
+        self._child_plan = ResourcePlan(self.plan.torch_threads, self.plan.interop_threads, 1)
+        try:
+            for i in range(self.workers):
+                self._spawn(i)
+            self.names = None
+            waiting = set(range(self.workers))
+            deadline = time.monotonic() + start_timeout
+            while waiting:
+                try:
+                    _, i, names, err = self._results.get(timeout=_POLL)
+                except queue.Empty:
+                    dead = [i for i in waiting if not self._procs[i].is_alive()]
+                    if dead:
+                        raise RuntimeError(f"worker {dead[0]} exited with code "
+                                           f"{self._procs[dead[0]].exitcode} while loading")
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"{len(waiting)} worker(s) not ready "
+                                           f"after {start_timeout:.0f}s")
+                    continue
+                if err:
+                    raise RuntimeError(f"worker {i}: {err}")
+                self.names = names
+                waiting.discard(i)
+        except BaseException:
+            self.close()
+            raise
+        # Round-robin across workers so consecutive jobs land on different processes
+        for s in range(slots):
+            for i in range(self.workers):
+                self._free.put((i, s))
+        self._collector = threading.Thread(target=self._collect, name="leafscan-pool-results",
+                                           daemon=True)
+        self._collector.start()
+
+    def _spawn(self, i: int):
+        # A fresh task queue: the old one may hold jobs a dead worker never took
+        self._tasks[i] = self._ctx.Queue()
+        p = self._ctx.Process(target=_worker_main, name=f"leafscan-infer-{i}", daemon=True,
+                              args=(i, self.weights, self.device, self._child_plan,
+                                    self.plan.worker_cores(i), self._in[i].name,
+                                    self._out[i].name, self.slot_bytes, self._tasks[i],
+                                    self._results))
+        p.start()
+        self._procs[i] = p
+
+    # ── submit / await ────────────────────────
+    def submit(self, frame_bgr, conf: float = 0.40, iou: float = 0.50, imgsz: int = 640,
+               timeout: float = RESULT_TIMEOUT) -> PendingResult:
+        """Copy ``frame_bgr`` into a free slot and queue it; blocks while all slots are busy."""
+        h, w = frame_bgr.shape[:2]
+        scale = min(1.0, math.sqrt(self.slot_bytes / (h * w * 3)))
+        if scale < 1.0:
+            w, h = max(1, int(w * scale)), max(1, int(h * scale))
+            frame_bgr = cv2.resize(frame_bgr, (w, h), interpolation=cv2.INTER_AREA)
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._closed or self.error:
+                raise RuntimeError(self.error or "inference pool is closed")
+            wait = min(_POLL, deadline - time.monotonic())
+            if wait <= 0:
+                raise TimeoutError("no free inference slot")
+            try:
+                i, slot = self._free.get(timeout=wait)
+            except queue.Empty:
+                continue
+            if not self.retired[i]:
+                break                   # a retired worker's slots are dropped, not reused
+        dst = np.ndarray((h, w, 3), np.uint8, self._in[i].buf, slot * self.slot_bytes)
+        np.copyto(dst, frame_bgr, casting="unsafe")
+        del dst
+        job = next(self._jobs)
+        pending = PendingResult(scale, i, slot)
+        # Registered and queued under the lock, so a worker death is seen before or after
+        with self._lock:
+            self._pending[job] = pending
+            self._tasks[i].put((job, slot, h, w, float(conf), float(iou), int(imgsz)))
+        return pending
+
+    def _collect(self):
+        det_bytes = MAX_DET * _ROW * 4
+        while True:
+            try:
+                msg = self._results.get(timeout=_POLL)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if msg is None:
+                return
+            if msg[0] == "ready":       # a restarted worker
+                self._ready(*msg[1:])
+                continue
+            job, i, slot, n, ms, err = msg
+            with self._lock:
+                pending = self._pending.pop(job, None)
+                self.completed += 1
+                self.busy_ms[i] += ms
+            if pending is None:
+                continue                # failed when its worker died; the slot is parked
+            rows = np.ndarray((MAX_DET, _ROW), np.float32, self._out[i].buf, slot * det_bytes)
+            rows = rows[:n].copy()
+            self._free.put((i, slot))
+            pending.ms = ms
+            if err:
+                pending._fail(err)
+            else:
+                pending._det = Detections(rows[:, :4] / pending.scale, rows[:, 4], rows[:, 5])
+                pending._event.set()
+
+    def _check_workers(self):
+        for i, p in enumerate(self._procs):
+            if not self.retired[i] and not p.is_alive():
+                self._lost_worker(i, f"worker {i} exited with code {p.exitcode}",
+                                  restart=self.restarts[i] < self.max_restarts)
+
+    def _ready(self, i: int, names, err):
+        if err:
+            self._lost_worker(i, f"worker {i}: {err}", restart=False)
+            return
+        with self._lock:
+            parked, self._parked[i] = self._parked[i], []
+        for slot in parked:
+            self._free.put((i, slot))
+
+    def _lost_worker(self, i: int, error: str, restart: bool):
+        """Fail worker ``i``'s jobs (parking their slots), then respawn or retire it."""
+        with self._lock:
+            if self._closed:
+                return
+            failed = [self._pending.pop(j) for j, pend in list(self._pending.items())
+                      if pend.worker == i]
+            self._parked[i] += [pend.slot for pend in failed]
+            if restart:
+                self.restarts[i] += 1
+                self._spawn(i)
+            else:
+                self.retired[i] = True
+                if all(self.retired):
+                    self.error = f"all inference workers exited (last: {error})"
+        for pend in failed:
+            pend._fail(error)
+        if self.error:
+            self._fail_all(self.error)
+
+    def _fail_all(self, error: str):
+        with self._lock:
+            failed = list(self._pending.values())
+            self._pending.clear()
+        for pend in failed:
+            pend._fail(error)
+
+    # ── model-shaped API ──────────────────────
+    def predict(self, source, conf: float = 0.40, iou: float = 0.50, imgsz: int = 640,
+                timeout: float = RESULT_TIMEOUT, **kwargs):
+        """``model.predict`` stand-in: one frame → ``Detections``, a list → list of them."""
+        if isinstance(source, (list, tuple)):
+            jobs = [self.submit(f, conf, iou, imgsz, timeout) for f in source]
+            return [j.result(timeout) for j in jobs]
+        return self.submit(source, conf, iou, imgsz, timeout).result(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "completed": self.completed,
+                    "in_flight": len(self._pending),
+                    "busy_ms": [round(b) for b in self.busy_ms],
+                    "alive": sum(p is not None and p.is_alive() for p in self._procs),
+                    "restarts": sum(self.restarts), "error": self.error}
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            procs = [(p, q) for p, q in zip(self._procs, self._tasks) if p is not None]
+        for p, q in procs:
+            if p.is_alive():
+                q.put(None)
+        for p, _ in procs:
+            p.join(5.0)
+            if p.is_alive():
+                p.terminate()
+        self._results.put(None)
+        self._fail_all("inference pool closed")
+        for shm in self._in + self._out:
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ══════════════════════════════════════════════
+# SCALING DEMO
+# ══════════════════════════════════════════════
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Throughput of the process pool vs. worker count")
+    ap.add_argument("--weights", default="best.pt")
+    ap.add_argument("--image", default=None, help="test image (random noise if omitted)")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--threads", type=int, default=1, help="torch threads per worker")
+    ap.add_argument("--seconds", type=float, default=15.0)
+    ap.add_argument("--pin", action="store_true")
+    args = ap.parse_args(argv)
+
+    from .resources import cpu_count
+    img = cv2.imread(args.image) if args.image else \
+        np.random.default_rng(0).integers(0, 255, (720, 1280, 3), np.uint8)
+    n_cores = cpu_count()
+    print(f"{n_cores} cores · {args.threads} torch thread(s) per worker · imgsz {args.imgsz}"
+          + (" · pinned" if args.pin else ""))
+    print(f"{'workers':>8} {'img/s':>8} {'speed-up':>9} {'efficiency':>11} {'p50 ms':>8}")
+    base = None
+    for n in args.workers:
+        if n * args.threads > n_cores:
+            print(f"{n:8d}  skipped: needs {n * args.threads} cores")
+            continue
+        plan = plan_resources(workers=n, prep_frac=0.0, pin=args.pin)
+        plan.torch_threads = args.threads
+        with InferencePool(args.weights, n, plan=plan) as pool:
+            for j in [pool.submit(img, imgsz=args.imgsz) for _ in range(2 * n)]:
+                j.result()                                      # warm every worker
+            done, lat = 0, []
+            inflight = []
+            t0 = time.perf_counter()
+            while time.perf_counter() - t0 < args.seconds:
+                # Keep every slot busy; the oldest job is awaited first
+                while len(inflight) < 2 * n:
+                    inflight.append(pool.submit(img, imgsz=args.imgsz))
+                j = inflight.pop(0)
+                j.result()
+                lat.append(j.ms)
+                done += 1
+            for j in inflight:
+                j.result()
+            wall = time.perf_counter() - t0
+        ips = done / wall
+        base = base or ips / n
+        print(f"{n:8d} {ips:8.1f} {ips / base:8.2f}× {ips / base / n:10.0%} "
+              f"{np.percentile(lat, 50):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Camera session recording and replay.
+
+A recording is a directory::
+
+    meta.json        shape, codec, chunk size, source, detection settings
+    index.bin        per frame: timestamp, chunk, offset, length (``INDEX_DTYPE`` rows)
+    chunk_00000.npy  raw codec: memory-mapped (chunk, H, W, 3) uint8 block
+    chunk_00000.bin  jpeg codec: concatenated JPEG bytes
+    dets.jsonl       per frame: [[x1, y1, x2, y2, conf, cls], …] from the live run
+
+``raw`` is lossless and replays bit-exactly; ``jpeg`` is ~20× smaller and
+still deterministic on replay, since the stored bytes never change.
+
+``meta.json`` is written with the first frame and every frame's data, index
+row and detections are flushed as it is written, so a recording cut short by
+a crash or kill still replays up to its last complete frame (``frames`` in
+its meta stays null). A recorder that never got a frame leaves nothing
+behind, and ``is_recording`` skips recordings with ``frames == 0``.
+
+``ReplayCapture`` mimics the part of ``cv2.VideoCapture`` the workers use, so a
+recording can be fed through the same ``CameraWorker`` pipeline — by default
+as fast as the pipeline can consume it. ``reprocess`` re-scores a recording
+offline in batches with any weights / thresholds.
+
+CLI::
+
+    python -m leafscan.recording recordings/20260101_120000 --weights new.pt
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .core import Detections
+
+INDEX_DTYPE = np.dtype([("t", np.float64), ("chunk", np.int32),
+                        ("offset", np.int64), ("length", np.int64)])
+
+
+def is_recording(path) -> bool:
+    try:
+        meta = json.loads((Path(path) / "meta.json").read_text())
+    except (TypeError, OSError, ValueError):
+        return False
+    return meta.get("frames") != 0
+
+
+def read_index(path: Path, codec: str) -> np.ndarray:
+    """Index rows whose frame data is on disk (all of them unless the recorder died)."""
+    f = path / "index.bin"
+    raw = f.read_bytes() if f.exists() else b""
+    index = np.frombuffer(raw[:len(raw) - len(raw) % INDEX_DTYPE.itemsize], INDEX_DTYPE)
+    if codec != "raw" and len(index):
+        # A kill between the data and index writes can leave a row past the chunk's end
+        sizes = {c: (path / f"chunk_{c:05d}.bin").stat().st_size
+                 if (path / f"chunk_{c:05d}.bin").exists() else 0
+                 for c in np.unique(index["chunk"]).tolist()}
+        end = np.array([sizes[c] for c in index["chunk"].tolist()], np.int64)
+        ok = index["offset"] + index["length"] <= end
+        index = index[:len(ok) if ok.all() else int(np.argmin(ok))]
+    return index
+
+
+class Recorder:
+    """Append frames + detections to a recording directory."""
+
+    def __init__(self, path, codec: str = "jpeg", chunk_frames: int = 256,
+                 jpeg_quality: int = 92, **meta):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.codec = codec
+        self.chunk_frames = chunk_frames
+        self.jpeg_quality = jpeg_quality
+        self.meta = meta
+        self.shape = None
+        self._chunk = -1
+        self._mm = None          # raw: current memmap
+        self._bin = None         # jpeg: current chunk file
+        self._in_chunk = 0
+        self._frames = 0
+        self._dets = (self.path / "dets.jsonl").open("w")
+        self._index = (self.path / "index.bin").open("wb")
+
+    def _write_meta(self, frames):
+        meta = {"shape": list(self.shape or ()), "codec": self.codec,
+                "chunk_frames": self.chunk_frames, "frames": frames, **self.meta}
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta, indent=2, default=str))
+        tmp.replace(self.path / "meta.json")
+
+    def __len__(self):
+        return self._frames
+
+    def _next_chunk(self):
+        self._close_chunk()
+        self._chunk += 1
+        self._in_chunk = 0
+        name = self.path / f"chunk_{self._chunk:05d}"
+        if self.codec == "raw":
+            self._mm = np.lib.format.open_memmap(
+                name.with_suffix(".npy"), mode="w+", dtype=np.uint8,
+                shape=(self.chunk_frames,) + self.shape)
+        else:
+            self._bin = name.with_suffix(".bin").open("wb")
+
+    def _close_chunk(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm = None
+        if self._bin is not None:
+            self._bin.close()
+            self._bin = None
+
+    def write(self, frame_bgr, det: Detections, t: float = None):
+        if self.shape is None:
+            self.shape = tuple(frame_bgr.shape)
+            self._write_meta(None)          # replayable from the first frame on
+        if frame_bgr.shape != self.shape:
+            frame_bgr = cv2.resize(frame_bgr, (self.shape[1], self.shape[0]))
+        if self._chunk < 0 or self._in_chunk >= self.chunk_frames:
+            self._next_chunk()
+        if self.codec == "raw":
+            self._mm[self._in_chunk] = frame_bgr
+            offset, length = self._in_chunk, 1
+        else:
+            ok, buf = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            offset, length = self._bin.tell(), len(buf)
+            self._bin.write(buf.tobytes())
+            self._bin.flush()
+        # Data, then its index row, then its detections: a reader never sees a row ahead of data
+        row = np.array([(time.time() if t is None else t, self._chunk, offset, length)],
+                       INDEX_DTYPE)
+        self._index.write(row.tobytes())
+        self._index.flush()
+        self._in_chunk += 1
+        self._frames += 1
+        rows = np.concatenate([det.xyxy, det.conf[:, None], det.cls[:, None]], 1) \
+            if len(det) else np.zeros((0, 6))
+        self._dets.write(json.dumps(np.round(rows, 4).tolist()) + "\n")
+        self._dets.flush()
+
+    def close(self):
+        self._close_chunk()
+        self._dets.close()
+        self._index.close()
+        if not self._frames:
+            # Nothing recorded (e.g. the camera never opened): leave no replay behind
+            for name in ("dets.jsonl", "index.bin"):
+                (self.path / name).unlink(missing_ok=True)
+            try:
+                self.path.rmdir()
+            except OSError:
+                pass
+            return
+        self._write_meta(self._frames)
+
+
+class RecordingReader:
+    """Random access to a recording, finished or cut short."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        self.index = read_index(self.path, self.meta["codec"])
+        self._chunks = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def timestamps(self):
+        return self.index["t"]
+
+    @property
+    def fps(self) -> float:
+        t = self.timestamps
+        return (len(t) - 1) / (t[-1] - t[0]) if len(t) > 1 and t[-1] > t[0] else 0.0
+
+    def _chunk(self, c: int):
+        if c not in self._chunks:
+            name = self.path / f"chunk_{c:05d}"
+            if self.meta["codec"] == "raw":
+                self._chunks[c] = np.load(name.with_suffix(".npy"), mmap_mode="r")
+            else:
+                self._chunks[c] = np.memmap(name.with_suffix(".bin"), dtype=np.uint8, mode="r")
+        return self._chunks[c]
+
+    def frame(self, i: int):
+        rec = self.index[i]
+        data = self._chunk(int(rec["chunk"]))
+        if self.meta["codec"] == "raw":
+            return np.array(data[int(rec["offset"])])
+        o, n = int(rec["offset"]), int(rec["length"])
+        return cv2.imdecode(np.asarray(data[o:o + n]), cv2.IMREAD_COLOR)
+
+    def detections(self) -> list:
+        """Detections recorded during the live run, one per frame."""
+        out = []
+        with (self.path / "dets.jsonl").open() as f:
+            for line in f:
+                if len(out) == len(self.index) or not line.endswith("\n"):
+                    break           # rows past the last complete frame of a cut-short run
+                a = np.array(json.loads(line), np.float32).reshape(-1, 6)
+                out.append(Detections(a[:, :4], a[:, 4], a[:, 5]))
+        return out
+
+
+class ReplayCapture:
+    """
+    ``cv2.VideoCapture`` stand-in over a recording. ``speed=None`` returns
+    frames as fast as they are read; ``speed=1.0`` paces at the recorded rate.
+    """
+
+    def __init__(self, path, speed: float = None, loop: bool = False):
+        self.reader = RecordingReader(path)
+        self.speed = speed
+        self.loop = loop
+        self._i = 0
+        self._t0 = None
+
+    def isOpened(self):
+        return len(self.reader) > 0
+
+    def read(self):
+        if self._i >= len(self.reader):
+            if not self.loop:
+                return False, None
+            self._i, self._t0 = 0, None
+        if self.speed:
+            ts = self.reader.timestamps
+            if self._t0 is None:
+                self._t0 = time.time() - (ts[self._i] - ts[0]) / self.speed
+            wait = self._t0 + (ts[self._i] - ts[0]) / self.speed - time.time()
+            if wait > 0:
+                time.sleep(wait)
+        frame = self.reader.frame(self._i)
+        self._i += 1
+        return True, frame
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self._i, self._t0 = int(value), None
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.reader.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.reader))
+        return 0.0
+
+    def release(self):
+        pass
+
+
+def open_capture(source):
+    """Camera index, video file, recording directory or capture object → capture object."""
+    if hasattr(source, "read"):
+        return source
+    if is_recording(source):
+        return ReplayCapture(source)
+    return cv2.VideoCapture(source)
+
+
+def reprocess(path, model, conf: float = 0.4, iou: float = 0.5, imgsz: int = 640,
+              batch: int = 8):
+    """
+    Re-score a recording with (new) weights / thresholds.
+
+    Returns ``(detections per frame, stats)``; stats include throughput and how
+    many frames changed detection count vs. the live run.
+    """
+    reader = RecordingReader(path)
+    live = reader.detections()
+    out = []
+    t0 = time.perf_counter()
+    for start in range(0, len(reader), batch):
+        frames = [reader.frame(i) for i in range(start, min(start + batch, len(reader)))]
+        results = model.predict(frames, conf=conf, iou=iou, imgsz=imgsz, verbose=False)
+        out.extend(Detections.from_result(r) for r in results)
+    elapsed = time.perf_counter() - t0
+    changed = sum(len(a) != len(b) for a, b in zip(out, live))
+    stats = {"frames": len(out), "seconds": elapsed,
+             "fps": len(out) / elapsed if elapsed else 0.0,
+             "recorded_fps": reader.fps, "frames_changed": changed}
+    return out, stats
+
+
+def main(argv=None):
+    from .core import load_yolo
+    ap = argparse.ArgumentParser(description="Re-score a recorded camera session")
+    ap.add_argument("recording")
+    ap.add_argument("--weights", default="best.pt")
+    ap.add_argument("--conf", type=float, default=0.40)
+    ap.add_argument("--iou", type=float, default=0.50)
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--batch", type=int, default=8)
+    args = ap.parse_args(argv)
+
+    model, err = load_yolo(args.weights)
+    if err:
+        raise SystemExit(err)
+    _, stats = reprocess(args.recording, model, args.conf, args.iou, args.imgsz, args.batch)
+    print(f"{stats['frames']} frames in {stats['seconds']:.1f}s — {stats['fps']:.1f} fps "
+          f"({stats['fps'] / max(stats['recorded_fps'], 1e-9):.1f}× recorded rate) · "
+          f"{stats['frames_changed']} frames with a different detection count")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Golden-set regression check for a candidate set of weights, on CPU only.
+
+Both the current and the candidate weights go through the pipeline the app
+uses — ``load_yolo`` → ``model.predict`` → ``annotate_image`` — on a fixed
+folder of images (sorted, so every run sees the same order). Per image the
+two runs alternate, so thermal or background-load drift hits both alike.
+
+Detections are compared by class *name* (the two models may number classes
+differently). Per class, candidate boxes are greedily matched to current
+ones by IoU ≥ ``match_iou``; left-over current boxes that a candidate box of
+another class covers count as *relabelled*, the rest as *missing*, and
+left-over candidate boxes as *extra*. Matched pairs give the mean IoU and
+confidence drift.
+
+Latency is the wall time of predict + annotate per image; the candidate's
+p50 and p95 are compared with the current weights' as ratios. Every check
+has a tolerance in ``Tolerances``; the run passes only if all hold.
+
+CLI (exit code 1 on failure)::
+
+    python -m leafscan.regression golden/ --current best.pt --candidate new.pt --json out.json
+"""
+
+import argparse
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .core import annotate_image, load_yolo
+from .evaluate import IMAGE_EXTS, box_iou
+
+_COLUMNS = ("current", "candidate", "lost", "gained")
+
+
+@dataclass
+class Tolerances:
+    max_missing: float = 0.02         # fraction of current detections
+    max_extra: float = 0.02           # fraction of current detections
+    max_relabelled: float = 0.01      # fraction of current detections
+    min_mean_iou: float = 0.90
+    max_conf_drift: float = 0.05      # mean |Δconf| over matched boxes
+    max_p50_ratio: float = 1.10       # candidate / current
+    max_p95_ratio: float = 1.25
+
+
+@dataclass
+class RegressionReport:
+    images: int
+    current: str
+    candidate: str
+    reference: int = 0                # detections from the current weights
+    matched: int = 0
+    missing: int = 0
+    extra: int = 0
+    relabelled: int = 0
+    mean_iou: float = 1.0
+    conf_drift: float = 0.0
+    latency: dict = field(default_factory=dict)     # {"current"|"candidate": {"p50", "p95", "p99"}}
+    per_class: list = field(default_factory=list)
+    changed: list = field(default_factory=list)     # images whose detections differ
+    failures: list = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return not self.failures
+
+    def frac(self, n: int) -> float:
+        return n / self.reference if self.reference else float(n > 0)
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "passed": self.passed}
+
+
+def golden_images(folder) -> list:
+    images = sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_EXTS)
+    if not images:
+        raise FileNotFoundError(f"No images under {folder}")
+    return images
+
+
+def load_cpu(weights: str):
+    model, err = load_yolo(str(weights))
+    if err:
+        raise RuntimeError(f"{weights}: {err}")
+    model.to("cpu")
+    return model
+
+
+def run_pipeline(model, image_bgr, conf: float, iou: float, imgsz: int):
+    """(dets, ms) for predict + annotate, exactly as the upload path runs them."""
+    t0 = time.perf_counter()
+    results = model.predict(image_bgr, conf=conf, iou=iou, imgsz=imgsz, device="cpu",
+                            verbose=False)
+    _, dets = annotate_image(image_bgr, results, model)
+    return dets, (time.perf_counter() - t0) * 1000
+
+
+def diff_detections(ref: list, cand: list, match_iou: float = 0.5) -> dict:
+    """Match two ``Det`` lists by class and IoU; see the module docstring."""
+    def arrays(dets):
+        return (np.array([d.box for d in dets], np.float32).reshape(-1, 4),
+                np.array([d.conf for d in dets], np.float32),
+                np.array([d.name for d in dets], object))
+
+    rb, rc, rn = arrays(ref)
+    cb, cc, cn = arrays(cand)
+    iou = box_iou(rb, cb)
+    r_used = np.zeros(len(ref), bool)
+    c_used = np.zeros(len(cand), bool)
+    ious, drift = [], []
+    for name in sorted(set(rn.tolist()) & set(cn.tolist())):
+        ri, ci = np.flatnonzero(rn == name), np.flatnonzero(cn == name)
+        sub = iou[np.ix_(ri, ci)]
+        # Highest-IoU pairs first, one partner per box
+        for flat in np.argsort(-sub, axis=None):
+            a, b = divmod(int(flat), len(ci))
+            if sub[a, b] < match_iou:
+                break
+            if r_used[ri[a]] or c_used[ci[b]]:
+                continue
+            r_used[ri[a]] = c_used[ci[b]] = True
+            ious.append(float(sub[a, b]))
+            drift.append(abs(float(rc[ri[a]] - cc[ci[b]])))
+
+    covered = (iou >= match_iou).any(1) if len(cand) else np.zeros(len(ref), bool)
+    relabelled = ~r_used & covered
+    missing = ~r_used & ~covered
+    return {"matched": int(r_used.sum()), "relabelled": int(relabelled.sum()),
+            "missing": int(missing.sum()), "extra": int((~c_used).sum()),
+            "lost_names": rn[~r_used].tolist(), "gained_names": cn[~c_used].tolist(),
+            "ious": ious, "drift": drift}
+
+
+def _percentiles(ms: list) -> dict:
+    if not ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def check(report: RegressionReport, tol: Tolerances) -> list:
+    failures = []
+    for label, n, limit in (("missing", report.missing, tol.max_missing),
+                            ("extra", report.extra, tol.max_extra),
+                            ("relabelled", report.relabelled, tol.max_relabelled)):
+        if report.frac(n) > limit:
+            failures.append(f"{label} {n} ({report.frac(n):.1%}) > {limit:.1%} of "
+                            f"{report.reference} detections")
+    if report.matched and report.mean_iou < tol.min_mean_iou:
+        failures.append(f"mean IoU {report.mean_iou:.3f} < {tol.min_mean_iou:.3f}")
+    if report.conf_drift > tol.max_conf_drift:
+        failures.append(f"confidence drift {report.conf_drift:.3f} > {tol.max_conf_drift:.3f}")
+    cur, cand = report.latency.get("current", {}), report.latency.get("candidate", {})
+    for q, limit in (("p50", tol.max_p50_ratio), ("p95", tol.max_p95_ratio)):
+        if cur.get(q) and cand[q] / cur[q] > limit:
+            failures.append(f"latency {q} {cand[q]:.1f} ms vs {cur[q]:.1f} ms "
+                            f"(×{cand[q] / cur[q]:.2f} > ×{limit:.2f})")
+    return failures
+
+
+def regress(folder, current: str, candidate: str, conf: float = 0.40, iou: float = 0.50,
+            imgsz: int = 640, match_iou: float = 0.5, tol: Tolerances = None,
+            warmup: int = 3, repeats: int = 1, progress=None) -> RegressionReport:
+    tol = tol or Tolerances()
+    images = golden_images(folder)
+    models = {"current": load_cpu(current), "candidate": load_cpu(candidate)}
+    first = cv2.imread(str(images[0]))
+    for model in models.values():
+        for _ in range(warmup):
+            run_pipeline(model, first, conf, iou, imgsz)
+
+    report = RegressionReport(images=len(images), current=str(current), candidate=str(candidate))
+    lat = {"current": [], "candidate": []}
+    per_class = {}
+    ious, drift = [], []
+    for k, path in enumerate(images):
+        img = cv2.imread(str(path))
+        if img is None:
+            continue
+        out = {}
+        for _ in range(repeats):
+            for key, model in models.items():
+                out[key], ms = run_pipeline(model, img, conf, iou, imgsz)
+                lat[key].append(ms)
+        d = diff_detections(out["current"], out["candidate"], match_iou)
+        report.reference += len(out["current"])
+        report.matched += d["matched"]
+        report.missing += d["missing"]
+        report.extra += d["extra"]
+        report.relabelled += d["relabelled"]
+        ious += d["ious"]
+        drift += d["drift"]
+        counts = (("current", [x.name for x in out["current"]]),
+                  ("candidate", [x.name for x in out["candidate"]]),
+                  ("lost", d["lost_names"]), ("gained", d["gained_names"]))
+        for col, names in counts:
+            for name in names:
+                per_class.setdefault(name, dict.fromkeys(_COLUMNS, 0))[col] += 1
+        if d["missing"] or d["extra"] or d["relabelled"]:
+            report.changed.append({"image": str(path), "missing": d["missing"],
+                                   "extra": d["extra"], "relabelled": d["relabelled"]})
+        if progress:
+            progress((k + 1) / len(images))
+
+    report.mean_iou = float(np.mean(ious)) if ious else 1.0
+    report.conf_drift = float(np.mean(drift)) if drift else 0.0
+    report.latency = {key: _percentiles(ms) for key, ms in lat.items()}
+    report.per_class = [{"class": name, **row} for name, row in sorted(per_class.items())]
+    report.failures = check(report, tol)
+    return report
+
+
+def summary(r: RegressionReport) -> str:
+    cur, cand = r.latency["current"], r.latency["candidate"]
+    lines = [
+        f"{r.images} images · {r.reference} current detections",
+        f"matched {r.matched} · missing {r.missing} · extra {r.extra} · relabelled {r.relabelled}"
+        f" · mean IoU {r.mean_iou:.3f} · conf drift {r.conf_drift:.3f}",
+        f"latency ms   current p50 {cur['p50']:.1f} p95 {cur['p95']:.1f} p99 {cur['p99']:.1f}"
+        f"   candidate p50 {cand['p50']:.1f} p95 {cand['p95']:.1f} p99 {cand['p99']:.1f}",
+    ]
+    for row in r.per_class:
+        if row["lost"] or row["gained"]:
+            lines.append(f"  {row['class']:<24} {row['current']:>5} → {row['candidate']:<5} "
+                         f"lost {row['lost']}  gained {row['gained']}")
+    lines += [f"FAIL: {f}" for f in r.failures] or ["PASS"]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Golden-set regression of candidate weights (CPU)")
+    ap.add_argument("images", help="folder of golden images")
+    ap.add_argument("--current", default="best.pt")
+    ap.add_argument("--candidate", required=True)
+    ap.add_argument("--conf", type=float, default=0.40)
+    ap.add_argument("--iou", type=float, default=0.50)
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--match-iou", type=float, default=0.5)
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--repeats", type=int, default=1, help="timed runs per image and weights")
+    ap.add_argument("--threads", type=int, default=0, help="torch threads (0 = default)")
+    ap.add_argument("--json", default=None, help="write the full report as JSON")
+    for name, default in asdict(Tolerances()).items():
+        ap.add_argument("--" + name.replace("_", "-"), type=float, default=default)
+    args = ap.parse_args(argv)
+
+    if args.threads:
+        from .resources import ResourcePlan, apply_plan
+        apply_plan(ResourcePlan(torch_threads=args.threads))
+    tol = Tolerances(**{k: getattr(args, k) for k in asdict(Tolerances())})
+    r = regress(args.images, args.current, args.candidate, args.conf, args.iou, args.imgsz,
+                args.match_iou, tol, args.warmup, args.repeats)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r.to_dict(), f, indent=2)
+    print(summary(r))
+    if not r.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
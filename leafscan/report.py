@@ -0,0 +1,415 @@
+"""
+Daily scouting reports from a day-partitioned detection log.
+
+Every detection the app records (upload, camera, survey) is also appended to
+``DetectionLog``: one fixed-width binary file per local day, ``LOG_DTYPE``
+rows of 29 bytes, with class and orchard-block names in a small shared table.
+
+Reports never rescan that log. Per day, ``day_stats`` keeps an aggregate —
+counts and confidence sums per (block, class), diseased-leaf-area histograms
+and the top-confidence evidence thumbnails — together with the number of
+rows it covers. Building a report loads the cached aggregate and folds in
+only rows appended since; closed days are read once and then served from
+``cache/<day>.npz``. A season report is a sum over ~200 small aggregates.
+
+``build_report`` renders self-contained HTML (thumbnails inlined), laid out to
+print cleanly, so "Save as PDF" in the browser gives the PDF version.
+
+CLI::
+
+    python -m leafscan.report --root detections --start 2026-06-01 --end 2026-06-30
+    python -m leafscan.report --bench 2000000     # synthetic season, cold vs. cached
+"""
+
+import argparse
+import base64
+import html
+import json
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from .core import get_disease_info
+
+SOURCES = ("upload", "camera", "survey")
+
+LOG_DTYPE = np.dtype([
+    ("t",        np.float64),    # epoch seconds
+    ("cls",      np.uint16),     # index into DetectionLog.classes
+    ("source",   np.uint8),      # index into SOURCES
+    ("block",    np.uint16),     # index into DetectionLog.blocks
+    ("conf",     np.float32),
+    ("leaf_pct", np.float32),    # NaN when not measured
+    ("thumb",    np.uint64),     # ThumbStore key, 0 = none
+])
+
+SEV_EDGES = np.array([5.0, 10.0, 25.0, 50.0], np.float32)    # diseased leaf area %
+SEV_LABELS = ("<5%", "5–10%", "10–25%", "25–50%", "≥50%", "not measured")
+TOP_K = 6
+
+
+@dataclass
+class DayStats:
+    """Aggregate of one day's rows; arrays are indexed [block, class, …]."""
+    rows: int
+    counts: np.ndarray           # (B, K) int64
+    conf_sum: np.ndarray         # (B, K) float64
+    sev: np.ndarray              # (B, K, len(SEV_LABELS)) int64
+    top_conf: np.ndarray         # (B, K, TOP_K) float32, 0 = empty
+    top_thumb: np.ndarray        # (B, K, TOP_K) uint64
+
+    @classmethod
+    def empty(cls, B: int = 0, K: int = 0):
+        return cls(0, np.zeros((B, K), np.int64), np.zeros((B, K)),
+                   np.zeros((B, K, len(SEV_LABELS)), np.int64),
+                   np.zeros((B, K, TOP_K), np.float32), np.zeros((B, K, TOP_K), np.uint64))
+
+    def resized(self, B: int, K: int) -> "DayStats":
+        """Zero-padded to at least B blocks and K classes (name tables only grow)."""
+        b, k = self.counts.shape
+        if b >= B and k >= K:
+            return self
+        out = DayStats.empty(max(B, b), max(K, k))
+        out.rows = self.rows
+        for name in ("counts", "conf_sum", "sev", "top_conf", "top_thumb"):
+            getattr(out, name)[:b, :k] = getattr(self, name)
+        return out
+
+    def merge(self, other: "DayStats") -> "DayStats":
+        B = max(self.counts.shape[0], other.counts.shape[0])
+        K = max(self.counts.shape[1], other.counts.shape[1])
+        a, b = self.resized(B, K), other.resized(B, K)
+        conf = np.concatenate([a.top_conf, b.top_conf], 2)
+        thumb = np.concatenate([a.top_thumb, b.top_thumb], 2)
+        keep = np.argsort(-conf, 2, kind="stable")[..., :TOP_K]
+        return DayStats(a.rows + b.rows, a.counts + b.counts, a.conf_sum + b.conf_sum,
+                        a.sev + b.sev, np.take_along_axis(conf, keep, 2),
+                        np.take_along_axis(thumb, keep, 2))
+
+    def save(self, path):
+        np.savez(path, rows=self.rows, counts=self.counts, conf_sum=self.conf_sum,
+                 sev=self.sev, top_conf=self.top_conf, top_thumb=self.top_thumb)
+
+    @classmethod
+    def load(cls, path):
+        z = np.load(path)
+        return cls(int(z["rows"]), z["counts"], z["conf_sum"], z["sev"], z["top_conf"],
+                   z["top_thumb"])
+
+
+def aggregate(recs, B: int, K: int) -> DayStats:
+    """``DayStats`` of a batch of ``LOG_DTYPE`` rows, all vectorised."""
+    st = DayStats.empty(B, K)
+    st.rows = len(recs)
+    if not len(recs):
+        return st
+    cell = recs["block"].astype(np.int64) * K + recs["cls"]
+    st.counts = np.bincount(cell, minlength=B * K).reshape(B, K)
+    st.conf_sum = np.bincount(cell, weights=recs["conf"], minlength=B * K).reshape(B, K)
+    pct = recs["leaf_pct"]
+    nb = len(SEV_LABELS)
+    sev_bin = np.where(np.isnan(pct), nb - 1, np.searchsorted(SEV_EDGES, pct, side="right"))
+    st.sev = np.bincount(cell * nb + sev_bin, minlength=B * K * nb).reshape(B, K, nb)
+
+    # Top-K evidence per cell: sort by (cell, -conf), rank inside each cell
+    has = recs["thumb"] != 0
+    c, conf, thumb = cell[has], recs["conf"][has], recs["thumb"][has]
+    order = np.lexsort((-conf, c))
+    c, conf, thumb = c[order], conf[order], thumb[order]
+    first = np.r_[0, np.flatnonzero(np.diff(c)) + 1]
+    rank = np.arange(len(c)) - np.repeat(first, np.diff(np.r_[first, len(c)]))
+    k = rank < TOP_K
+    st.top_conf.reshape(B * K, TOP_K)[c[k], rank[k]] = conf[k]
+    st.top_thumb.reshape(B * K, TOP_K)[c[k], rank[k]] = thumb[k]
+    return st
+
+
+class DetectionLog:
+    """Append-only per-day detection files with cached per-day aggregates."""
+
+    def __init__(self, root="detections", memory_days: int = 400):
+        self.root = Path(root)
+        (self.root / "days").mkdir(parents=True, exist_ok=True)
+        (self.root / "cache").mkdir(exist_ok=True)
+        self._lock = threading.Lock()
+        self._names_path = self.root / "names.json"
+        self._load_names()
+        self._mem = OrderedDict()        # day → DayStats
+        self.memory_days = memory_days
+
+    def _load_names(self):
+        names = json.loads(self._names_path.read_text()) if self._names_path.exists() else {}
+        self.classes = names.get("classes", [])
+        self.blocks = names.get("blocks", [""])
+        self._ids = {("c", n): i for i, n in enumerate(self.classes)}
+        self._ids.update({("b", n): i for i, n in enumerate(self.blocks)})
+
+    def _id(self, kind: str, name: str) -> int:
+        i = self._ids.get((kind, name))
+        if i is None:
+            table = self.classes if kind == "c" else self.blocks
+            i = self._ids[(kind, name)] = len(table)
+            table.append(name)
+            self._names_path.write_text(json.dumps({"classes": self.classes,
+                                                    "blocks": self.blocks}))
+        return i
+
+    def _day_path(self, day: str) -> Path:
+        return self.root / "days" / f"{day}.bin"
+
+    # ── writes ────────────────────────────────
+    def append(self, disease: str, conf: float, source: str = "upload", block: str = "",
+               leaf_pct=None, thumb: int = 0, t: float = None):
+        self.append_many([dict(disease=disease, conf=conf, source=source, block=block,
+                               leaf_pct=leaf_pct, thumb=thumb, t=t)])
+
+    def append_many(self, rows):
+        """``rows``: dicts with ``disease``, ``conf`` and optional ``source``,
+        ``block``, ``leaf_pct``, ``thumb``, ``t``."""
+        rows = list(rows)
+        if not rows:
+            return
+        now = time.time()
+        with self._lock:
+            recs = np.zeros(len(rows), LOG_DTYPE)
+            for i, r in enumerate(rows):
+                rec = recs[i]
+                rec["t"] = now if r.get("t") is None else r["t"]
+                rec["cls"] = self._id("c", r["disease"])
+                rec["source"] = SOURCES.index(r.get("source", "upload"))
+                rec["block"] = self._id("b", r.get("block") or "")
+                rec["conf"] = r["conf"]
+                rec["leaf_pct"] = np.nan if r.get("leaf_pct") is None else r["leaf_pct"]
+                rec["thumb"] = r.get("thumb") or 0
+            days = np.array([datetime.fromtimestamp(t).strftime("%Y-%m-%d") for t in recs["t"]])
+            for day in np.unique(days):
+                with self._day_path(day).open("ab") as f:
+                    recs[days == day].tofile(f)
+
+    # ── reads ─────────────────────────────────
+    def days(self) -> list:
+        return sorted(p.stem for p in (self.root / "days").glob("*.bin"))
+
+    def day_stats(self, day: str) -> DayStats:
+        """Cached aggregate of ``day``, brought up to date with any new rows."""
+        path = self._day_path(day)
+        n_rows = path.stat().st_size // LOG_DTYPE.itemsize if path.exists() else 0
+        with self._lock:
+            B, K = len(self.blocks), len(self.classes)
+            st = self._mem.get(day)
+            cache = self.root / "cache" / f"{day}.npz"
+            if st is None and cache.exists():
+                st = DayStats.load(cache)
+            if st is None or st.rows > n_rows:
+                st = DayStats.empty(B, K)
+            if st.rows < n_rows:
+                new = np.fromfile(path, LOG_DTYPE, count=n_rows - st.rows,
+                                  offset=st.rows * LOG_DTYPE.itemsize)
+                if new["cls"].max() >= K or new["block"].max() >= B:
+                    self._load_names()          # names added by another process
+                    B, K = len(self.blocks), len(self.classes)
+                st = st.merge(aggregate(new, B, K))
+                st.save(cache)
+            st = st.resized(B, K)
+            self._mem[day] = st
+            self._mem.move_to_end(day)
+            while len(self._mem) > self.memory_days:
+                self._mem.popitem(last=False)
+            return st
+
+    def range_stats(self, start: date, end: date) -> list:
+        """[(day, DayStats)] for every day in [start, end]."""
+        n = (end - start).days + 1
+        return [(d, self.day_stats(d)) for d in
+                ((start + timedelta(i)).isoformat() for i in range(max(0, n)))]
+
+
+# ══════════════════════════════════════════════
+# HTML
+# ══════════════════════════════════════════════
+_CSS = """
+body{font-family:Georgia,serif;color:#1f2d1f;margin:32px;max-width:1000px}
+h1{font-weight:600;margin-bottom:2px} h2{margin-top:28px;border-bottom:1px solid #cfd8cf}
+.muted{color:#6b7b6b;font-size:.85rem} table{border-collapse:collapse;width:100%;font-size:.85rem}
+td,th{padding:4px 8px;border-bottom:1px solid #e3e9e3;text-align:right}
+td:first-child,th:first-child{text-align:left}
+.bar{display:flex;height:14px;border-radius:3px;overflow:hidden;background:#eef2ee}
+.ev{display:inline-block;margin:4px;text-align:center;font-size:.7rem}
+.ev img{width:96px;height:96px;object-fit:cover;border-radius:4px;display:block}
+@media print{body{margin:12mm} h2{page-break-after:avoid} .ev{page-break-inside:avoid}}
+"""
+
+
+def _trend_svg(series: dict, days: list, width: int = 900, height: int = 160) -> str:
+    peak = max((max(v) for v in series.values()), default=0) or 1
+    step = width / max(1, len(days) - 1)
+    lines = []
+    for name, values in series.items():
+        pts = " ".join(f"{i * step:.1f},{height - 14 - v / peak * (height - 24):.1f}"
+                       for i, v in enumerate(values))
+        lines.append(f'<polyline fill="none" stroke="{get_disease_info(name)["color"]}" '
+                     f'stroke-width="2" points="{pts}"><title>{html.escape(name)}</title></polyline>')
+    labels = "".join(f'<text x="{i * step:.1f}" y="{height}" font-size="9" fill="#6b7b6b">'
+                     f'{d[5:]}</text>' for i, d in enumerate(days) if i % max(1, len(days) // 8) == 0)
+    return (f'<svg viewBox="-4 0 {width + 40} {height + 4}" width="100%">{"".join(lines)}{labels}'
+            f'<text x="{width + 4}" y="12" font-size="9" fill="#6b7b6b">{peak}</text></svg>')
+
+
+def build_report(log: DetectionLog, start: date, end: date, blocks=None, thumbs=None,
+                 trend_days: int = 14, title: str = "Scouting Report") -> str:
+    """Self-contained HTML for [start, end], optionally limited to some blocks."""
+    t0 = time.perf_counter()
+    period = log.range_stats(start, end)
+    trend_start = min(start, end - timedelta(trend_days - 1))
+    trend = log.range_stats(trend_start, end)
+    B, K = len(log.blocks), len(log.classes)
+    sel = np.ones(B, bool) if not blocks else np.isin(log.blocks, list(blocks))
+
+    total = DayStats.empty(B, K)
+    for _, st in period:
+        total = total.merge(st)
+    counts = total.counts[sel].sum(0)
+    conf = total.conf_sum[sel].sum(0)
+    sev = total.sev[sel].sum(0)
+    present = [k for k in np.argsort(-counts) if counts[k]]
+    diseased = sum(counts[k] for k in present
+                   if get_disease_info(log.classes[k])["severity_score"] > 0)
+    n = int(counts.sum())
+
+    span = start.isoformat() if start == end else f"{start.isoformat()} – {end.isoformat()}"
+    scope = ", ".join(html.escape(b or "(no block)") for b in blocks) if blocks else "all blocks"
+    out = [f"<!doctype html><html><head><meta charset='utf-8'><title>{title} {span}</title>"
+           f"<style>{_CSS}</style></head><body>",
+           f"<h1>{title}</h1><div class='muted'>{span} · {scope} · "
+           f"generated {datetime.now():%Y-%m-%d %H:%M}</div>",
+           f"<p><b>{n:,}</b> detections · <b>{diseased:,}</b> diseased "
+           f"({diseased / max(1, n):.0%}) · {len(present)} classes</p>"]
+
+    # Per-class counts, with a column per block that has data
+    block_ids = [b for b in np.flatnonzero(sel) if total.counts[b].sum()]
+    out.append("<h2>Detections by class</h2><table><tr><th>Class</th><th>Total</th>"
+               "<th>Mean conf</th>" + "".join(f"<th>{html.escape(log.blocks[b] or '—')}</th>"
+                                               for b in block_ids) + "</tr>")
+    for k in present:
+        info = get_disease_info(log.classes[k])
+        out.append(f"<tr><td>{info['icon']} {html.escape(log.classes[k])}</td>"
+                   f"<td>{counts[k]:,}</td><td>{conf[k] / counts[k]:.0%}</td>"
+                   + "".join(f"<td>{total.counts[b, k]:,}</td>" for b in block_ids) + "</tr>")
+    out.append("</table>")
+
+    # Severity distribution: diseased leaf area per class
+    shades = ("#d8ead8", "#f3e3a1", "#f0b46b", "#e07a4f", "#b8382c", "#cfd5cf")
+    out.append("<h2>Severity distribution</h2><div class='muted'>Diseased leaf area per detection: "
+               + " ".join(f"<span style='color:{c}'>■</span> {l}" for c, l in zip(shades, SEV_LABELS))
+               + "</div><table>")
+    for k in present:
+        row = sev[k]
+        segs = "".join(f"<div title='{l}: {v}' style='width:{v / row.sum() * 100:.2f}%;"
+                       f"background:{c}'></div>" for l, v, c in zip(SEV_LABELS, row, shades) if v)
+        out.append(f"<tr><td style='width:30%'>{html.escape(log.classes[k])}</td>"
+                   f"<td><div class='bar'>{segs}</div></td></tr>")
+    out.append("</table>")
+
+    # Trend over the trailing window
+    days = [d for d, _ in trend]
+    series = {log.classes[k]: [int(st.resized(B, K).counts[sel, k].sum()) for _, st in trend]
+              for k in present}
+    out.append(f"<h2>Trend · {days[0]} – {days[-1]}</h2>" + _trend_svg(series, days)
+               + "<div class='muted'>" + " ".join(
+                   f"<span style='color:{get_disease_info(nm)['color']}'>━</span> {html.escape(nm)}"
+                   for nm in series) + "</div>")
+
+    # Top-confidence evidence per class
+    if thumbs is not None:
+        out.append("<h2>Evidence</h2>")
+        for k in present:
+            c = total.top_conf[sel, k].ravel()
+            t = total.top_thumb[sel, k].ravel()
+            best = [i for i in np.argsort(-c)[:TOP_K] if c[i] > 0]
+            imgs = [(c[i], thumbs.get(int(t[i]))) for i in best]
+            imgs = [(p, d) for p, d in imgs if d is not None]
+            if not imgs:
+                continue
+            out.append(f"<div><b>{html.escape(log.classes[k])}</b><br>" + "".join(
+                f"<div class='ev'><img src='data:image/jpeg;base64,{base64.b64encode(d).decode()}'>"
+                f"{p:.0%}</div>" for p, d in imgs) + "</div>")
+
+    ms = (time.perf_counter() - t0) * 1000
+    out.append(f"<p class='muted'>{len(period)} day(s) aggregated in {ms:.0f} ms</p></body></html>")
+    return "".join(out)
+
+
+# ══════════════════════════════════════════════
+# CLI / BENCHMARK
+# ══════════════════════════════════════════════
+def _bench(n_rows: int, n_days: int = 180):
+    root = Path(tempfile.mkdtemp(prefix="leafscan-report-"))
+    log = DetectionLog(root)
+    names = ["Apple Scab", "Black Rot", "Cedar Apple Rust", "Healthy Leaf"]
+    for nm in names:
+        log._id("c", nm)
+    for b in ("A1", "A2", "B1", "B2"):
+        log._id("b", b)
+    rng = np.random.default_rng(0)
+    end = date.today()
+    start = end - timedelta(n_days - 1)
+    t0 = time.perf_counter()
+    per_day = n_rows // n_days
+    for i in range(n_days):
+        day = start + timedelta(i)
+        recs = np.zeros(per_day, LOG_DTYPE)
+        recs["t"] = datetime(day.year, day.month, day.day, 12).timestamp()
+        recs["cls"] = rng.integers(0, len(names), per_day)
+        recs["block"] = rng.integers(1, 5, per_day)
+        recs["conf"] = rng.uniform(0.3, 1.0, per_day)
+        recs["leaf_pct"] = np.where(rng.random(per_day) < 0.3, np.nan,
+                                    rng.uniform(0, 60, per_day))
+        recs["thumb"] = rng.integers(1, 2**62, per_day, dtype=np.uint64)
+        recs.tofile(log._day_path(day.isoformat()))
+    print(f"{per_day * n_days:,} rows over {n_days} days written in {time.perf_counter() - t0:.1f}s "
+          f"({root})")
+
+    def timed(label, lg):
+        t = time.perf_counter()
+        build_report(lg, start, end)
+        print(f"{label:<34} {(time.perf_counter() - t) * 1000:9.1f} ms")
+
+    timed("season report, cold (no cache)", log)
+    timed("season report, in-memory cache", log)
+    timed("season report, new process (npz)", DetectionLog(root))
+    log.append_many([dict(disease="Apple Scab", conf=0.9, block="A1") for _ in range(1000)])
+    timed("after 1000 new rows today", log)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Daily / per-block scouting report")
+    ap.add_argument("--root", default="detections")
+    ap.add_argument("--start", default=None, help="YYYY-MM-DD (default: --end)")
+    ap.add_argument("--end", default=None, help="YYYY-MM-DD (default: today)")
+    ap.add_argument("--block", action="append", help="limit to block(s); repeatable")
+    ap.add_argument("--thumbs", default="history_thumbs", help="ThumbStore root for evidence")
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--bench", type=int, default=0, help="benchmark with N synthetic rows")
+    args = ap.parse_args(argv)
+    if args.bench:
+        return _bench(args.bench)
+
+    from .thumbs import ThumbStore
+    end = date.fromisoformat(args.end) if args.end else date.today()
+    start = date.fromisoformat(args.start) if args.start else end
+    log = DetectionLog(args.root)
+    thumbs = ThumbStore(args.thumbs) if Path(args.thumbs).exists() else None
+    doc = build_report(log, start, end, args.block, thumbs)
+    out = args.out or f"scouting_report_{start}_{end}.html"
+    Path(out).write_text(doc, encoding="utf-8")
+    print(f"→ {out}")
+
+
+if __name__ == "__main__":
+    main()
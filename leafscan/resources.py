@@ -0,0 +1,186 @@
+"""
+CPU partitioning for inference and preprocessing threads.
+
+Left alone, every torch call uses all cores for intra-op work, OpenCV starts
+its own pool, and several sessions' camera workers multiply both — the box is
+oversubscribed and tail latency spikes. ``plan_resources`` splits the cores:
+
+* ``prep_cores``  — frame grabbing / decode / OpenCV drawing;
+* ``infer_cores`` — one disjoint slice per inference worker.
+
+``apply_plan`` sets the process-wide knobs (``torch.set_num_threads``,
+interop threads, ``cv2.setNumThreads``). ``pin_current_thread`` restricts the
+calling thread to a core set (Linux ``sched_setaffinity`` on the thread id);
+OpenMP threads torch starts from that thread inherit the mask.
+
+Defaults come from the ``perf`` section of ``leafscan.config``; the sidebar
+can override them per run.
+
+Benchmark::
+
+    python -m leafscan.resources --weights best.pt --image leaf.jpg --configs 1x8 2x4 4x2 8x1
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+
+def cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+@dataclass
+class ResourcePlan:
+    torch_threads: int = 0        # 0 = leave torch's default
+    interop_threads: int = 0
+    cv2_threads: int = -1         # -1 = leave OpenCV's default, 0 = no pool
+    pin: bool = False
+    prep_cores: list = field(default_factory=list)
+    infer_cores: list = field(default_factory=list)   # one core list per worker
+
+    def worker_cores(self, i: int):
+        """Core set for inference worker ``i`` (round-robin), None if unpinned."""
+        if not self.pin or not self.infer_cores:
+            return None
+        return self.infer_cores[i % len(self.infer_cores)]
+
+
+def plan_resources(workers: int = 1, prep_frac: float = 0.25, pin: bool = False,
+                   total: int = None) -> ResourcePlan:
+    """Split ``total`` cores into a preprocessing slice and ``workers`` inference slices."""
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") \
+        else list(range(os.cpu_count() or 1))
+    if total:
+        cores = cores[:total]
+    n_prep = max(1, int(round(len(cores) * prep_frac))) if len(cores) > workers else 0
+    prep, rest = cores[:n_prep], cores[n_prep:] or cores
+    per = max(1, len(rest) // max(1, workers))
+    infer = [rest[i * per:(i + 1) * per] or rest[-per:] for i in range(max(1, workers))]
+    return ResourcePlan(torch_threads=per, interop_threads=1,
+                        cv2_threads=max(1, len(prep)), pin=pin,
+                        prep_cores=prep, infer_cores=infer)
+
+
+def apply_plan(plan: ResourcePlan) -> dict:
+    """Apply process-wide thread counts; returns what is actually in effect."""
+    notes = []
+    if plan.cv2_threads >= 0:
+        cv2.setNumThreads(plan.cv2_threads)
+    try:
+        import torch
+        if plan.torch_threads > 0:
+            torch.set_num_threads(plan.torch_threads)
+        if plan.interop_threads > 0 and torch.get_num_interop_threads() != plan.interop_threads:
+            try:
+                torch.set_num_interop_threads(plan.interop_threads)
+            except RuntimeError:
+                # Only settable before the first parallel op in the process
+                notes.append("interop threads fixed after first inference — restart to change")
+        torch_threads, interop = torch.get_num_threads(), torch.get_num_interop_threads()
+    except ImportError:
+        torch_threads = interop = None
+    return {"torch_threads": torch_threads, "interop_threads": interop,
+            "cv2_threads": cv2.getNumThreads(), "cores": cpu_count(), "notes": notes}
+
+
+def pin_current_thread(cores) -> bool:
+    """Restrict the calling thread to ``cores``; no-op where unsupported."""
+    if not cores or not hasattr(os, "sched_setaffinity"):
+        return False
+    try:
+        os.sched_setaffinity(threading.get_native_id(), set(cores))
+        return True
+    except OSError:
+        return False
+
+
+# ══════════════════════════════════════════════
+# BENCHMARK
+# ══════════════════════════════════════════════
+def _child(args):
+    """One configuration in a fresh process (interop threads are set-once)."""
+    from .core import load_yolo
+    workers, threads = map(int, args.config.split("x"))
+    plan = plan_resources(workers=workers, pin=args.pin)
+    plan.torch_threads = threads
+    apply_plan(plan)
+    img = cv2.imread(args.image) if args.image else \
+        np.random.default_rng(0).integers(0, 255, (720, 1280, 3), np.uint8)
+    models = []
+    for _ in range(workers):
+        m, err = load_yolo(args.weights)
+        if err:
+            raise SystemExit(err)
+        m.predict(img, imgsz=args.imgsz, verbose=False)     # warm-up
+        models.append(m)
+
+    lat = [[] for _ in range(workers)]
+    stop_at = time.perf_counter() + args.seconds
+
+    def run(i):
+        pin_current_thread(plan.worker_cores(i))
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            models[i].predict(img, imgsz=args.imgsz, verbose=False)
+            lat[i].append((time.perf_counter() - t0) * 1000)
+
+    threads_ = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+    t0 = time.perf_counter()
+    for t in threads_:
+        t.start()
+    for t in threads_:
+        t.join()
+    wall = time.perf_counter() - t0
+    all_lat = np.concatenate([np.array(l) for l in lat]) if any(lat) else np.zeros(1)
+    print(json.dumps({"config": args.config, "pin": args.pin, "ips": len(all_lat) / wall,
+                      "p50": float(np.percentile(all_lat, 50)),
+                      "p95": float(np.percentile(all_lat, 95)),
+                      "p99": float(np.percentile(all_lat, 99))}))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Throughput / tail latency across core partitionings")
+    ap.add_argument("--weights", default="best.pt")
+    ap.add_argument("--image", default=None, help="test image (random noise if omitted)")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--seconds", type=float, default=20.0)
+    ap.add_argument("--configs", nargs="+", default=None,
+                    help="WORKERSxTHREADS, e.g. 1x8 2x4 4x2")
+    ap.add_argument("--pin", action="store_true")
+    ap.add_argument("--config", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.config:
+        return _child(args)
+
+    n = cpu_count()
+    configs = args.configs or [f"{w}x{max(1, n // w)}" for w in (1, 2, 4, 8) if w <= n]
+    print(f"{n} cores · {args.seconds:.0f}s per config · imgsz {args.imgsz}"
+          + (" · pinned" if args.pin else ""))
+    print(f"{'workers x threads':>18} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for c in configs:
+        cmd = [sys.executable, "-m", "leafscan.resources", "--config", c,
+               "--weights", args.weights, "--imgsz", str(args.imgsz),
+               "--seconds", str(args.seconds)] + (["--image", args.image] if args.image else []) \
+            + (["--pin"] if args.pin else [])
+        out = subprocess.run(cmd, capture_output=True, text=True)
+        if out.returncode:
+            print(f"{c:>18}  failed: {out.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{c:>18} {r['ips']:8.1f} {r['p50']:8.1f} {r['p95']:8.1f} {r['p99']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
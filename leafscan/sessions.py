@@ -0,0 +1,80 @@
+"""
+Server-wide view of per-session memory, with idle-session eviction.
+
+Each script run registers the session's heavy objects (history buffer,
+last upload result, camera worker) under its session id. The registry can then
+report approximate bytes held per session and release the heavy parts of
+sessions that have been idle for too long. Eviction only drops what can be
+recomputed: worker threads are stopped and image results cleared; history is
+kept.
+"""
+
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+def approx_nbytes(obj, _depth: int = 0) -> int:
+    """Rough retained size: ndarray buffers, containers, objects with ``nbytes``."""
+    if obj is None or _depth > 4:
+        return 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    nb = getattr(obj, "nbytes", None)
+    if isinstance(nb, int):
+        return nb
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(approx_nbytes(v, _depth + 1) for v in obj.values())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(approx_nbytes(v, _depth + 1) for v in obj)
+    return sys.getsizeof(obj)
+
+
+def release(obj):
+    """Drop the heavy part of one registered object."""
+    if obj is None:
+        return
+    if hasattr(obj, "stop"):
+        obj.stop()
+    if isinstance(obj, dict):
+        obj.clear()
+
+
+class SessionRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}     # session id → {"seen": ts, "objects": {name: obj}}
+
+    def touch(self, session_id: str, **objects):
+        with self._lock:
+            self._sessions[session_id] = {"seen": time.time(), "objects": objects}
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def usage(self) -> list:
+        """One row per session, largest first."""
+        now = time.time()
+        with self._lock:
+            items = list(self._sessions.items())
+        rows = []
+        for sid, entry in items:
+            parts = {k: approx_nbytes(v) for k, v in entry["objects"].items()}
+            rows.append({"session": sid[:8], "idle_s": round(now - entry["seen"]),
+                         "bytes": sum(parts.values()), **parts})
+        rows.sort(key=lambda r: -r["bytes"])
+        return rows
+
+    def evict_idle(self, max_idle_s: float) -> int:
+        """Release and forget sessions idle longer than ``max_idle_s``."""
+        cutoff = time.time() - max_idle_s
+        with self._lock:
+            idle = [sid for sid, e in self._sessions.items() if e["seen"] < cutoff]
+            entries = [self._sessions.pop(sid) for sid in idle]
+        for e in entries:
+            for obj in e["objects"].values():
+                release(obj)
+        return len(entries)
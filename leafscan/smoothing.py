@@ -0,0 +1,142 @@
+"""
+Temporal smoothing of camera detections into stable per-leaf diagnoses.
+
+Per-frame labels flicker: the same leaf is Apple Scab in one frame, Black Rot
+in the next and missing in the third. ``TemporalSmoother`` keeps a fixed table
+of ``max_tracks`` regions. Each frame, every detection joins the region it
+overlaps most (IoU ≥ ``match_iou``) or claims a free row; the frame's vote for
+a region is the highest confidence per class among its detections (0 for the
+rest), and the region's class scores are an exponential moving average of
+those votes. Regions unseen for ``window`` frames are freed.
+
+The diagnosis of a region is the arg-max of its bias-corrected EMA, and its
+confidence is that score — roughly the mean confidence of the class over the
+recent frames, discounted for frames where the leaf was not seen or labelled
+otherwise. Only regions seen in at least ``min_hits`` frames are reported.
+
+State lives in preallocated NumPy arrays, so per-frame cost is bounded by
+``max_tracks`` × detections however long the camera runs.
+"""
+
+import numpy as np
+
+from .core import Det, Detections
+
+
+class LeafTrack(Det):
+    """A smoothed diagnosis: ``Det`` fields plus the track id and frames seen."""
+    __slots__ = ("id", "hits")
+
+    def __init__(self, name: str, conf: float, box: tuple, id: int, hits: int):
+        super().__init__(name, conf, box)
+        self.id = id
+        self.hits = hits
+
+    def to_dict(self) -> dict:
+        return {**super().to_dict(), "id": self.id, "hits": self.hits}
+
+
+class TemporalSmoother:
+    """
+    ``update(Detections)`` once per processed frame → list of ``LeafTrack``.
+
+    ``window`` sets both the EMA span (``alpha = 2 / (window + 1)``) and how
+    many frames a region survives without a detection.
+    """
+
+    def __init__(self, names: dict, window: int = 15, min_hits: int = 3,
+                 match_iou: float = 0.3, max_tracks: int = 64, box_alpha: float = 0.5):
+        self.names = dict(names)
+        n_cls = max(self.names, default=0) + 1
+        self.boxes = np.zeros((max_tracks, 4), np.float32)
+        self.scores = np.zeros((max_tracks, n_cls), np.float32)
+        self.last = np.full(max_tracks, -1, np.int64)     # frame last seen, -1 = free row
+        self.born = np.zeros(max_tracks, np.int64)
+        self.hits = np.zeros(max_tracks, np.int32)
+        self.ids = np.zeros(max_tracks, np.int64)
+        self._votes = np.zeros_like(self.scores)
+        self._obs_box = np.zeros_like(self.boxes)
+        self._seen = np.zeros(max_tracks, bool)
+        self.frame = 0
+        self._next_id = 1
+        self.min_hits = min_hits
+        self.match_iou = match_iou
+        self.box_alpha = box_alpha
+        self.configure(window=window)
+
+    def configure(self, window: int = None, min_hits: int = None):
+        if window is not None:
+            self.window = max(1, int(window))
+            self.alpha = 2.0 / (self.window + 1)
+        if min_hits is not None:
+            self.min_hits = min_hits
+
+    def reset(self):
+        self.last[:] = -1
+        self.frame = 0
+
+    def _iou(self, box):
+        b = self.boxes
+        iw = np.minimum(b[:, 2], box[2]) - np.maximum(b[:, 0], box[0])
+        ih = np.minimum(b[:, 3], box[3]) - np.maximum(b[:, 1], box[1])
+        inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+        union = ((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+                 + (box[2] - box[0]) * (box[3] - box[1]) - inter)
+        iou = inter / np.maximum(union, 1e-6)
+        iou[self.last < 0] = -1.0
+        return iou
+
+    def _claim(self, box) -> int:
+        free = np.flatnonzero(self.last < 0)
+        j = int(free[0]) if len(free) else int(self.last.argmin())    # table full: evict the stalest
+        self.boxes[j] = box
+        self.scores[j] = 0.0
+        self.hits[j] = 0
+        self.born[j] = self.last[j] = self.frame
+        self.ids[j] = self._next_id
+        self._next_id += 1
+        return j
+
+    def update(self, det: Detections) -> list:
+        self.frame += 1
+        self.last[(self.last >= 0) & (self.frame - self.last > self.window)] = -1
+        self._votes[:] = 0.0
+        self._seen[:] = False
+        n_cls = self.scores.shape[1]
+
+        # Most confident first: it sets the region's box for this frame
+        for i in np.argsort(-det.conf):
+            c = int(det.cls[i])
+            if c >= n_cls:
+                continue
+            box = det.xyxy[i]
+            iou = self._iou(box)
+            j = int(iou.argmax())
+            if iou[j] < self.match_iou:
+                j = self._claim(box)
+            if not self._seen[j]:
+                self._obs_box[j] = box
+                self._seen[j] = True
+            self._votes[j, c] = max(self._votes[j, c], det.conf[i])
+
+        live = self.last >= 0
+        self.scores[live] += self.alpha * (self._votes[live] - self.scores[live])
+        seen = self._seen
+        self.boxes[seen] += self.box_alpha * (self._obs_box[seen] - self.boxes[seen])
+        self.hits[seen] += 1
+        self.last[seen] = self.frame
+        return self.stable()
+
+    def stable(self) -> list:
+        """Regions seen in ≥ ``min_hits`` frames, most confident first."""
+        rows = np.flatnonzero((self.last >= 0) & (self.hits >= self.min_hits))
+        if not len(rows):
+            return []
+        age = self.frame - self.born[rows] + 1
+        scores = self.scores[rows] / (1.0 - (1.0 - self.alpha) ** age)[:, None]
+        top = scores.argmax(1)
+        conf = scores[np.arange(len(rows)), top]
+        out = [LeafTrack(self.names.get(int(k), str(k)), float(p),
+                         tuple(int(v) for v in self.boxes[j]), int(self.ids[j]), int(self.hits[j]))
+               for j, k, p in zip(rows, top, conf) if p > 0]
+        return sorted(out, key=lambda t: t.conf, reverse=True)
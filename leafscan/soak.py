@@ -0,0 +1,243 @@
+"""
+Soak test: run the camera pipeline for a long time and fail on resource growth.
+
+The harness drives a real ``CameraWorker`` unthrottled — compressed time —
+from a synthetic moving frame source or a recording, and plays the UI's part:
+it polls snapshots, appends to a ``HistoryBuffer`` and stores thumbnails.
+At every sample it records:
+
+* RSS (``/proc/self/status``),
+* tracemalloc top allocation sites, diffed against the post-warm-up snapshot,
+* open file descriptors and live threads.
+
+After warm-up, samples are grouped into windows of ``--window`` and a
+least-squares slope per 1000 frames is fitted to the window medians, so
+allocator and frame-buffer noise of a few MB does not read as growth. The
+fit's 95 % half-width is reported alongside. The run fails (exit code 1) if
+descriptors or threads grow at all, or if RSS grows faster than
+``--max-rss-slope`` KB / 1k frames even at the low end of that interval.
+The RSS check only counts once the steady state spans ``--min-samples``
+samples and ``--min-frames`` frames; shorter runs report it as
+inconclusive.
+
+``--weights synthetic`` replaces the detector with a random-box stand-in, so
+drawing, history and worker plumbing can be soaked without a GPU.
+
+    python -m leafscan.soak --frames 200000 --weights best.pt --report soak.json
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from .camera import CameraWorker
+from .core import Detections, load_yolo
+from .history import HistoryBuffer
+from .recording import ReplayCapture, is_recording
+from .thumbs import ThumbStore
+
+
+class SyntheticCapture:
+    """Endless moving-texture frames, unpaced."""
+
+    def __init__(self, width: int = 1280, height: int = 720, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self._base = rng.integers(0, 255, (height, width, 3), np.uint8)
+        self._base[..., 1] = np.maximum(self._base[..., 1], 120)     # greenish, passes the leaf gate
+        self._i = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        self._i += 1
+        return True, np.roll(self._base, self._i * 8, axis=1)
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        return 0.0
+
+    def release(self):
+        pass
+
+
+class SyntheticModel:
+    """Random boxes in the shape the worker expects."""
+
+    names = {0: "apple_scab", 1: "black_rot", 2: "cedar_apple_rust", 3: "healthy"}
+
+    def __init__(self, max_boxes: int = 12, seed: int = 0):
+        self.max_boxes = max_boxes
+        self._rng = np.random.default_rng(seed)
+
+    def predict(self, frame, **kwargs):
+        h, w = frame.shape[:2]
+        n = int(self._rng.integers(0, self.max_boxes + 1))
+        xy = self._rng.uniform(0, 1, (n, 2)) * [w - 200, h - 200]
+        wh = self._rng.uniform(40, 200, (n, 2))
+        return Detections(np.concatenate([xy, xy + wh], 1), self._rng.uniform(0.3, 1.0, n),
+                          self._rng.integers(0, len(self.names), n))
+
+
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def slope_per_1k(frames, values, window: int = 5):
+    """(growth of ``values`` per 1000 frames, its 95 % half-width), fitted on window medians."""
+    x = np.asarray(frames, np.float64)
+    y = np.asarray(values, np.float64)
+    n = len(x) // window
+    if window > 1 and n >= 4:
+        # Most recent n full windows; the median drops single-sample spikes
+        x = np.median(x[-n * window:].reshape(n, window), 1)
+        y = np.median(y[-n * window:].reshape(n, window), 1)
+    if len(x) < 4 or np.ptp(x) == 0:
+        return 0.0, float("inf")
+    (slope, _), cov = np.polyfit(x, y, 1, cov=True)
+    return float(slope * 1000), float(1.96 * np.sqrt(max(cov[0, 0], 0.0)) * 1000)
+
+
+def soak(source, weights: str = "synthetic", frames: int = 100_000, sample_every: float = 5.0,
+         warmup: float = 0.1, top: int = 10, window: int = 5, log=print) -> dict:
+    if source != "synthetic" and not is_recording(source):
+        raise ValueError(f"Not a recording directory: {source}")
+    model, err = (SyntheticModel(), None) if weights == "synthetic" else load_yolo(weights)
+    if err:
+        raise RuntimeError(err)
+    cap = ReplayCapture(source, loop=True) if source != "synthetic" else SyntheticCapture()
+    history = HistoryBuffer(1000)
+    thumbs = ThumbStore(tempfile.mkdtemp(prefix="leafscan-soak-"), max_bytes=8 * 2**20)
+    worker = CameraWorker(cap, model, idle_timeout=3600, max_fps=10_000, min_leaf=0.0)
+
+    tracemalloc.start(10)
+    samples, baseline = [], None
+    worker.start()
+    t0 = time.time()
+    seen = 0
+    next_sample = t0
+    try:
+        while True:
+            snap = worker.snapshot()
+            if snap.error:
+                raise RuntimeError(snap.error)
+            if snap.seq != seen:
+                seen = snap.seq
+                for d in snap.dets[:2]:
+                    history.append(d["display"], d["conf"], "camera",
+                                   thumb=thumbs.put(snap.frame_rgb, d["box"], rgb=True))
+            if time.time() >= next_sample or snap.frame_count >= frames:
+                next_sample = time.time() + sample_every
+                s = {"t": round(time.time() - t0, 1), "frames": snap.frame_count, "rss_kb": rss_kb(),
+                     "fds": open_fds(), "threads": threading.active_count(),
+                     "traced_kb": tracemalloc.get_traced_memory()[0] // 1024}
+                samples.append(s)
+                if baseline is None and snap.frame_count >= warmup * frames:
+                    baseline = tracemalloc.take_snapshot()
+                log(f"{s['t']:8.1f}s {s['frames']:9d} frames · RSS {s['rss_kb'] / 1024:7.1f} MB · "
+                    f"traced {s['traced_kb'] / 1024:6.1f} MB · fds {s['fds']} · threads {s['threads']}")
+            if snap.frame_count >= frames:
+                break
+            time.sleep(0.002)
+    finally:
+        worker.stop()
+
+    growth = []
+    if baseline is not None:
+        diff = tracemalloc.take_snapshot().compare_to(baseline, "lineno")
+        growth = [{"site": str(d.traceback[0]), "kb": round(d.size_diff / 1024, 1),
+                   "count": d.count_diff} for d in diff[:top]]
+    tracemalloc.stop()
+
+    steady = [s for s in samples if s["frames"] >= warmup * frames] or samples
+    fr = [s["frames"] for s in steady]
+    rss, rss_ci = slope_per_1k(fr, [s["rss_kb"] for s in steady], window)
+    traced, traced_ci = slope_per_1k(fr, [s["traced_kb"] for s in steady], window)
+    return {
+        "frames": samples[-1]["frames"] if samples else 0,
+        "seconds": round(time.time() - t0, 1),
+        "steady_samples": len(steady),
+        "steady_frames": fr[-1] - fr[0] if fr else 0,
+        "rss_slope_kb_per_1k": rss,
+        "rss_slope_ci": rss_ci,
+        "traced_slope_kb_per_1k": traced,
+        "traced_slope_ci": traced_ci,
+        "fd_growth": steady[-1]["fds"] - steady[0]["fds"] if steady else 0,
+        "thread_growth": steady[-1]["threads"] - steady[0]["threads"] if steady else 0,
+        "top_growth": growth,
+        "samples": samples,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Camera pipeline soak test / leak detector")
+    ap.add_argument("--source", default="synthetic", help="'synthetic' or a recording directory")
+    ap.add_argument("--weights", default="synthetic", help="'synthetic' or a .pt file")
+    ap.add_argument("--frames", type=int, default=100_000)
+    ap.add_argument("--sample-every", type=float, default=5.0, help="seconds")
+    ap.add_argument("--warmup", type=float, default=0.1, help="fraction of frames ignored")
+    ap.add_argument("--max-rss-slope", type=float, default=50.0, help="KB per 1000 frames")
+    ap.add_argument("--window", type=int, default=5, help="samples per median window")
+    ap.add_argument("--min-samples", type=int, default=40,
+                    help="steady-state samples before the RSS check can fail")
+    ap.add_argument("--min-frames", type=int, default=50_000,
+                    help="steady-state frames before the RSS check can fail")
+    ap.add_argument("--report", default=None, help="write the full report as JSON")
+    args = ap.parse_args(argv)
+
+    r = soak(args.source, args.weights, args.frames, args.sample_every, args.warmup,
+             window=args.window)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(r, f, indent=2)
+
+    print(f"\n{r['frames']} frames in {r['seconds']}s · "
+          f"RSS {r['rss_slope_kb_per_1k']:+.1f} ± {r['rss_slope_ci']:.1f} KB/1k frames · "
+          f"traced {r['traced_slope_kb_per_1k']:+.1f} ± {r['traced_slope_ci']:.1f} KB/1k · "
+          f"fds {r['fd_growth']:+d} · threads {r['thread_growth']:+d}")
+    for g in r["top_growth"]:
+        print(f"  {g['kb']:+9.1f} KB {g['count']:+7d}  {g['site']}")
+
+    failures = []
+    low = r["rss_slope_kb_per_1k"] - r["rss_slope_ci"]
+    if r["steady_samples"] < args.min_samples or r["steady_frames"] < args.min_frames:
+        print(f"RSS check inconclusive: {r['steady_samples']} samples over "
+              f"{r['steady_frames']} steady frames (need {args.min_samples} / {args.min_frames})")
+    elif low > args.max_rss_slope:
+        failures.append(f"RSS slope {r['rss_slope_kb_per_1k']:.1f} ± {r['rss_slope_ci']:.1f} "
+                        f"> {args.max_rss_slope} KB/1k frames")
+    if r["fd_growth"] > 0:
+        failures.append(f"{r['fd_growth']} file descriptors leaked")
+    if r["thread_growth"] > 0:
+        failures.append(f"{r['thread_growth']} threads leaked")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        raise SystemExit(1)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
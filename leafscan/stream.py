@@ -0,0 +1,306 @@
+"""
+Side-channel transport for the live camera view.
+
+Pushing every annotated frame through ``st.image`` re-encodes it and sends it
+over Streamlit's delta protocol, which tops out well below inference speed.
+Instead, workers ``publish`` frames to a ``FrameHub`` and a small threaded HTTP
+server hands them to the browser directly:
+
+* ``GET /frame/<id>?after=<seq>`` — long-polls until a frame newer than
+  ``seq`` exists, then returns it as JPEG with ``X-Seq`` and ``X-Detections``
+  (JSON) headers. The embedded client requests the next frame only after the
+  previous one is drawn, so a slow browser or link simply skips frames —
+  backpressure is the pull itself, and nothing queues on either side.
+* ``GET /mjpeg/<id>`` — ``multipart/x-mixed-replace`` stream for plain
+  ``<img>`` tags or external viewers; a blocked socket write likewise skips
+  to the latest frame.
+* ``GET /stats/<id>`` — frames / bytes delivered, for the bandwidth readout.
+
+Each published frame is JPEG-encoded at most once, on first request.
+
+Benchmark::
+
+    python -m leafscan.stream --fps 60 --seconds 10
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from .encoding import encode_image
+
+
+class _Slot:
+    __slots__ = ("seq", "frame", "dets", "jpeg", "sent_frames", "sent_bytes", "t0")
+
+    def __init__(self):
+        self.seq = 0
+        self.frame = None
+        self.dets = "[]"
+        self.jpeg = None
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.t0 = time.time()
+
+
+class FrameHub:
+    """Latest frame per stream id; readers wait on a condition for a newer one."""
+
+    def __init__(self, quality: int = 80):
+        self.quality = quality
+        self._cond = threading.Condition()
+        self._slots = {}
+
+    def publish(self, stream_id: str, frame_bgr, dets=()):
+        payload = json.dumps([{"name": d["display"], "conf": round(float(d["conf"]), 3),
+                               "box": list(d["box"])} for d in dets])
+        with self._cond:
+            slot = self._slots.setdefault(stream_id, _Slot())
+            slot.seq += 1
+            slot.frame, slot.dets, slot.jpeg = frame_bgr, payload, None
+            self._cond.notify_all()
+
+    def drop(self, stream_id: str):
+        with self._cond:
+            self._slots.pop(stream_id, None)
+            self._cond.notify_all()
+
+    def next(self, stream_id: str, after: int, timeout: float = 5.0):
+        """(seq, jpeg bytes, dets json) newer than ``after``; None on timeout."""
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                slot = self._slots.get(stream_id)
+                if slot is not None and slot.seq > after and slot.frame is not None:
+                    break
+                left = deadline - time.time()
+                if left <= 0:
+                    return None
+                self._cond.wait(left)
+            seq, frame, jpeg, dets = slot.seq, slot.frame, slot.jpeg, slot.dets
+        if jpeg is None:
+            # Encode outside the lock; a concurrent publish just wins next time
+            jpeg = encode_image(frame, "JPEG", self.quality)
+            with self._cond:
+                if slot.seq == seq:
+                    slot.jpeg = jpeg
+        return seq, jpeg, dets
+
+    def account(self, stream_id: str, nbytes: int):
+        with self._cond:
+            slot = self._slots.get(stream_id)
+            if slot is not None:
+                slot.sent_frames += 1
+                slot.sent_bytes += nbytes
+
+    def stats(self, stream_id: str) -> dict:
+        with self._cond:
+            slot = self._slots.get(stream_id)
+            if slot is None:
+                return {"frames": 0, "bytes": 0, "fps": 0.0, "kbps": 0.0, "published": 0}
+            dt = max(time.time() - slot.t0, 1e-6)
+            return {"frames": slot.sent_frames, "bytes": slot.sent_bytes,
+                    "fps": slot.sent_frames / dt, "kbps": slot.sent_bytes * 8 / 1000 / dt,
+                    "published": slot.seq}
+
+    def reset_stats(self, stream_id: str):
+        with self._cond:
+            slot = self._slots.get(stream_id)
+            if slot is not None:
+                slot.sent_frames = slot.sent_bytes = 0
+                slot.t0 = time.time()
+
+
+def _handler(hub: FrameHub):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, body: bytes, ctype: str, **headers):
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Access-Control-Expose-Headers", "X-Seq, X-Detections")
+            for k, v in headers.items():
+                self.send_header(k.replace("_", "-"), v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/", 1)
+            if len(parts) != 2:
+                return self._send(404, b"not found", "text/plain")
+            kind, sid = parts
+            if kind == "frame":
+                try:
+                    after = int(parse_qs(url.query).get("after", ["0"])[0])
+                except ValueError:
+                    return self._send(400, b"after must be an integer", "text/plain")
+                got = hub.next(sid, after)
+                if got is None:
+                    return self._send(204, b"", "text/plain")
+                seq, jpeg, dets = got
+                self._send(200, jpeg, "image/jpeg", X_Seq=str(seq), X_Detections=dets)
+                hub.account(sid, len(jpeg))
+            elif kind == "mjpeg":
+                self._mjpeg(sid)
+            elif kind == "stats":
+                self._send(200, json.dumps(hub.stats(sid)).encode(), "application/json")
+            else:
+                self._send(404, b"not found", "text/plain")
+
+        def _mjpeg(self, sid):
+            self.send_response(200)
+            self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            seq = 0
+            try:
+                while True:
+                    got = hub.next(sid, seq, timeout=30.0)
+                    if got is None:
+                        break
+                    seq, jpeg, _ = got
+                    self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                                     + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+                    hub.account(sid, len(jpeg))
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return Handler
+
+
+class StreamServer:
+    """``FrameHub`` + HTTP server on a daemon thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, quality: int = 80):
+        self.hub = FrameHub(quality)
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self.hub))
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        name="leafscan-stream", daemon=True)
+        self._thread.start()
+
+    @property
+    def quality(self) -> int:
+        return self.hub.quality
+
+    @quality.setter
+    def quality(self, value: int):
+        # Applies from the next encode; a config reload need not rebind the port
+        self.hub.quality = value
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def viewer_html(port: int, stream_id: str, height: int = 480) -> str:
+    """Pull-based canvas viewer for ``components.html``."""
+    return f"""
+<div style="position:relative;width:100%;height:{height}px;background:#1a2a1a;border-radius:10px;overflow:hidden">
+  <canvas id="c" style="width:100%;height:100%;object-fit:contain"></canvas>
+  <div id="s" style="position:absolute;right:8px;bottom:6px;font:11px monospace;color:#b4dcb4"></div>
+</div>
+<script>
+const loc = (window.parent || window).location;
+const https = loc.protocol === "https:";
+const base = `${{https ? "https:" : "http:"}}//${{loc.hostname || "localhost"}}:{port}/frame/{stream_id}`;
+const c = document.getElementById("c"), ctx = c.getContext("2d"), s = document.getElementById("s");
+let seq = 0, shown = 0, bytes = 0, t0 = performance.now();
+async function pull() {{
+  try {{
+    const r = await fetch(`${{base}}?after=${{seq}}`, {{cache: "no-store"}});
+    if (r.status === 200) {{
+      seq = +r.headers.get("X-Seq");
+      const blob = await r.blob();
+      bytes += blob.size;
+      const bmp = await createImageBitmap(blob);
+      if (c.width !== bmp.width) {{ c.width = bmp.width; c.height = bmp.height; }}
+      ctx.drawImage(bmp, 0, 0);
+      bmp.close();
+      shown++;
+    }}
+  }} catch (e) {{
+    // Over https the port needs a TLS proxy in front; say so instead of a blank panel
+    if (https) s.textContent = "no stream over https on port {port} — untick Direct frame stream";
+    await new Promise(r => setTimeout(r, 500));
+  }}
+  const dt = (performance.now() - t0) / 1000;
+  if (dt > 1) {{
+    s.textContent = `${{(shown / dt).toFixed(1)}} fps · ${{(bytes * 8 / 1000 / dt).toFixed(0)}} kbit/s`;
+    shown = 0; bytes = 0; t0 = performance.now();
+  }}
+  requestAnimationFrame(pull);   // next request only after this frame is drawn
+}}
+pull();
+</script>"""
+
+
+# ══════════════════════════════════════════════
+# BENCHMARK
+# ══════════════════════════════════════════════
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Stream transport throughput vs. per-frame re-encoding")
+    ap.add_argument("--fps", type=float, default=60.0, help="publish rate")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--size", default="1280x720")
+    ap.add_argument("--quality", type=int, default=80)
+    args = ap.parse_args(argv)
+
+    w, h = map(int, args.size.split("x"))
+    server = StreamServer(port=0, quality=args.quality)
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur(rng.integers(0, 255, (h, w, 3), np.uint8), (0, 0), 3)
+    stop = threading.Event()
+
+    def producer():
+        i = 0
+        while not stop.is_set():
+            frame = np.roll(base, i * 4, axis=1)
+            server.hub.publish("bench", frame, [])
+            i += 1
+            time.sleep(1.0 / args.fps)
+
+    threading.Thread(target=producer, daemon=True).start()
+    url = f"http://127.0.0.1:{server.port}/frame/bench"
+    seq, n, nbytes = 0, 0, 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < args.seconds:
+        with urllib.request.urlopen(f"{url}?after={seq}") as r:
+            if r.status == 200:
+                seq = int(r.headers["X-Seq"])
+                nbytes += len(r.read())
+                n += 1
+    wall = time.perf_counter() - t0
+    stop.set()
+    published = server.hub.stats("bench")["published"]
+    server.close()
+
+    # Baseline proxy: what a per-frame st.image update pays server-side —
+    # a fresh PNG encode of the RGB frame every tick.
+    t1 = time.perf_counter()
+    png = [encode_image(np.roll(base, i * 4, axis=1), "PNG", 1) for i in range(20)]
+    png_ms = (time.perf_counter() - t1) * 1000 / 20
+    png_kb = np.mean([len(p) for p in png]) / 1024
+
+    print(f"{w}x{h} · publishing {args.fps:.0f} fps · JPEG q{args.quality}")
+    print(f"pull stream:  {n / wall:6.1f} fps delivered of {published / wall:.1f} published · "
+          f"{nbytes / max(n, 1) / 1024:.0f} KB/frame · {nbytes * 8 / 1e6 / wall:.1f} Mbit/s")
+    print(f"st.image proxy: {png_ms:.1f} ms PNG encode · {png_kb:.0f} KB/frame → "
+          f"{png_kb * 8 / 1000 * n / wall:.1f} Mbit/s at the same fps")
+
+
+if __name__ == "__main__":
+    main()
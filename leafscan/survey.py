@@ -0,0 +1,267 @@
+"""
+Geotagged field survey: EXIF GPS extraction and a spatially indexed
+detection store.
+
+Points are projected to local metres around the first point and bucketed in
+a uniform grid (``cell_m`` on a side). That keeps inserts O(1), bounding-box
+queries proportional to the cells they cover and nearest-neighbour searches to
+a few rings of cells, which is interactive at hundreds of thousands of points.
+The grid also carries running per-cell counts, so the orchard heatmap is
+updated incrementally instead of being recomputed from all points.
+"""
+
+import json
+import math
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+GPS_IFD = 0x8825
+EXIF_IFD = 0x8769
+DATETIME_ORIGINAL = 36867
+DATETIME = 306
+
+M_PER_DEG_LAT = 110540.0
+M_PER_DEG_LON = 111320.0
+
+
+# ══════════════════════════════════════════════
+# EXIF
+# ══════════════════════════════════════════════
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Ground distance for nearby points (equirectangular)."""
+    dx = (lon2 - lon1) * M_PER_DEG_LON * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(dx, (lat2 - lat1) * M_PER_DEG_LAT)
+
+
+def _dms_to_deg(dms, ref) -> float:
+    d, m, s = (float(x) for x in dms)
+    deg = d + m / 60.0 + s / 3600.0
+    return -deg if ref in ("S", "W", b"S", b"W") else deg
+
+
+def exif_location(img):
+    """
+    ``(lat, lon, timestamp)`` from a PIL image's EXIF, or ``None`` without GPS.
+    Must be called before ``convert()``, which drops the metadata.
+    """
+    try:
+        exif = img.getexif()
+        gps = exif.get_ifd(GPS_IFD)
+    except Exception:
+        return None
+    if not gps or 2 not in gps or 4 not in gps:
+        return None
+    lat = _dms_to_deg(gps[2], gps.get(1, "N"))
+    lon = _dms_to_deg(gps[4], gps.get(3, "E"))
+    raw = exif.get_ifd(EXIF_IFD).get(DATETIME_ORIGINAL) or exif.get(DATETIME)
+    try:
+        ts = datetime.strptime(str(raw), "%Y:%m:%d %H:%M:%S").timestamp()
+    except (TypeError, ValueError):
+        ts = datetime.now().timestamp()
+    return lat, lon, ts
+
+
+# ══════════════════════════════════════════════
+# STORE
+# ══════════════════════════════════════════════
+def _ring(cx: int, cy: int, r: int):
+    """Border cells of the square of Chebyshev radius ``r`` around (cx, cy)."""
+    if r == 0:
+        return [(cx, cy)]
+    return ([(cx + i, cy + j) for i in range(-r, r + 1) for j in (-r, r)]
+            + [(cx + i, cy + j) for i in (-r, r) for j in range(-r + 1, r)])
+
+
+class SurveyStore:
+    """
+    Append-only detection points with a grid index.
+
+    Each point: lat, lon, timestamp, class name, confidence, diseased flag and
+    the image it came from. Optionally persisted as JSON lines at ``path``.
+    """
+
+    def __init__(self, cell_m: float = 10.0, path=None):
+        self.cell_m = cell_m
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._origin = None                  # (lat0, lon0, metres per deg lon)
+        self._n = 0
+        self._cap = 1024
+        self._xy = np.zeros((self._cap, 2), np.float64)
+        self._ll = np.zeros((self._cap, 2), np.float64)
+        self._conf = np.zeros(self._cap, np.float32)
+        self._ts = np.zeros(self._cap, np.float64)
+        self._cls = np.zeros(self._cap, np.int16)
+        self._bad = np.zeros(self._cap, bool)
+        self._img = []                       # image name per point
+        self.classes = []                    # class table, index = _cls value
+        self._cells = {}                     # (ix, iy) → list of point indices
+        self._heat = {}                      # (ix, iy) → [points, diseased points]
+        self._bounds = None                  # occupied cell range: ix0, iy0, ix1, iy1
+        if self.path and self.path.exists():
+            with self.path.open() as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            self._add(rows, persist=False)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def origin(self):
+        """(lat, lon) of the first point — the projection centre."""
+        return self._origin[:2] if self._origin else (0.0, 0.0)
+
+    # ── projection ────────────────────────────
+    def _project(self, lat, lon):
+        lat0, lon0, m_lon = self._origin
+        return (np.asarray(lon) - lon0) * m_lon, (np.asarray(lat) - lat0) * M_PER_DEG_LAT
+
+    def _cell(self, x, y):
+        return np.floor(x / self.cell_m).astype(np.int64), np.floor(y / self.cell_m).astype(np.int64)
+
+    def _grow(self, need):
+        if need <= self._cap:
+            return
+        cap = max(need, self._cap * 2)
+        for name in ("_xy", "_ll", "_conf", "_ts", "_cls", "_bad"):
+            old = getattr(self, name)
+            new = np.zeros((cap,) + old.shape[1:], old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+        self._cap = cap
+
+    # ── writes ────────────────────────────────
+    def add(self, rows):
+        """
+        ``rows``: dicts with ``lat``, ``lon``, ``ts``, ``disease``, ``conf``,
+        ``diseased`` and ``image``. Returns the number of points added.
+        """
+        return self._add(list(rows), persist=True)
+
+    def _add(self, rows, persist):
+        if not rows:
+            return 0
+        with self._lock:
+            if self._origin is None:
+                lat0, lon0 = rows[0]["lat"], rows[0]["lon"]
+                self._origin = (lat0, lon0, M_PER_DEG_LON * math.cos(math.radians(lat0)))
+            lat = np.array([r["lat"] for r in rows], np.float64)
+            lon = np.array([r["lon"] for r in rows], np.float64)
+            x, y = self._project(lat, lon)
+            ix, iy = self._cell(x, y)
+            start, end = self._n, self._n + len(rows)
+            self._grow(end)
+            self._xy[start:end, 0], self._xy[start:end, 1] = x, y
+            self._ll[start:end, 0], self._ll[start:end, 1] = lat, lon
+            self._conf[start:end] = [r["conf"] for r in rows]
+            self._ts[start:end] = [r["ts"] for r in rows]
+            self._bad[start:end] = [r["diseased"] for r in rows]
+            for k, r in enumerate(rows):
+                if r["disease"] not in self.classes:
+                    self.classes.append(r["disease"])
+                self._cls[start + k] = self.classes.index(r["disease"])
+                self._img.append(r.get("image", ""))
+                key = (int(ix[k]), int(iy[k]))
+                self._cells.setdefault(key, []).append(start + k)
+                h = self._heat.setdefault(key, [0, 0])
+                h[0] += 1
+                h[1] += bool(r["diseased"])
+            b = (int(ix.min()), int(iy.min()), int(ix.max()), int(iy.max()))
+            if self._bounds is not None:
+                b = (min(b[0], self._bounds[0]), min(b[1], self._bounds[1]),
+                     max(b[2], self._bounds[2]), max(b[3], self._bounds[3]))
+            self._bounds = b
+            self._n = end
+            if persist and self.path:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a") as f:
+                    for r in rows:
+                        f.write(json.dumps(r) + "\n")
+        return len(rows)
+
+    # ── reads ─────────────────────────────────
+    def _rows(self, idx):
+        return [{"lat": float(self._ll[i, 0]), "lon": float(self._ll[i, 1]),
+                 "ts": float(self._ts[i]), "disease": self.classes[self._cls[i]],
+                 "conf": float(self._conf[i]), "diseased": bool(self._bad[i]),
+                 "image": self._img[i]} for i in idx]
+
+    def query_bbox(self, lat_min, lon_min, lat_max, lon_max, as_rows=True):
+        """Points inside a lat/lon rectangle."""
+        with self._lock:
+            if self._origin is None:
+                return []
+            x0, y0 = self._project(lat_min, lon_min)
+            x1, y1 = self._project(lat_max, lon_max)
+            cx0, cy0 = self._cell(x0, y0)
+            cx1, cy1 = self._cell(x1, y1)
+            n_cells = (int(cx1) - int(cx0) + 1) * (int(cy1) - int(cy0) + 1)
+            if n_cells > len(self._cells):
+                # Big box: scan occupied cells instead of the empty ones
+                keys = [k for k in self._cells
+                        if cx0 <= k[0] <= cx1 and cy0 <= k[1] <= cy1]
+            else:
+                keys = [(i, j) for i in range(int(cx0), int(cx1) + 1)
+                        for j in range(int(cy0), int(cy1) + 1) if (i, j) in self._cells]
+            if not keys:
+                return []
+            idx = np.fromiter((i for k in keys for i in self._cells[k]), np.int64)
+            ll = self._ll[idx]
+            inside = ((ll[:, 0] >= lat_min) & (ll[:, 0] <= lat_max) &
+                      (ll[:, 1] >= lon_min) & (ll[:, 1] <= lon_max))
+            idx = idx[inside]
+            return self._rows(idx) if as_rows else idx
+
+    def nearest(self, lat, lon, k: int = 1):
+        """``k`` nearest points as rows with an extra ``dist_m`` field."""
+        with self._lock:
+            if self._origin is None:
+                return []
+            x, y = self._project(lat, lon)
+            cx, cy = (int(v) for v in self._cell(x, y))
+            ix0, iy0, ix1, iy1 = self._bounds
+            max_ring = max(abs(cx - ix0), abs(cx - ix1), abs(cy - iy0), abs(cy - iy1))
+            # Rings closer than the occupied bounds are empty: start at the first that is not
+            ring = max(0, ix0 - cx, cx - ix1, iy0 - cy, cy - iy1)
+            found = []
+            while ring <= max_ring:
+                if 8 * ring > len(self._cells):
+                    # Ring has more cells than are occupied: take all the rest in one scan
+                    found.extend(i for (kx, ky), pts in self._cells.items()
+                                 if max(abs(kx - cx), abs(ky - cy)) >= ring for i in pts)
+                    break
+                for c in _ring(cx, cy, ring):
+                    found.extend(self._cells.get(c, ()))
+                # Anything outside ring r is at least r * cell_m away
+                if len(found) >= k:
+                    idx = np.array(found)
+                    d = np.hypot(self._xy[idx, 0] - x, self._xy[idx, 1] - y)
+                    if np.sort(d)[k - 1] <= ring * self.cell_m:
+                        break
+                ring += 1
+            if not found:
+                return []
+            idx = np.array(found)
+            d = np.hypot(self._xy[idx, 0] - x, self._xy[idx, 1] - y)
+            order = np.argsort(d)[:k]
+            rows = self._rows(idx[order])
+            for r, dist in zip(rows, d[order]):
+                r["dist_m"] = float(dist)
+            return rows
+
+    def heat_cells(self, diseased_only: bool = True):
+        """``(lat, lon, weight)`` per occupied cell centre, for a heatmap layer."""
+        with self._lock:
+            if self._origin is None:
+                return []
+            lat0, lon0, m_lon = self._origin
+            out = []
+            for (i, j), (n, bad) in self._heat.items():
+                w = bad if diseased_only else n
+                if w:
+                    out.append(((j + 0.5) * self.cell_m / M_PER_DEG_LAT + lat0,
+                                (i + 0.5) * self.cell_m / m_lon + lon0, w))
+            return out
@@ -0,0 +1,106 @@
+"""
+Content-addressed thumbnail store for history evidence.
+
+Each detection's box (plus a small margin) is cropped, downscaled to
+``size`` px on the long side and JPEG-encoded. The file name is the 64-bit
+BLAKE2b digest of those bytes, so identical crops are stored once and a key
+fits in a ``uint64`` history column (0 = no thumbnail).
+
+Files live under ``root/ab/abcdef….jpg``. The store keeps only an in-memory
+LRU of key → size; when the total exceeds ``max_bytes`` the least recently
+used files are deleted down to 90 %. Readers get bytes for one page at a
+time, so the UI never holds more than a page of thumbnails.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import cv2
+
+from .encoding import encode_image
+
+
+class ThumbStore:
+    def __init__(self, root="history_thumbs", max_bytes: int = 256 * 2**20,
+                 size: int = 112, quality: int = 80):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.size = size
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()     # key (int) → bytes on disk, oldest first
+        self._total = 0
+        files = sorted(self.root.glob("*/*.jpg"), key=lambda p: p.stat().st_mtime)
+        for p in files:
+            n = p.stat().st_size
+            self._lru[int(p.stem, 16)] = n
+            self._total += n
+
+    def __len__(self):
+        return len(self._lru)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _path(self, key: int) -> Path:
+        h = f"{key:016x}"
+        return self.root / h[:2] / f"{h}.jpg"
+
+    def put(self, image, box, rgb: bool = False, margin: float = 0.1) -> int:
+        """Crop ``box`` (xyxy pixels) out of ``image`` and store it; returns the key."""
+        h, w = image.shape[:2]
+        x1, y1, x2, y2 = box
+        mx, my = (x2 - x1) * margin, (y2 - y1) * margin
+        x1, y1 = max(0, int(x1 - mx)), max(0, int(y1 - my))
+        x2, y2 = min(w, int(x2 + mx)), min(h, int(y2 + my))
+        if x2 <= x1 or y2 <= y1:
+            return 0
+        crop = image[y1:y2, x1:x2]
+        scale = self.size / max(crop.shape[:2])
+        if scale < 1.0:
+            crop = cv2.resize(crop, (max(1, round(crop.shape[1] * scale)),
+                                     max(1, round(crop.shape[0] * scale))),
+                              interpolation=cv2.INTER_AREA)
+        if rgb:
+            crop = cv2.cvtColor(crop, cv2.COLOR_RGB2BGR)
+        data = encode_image(crop, "JPEG", self.quality)
+        key = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big") or 1
+
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return key
+            p = self._path(key)
+            p.parent.mkdir(exist_ok=True)
+            p.write_bytes(data)
+            self._lru[key] = len(data)
+            self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+        return key
+
+    def _evict(self, target: int):
+        while self._total > target and self._lru:
+            key, n = self._lru.popitem(last=False)
+            self._total -= n
+            self._path(key).unlink(missing_ok=True)
+
+    def get(self, key: int):
+        """JPEG bytes, or None if never stored / evicted."""
+        if not key:
+            return None
+        with self._lock:
+            if key not in self._lru:
+                return None
+            self._lru.move_to_end(key)
+        try:
+            return self._path(key).read_bytes()
+        except OSError:
+            return None
+
+    def get_many(self, keys) -> list:
+        return [self.get(int(k)) for k in keys]
@@ -0,0 +1,190 @@
+"""
+Test-time augmentation and multi-weight ensembles.
+
+Every augmented view is built at the same pixel shape so the whole set goes
+through ``model.predict`` as one batch:
+
+* flips are plain ``cv2.flip`` copies;
+* the ``img_size`` ladder is emulated by running the batch at the largest
+  size and shrinking the image onto a padded canvas for the smaller sizes —
+  the network sees the leaf at the same scale as a native run at that size.
+
+Boxes from all views (and all models) are mapped back to the original frame
+and merged with weighted box fusion (WBF) into a single ``Detections``.
+"""
+
+import time
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from .config import IMG_SIZES
+from .core import Detections
+
+PAD_VALUE = 114   # ultralytics letterbox grey
+
+
+@dataclass
+class View:
+    scale: float = 1.0     # image was resized by this factor onto the canvas
+    hflip: bool = False
+    vflip: bool = False
+    weight: float = 1.0
+
+
+def scale_ladder(img_size: int, steps: int = 1) -> list:
+    """``img_size`` plus ``steps`` neighbours on each side of ``IMG_SIZES``."""
+    i = IMG_SIZES.index(img_size) if img_size in IMG_SIZES else \
+        int(np.argmin([abs(s - img_size) for s in IMG_SIZES]))
+    return IMG_SIZES[max(0, i - steps): i + steps + 1]
+
+
+def build_views(img_size: int, flips: bool = True, multiscale: bool = True):
+    """(batch imgsz, list of View). The identity view is always first."""
+    sizes = scale_ladder(img_size) if multiscale else [img_size]
+    run_size = max(sizes)
+    views = [View(scale=img_size / run_size)]
+    if flips:
+        views.append(View(scale=img_size / run_size, hflip=True))
+        views.append(View(scale=img_size / run_size, vflip=True))
+    for s in sizes:
+        if s != img_size:
+            views.append(View(scale=s / run_size, weight=0.8))
+    return run_size, views
+
+
+def render_view(image_bgr, v: View):
+    out = image_bgr
+    if v.scale != 1.0:
+        h, w = image_bgr.shape[:2]
+        small = cv2.resize(image_bgr, (max(1, round(w * v.scale)), max(1, round(h * v.scale))),
+                           interpolation=cv2.INTER_AREA)
+        out = np.full_like(image_bgr, PAD_VALUE)
+        out[:small.shape[0], :small.shape[1]] = small
+    if v.hflip and v.vflip:
+        out = cv2.flip(out, -1)
+    elif v.hflip:
+        out = cv2.flip(out, 1)
+    elif v.vflip:
+        out = cv2.flip(out, 0)
+    return out
+
+
+def unmap_boxes(xyxy, v: View, shape):
+    """Map boxes predicted on a view back to original image coordinates."""
+    h, w = shape[:2]
+    b = xyxy.copy()
+    if v.hflip:
+        b[:, [0, 2]] = w - b[:, [2, 0]]
+    if v.vflip:
+        b[:, [1, 3]] = h - b[:, [3, 1]]
+    if v.scale != 1.0:
+        b /= v.scale
+    np.clip(b[:, [0, 2]], 0, w, out=b[:, [0, 2]])
+    np.clip(b[:, [1, 3]], 0, h, out=b[:, [1, 3]])
+    return b
+
+
+# ══════════════════════════════════════════════
+# WEIGHTED BOX FUSION
+# ══════════════════════════════════════════════
+def _iou_one_to_many(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0]); y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2]); y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    a = (box[2] - box[0]) * (box[3] - box[1])
+    b = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(a + b - inter, 1e-9)
+
+
+def weighted_box_fusion(xyxy, conf, cls, weights, total_weight: float,
+                        iou_thr: float = 0.55, skip_thr: float = 0.0) -> Detections:
+    """
+    Fuse boxes from several predictions of the same image (Solovyev et al.,
+    WBF). ``weights`` is the per-box weight of the prediction it came from and
+    ``total_weight`` the sum of all prediction weights. A fused box is the
+    confidence-weighted mean of its members; its confidence is the weighted
+    mean scaled by how much of the total weight agreed, so a box seen by a
+    single view is down-weighted rather than dropped.
+    """
+    keep = conf >= skip_thr
+    xyxy, conf, cls, weights = xyxy[keep], conf[keep], cls[keep], weights[keep]
+    out_b, out_c, out_k = [], [], []
+    for c in np.unique(cls):
+        m = cls == c
+        b, s, w = xyxy[m], conf[m], weights[m]
+        order = np.argsort(-s * w)
+        fused = np.zeros((0, 4), np.float32)
+        members = []    # per cluster: list of member indices
+        for i in order:
+            if len(fused):
+                ious = _iou_one_to_many(b[i], fused)
+                j = int(np.argmax(ious))
+                if ious[j] > iou_thr:
+                    members[j].append(i)
+                    idx = members[j]
+                    sw = s[idx] * w[idx]
+                    fused[j] = (b[idx] * sw[:, None]).sum(0) / sw.sum()
+                    continue
+            fused = np.vstack([fused, b[i][None]])
+            members.append([i])
+        for j, idx in enumerate(members):
+            sw = s[idx] * w[idx]
+            score = sw.sum() / max(w[idx].sum(), 1e-9)
+            score *= min(w[idx].sum(), total_weight) / total_weight
+            out_b.append(fused[j]); out_c.append(score); out_k.append(c)
+    if not out_b:
+        return Detections()
+    return Detections(np.array(out_b), np.array(out_c), np.array(out_k))
+
+
+# ══════════════════════════════════════════════
+# PIPELINE
+# ══════════════════════════════════════════════
+def _remap_classes(cls, names, ref_names):
+    """Translate another model's class ids into the reference model's ids."""
+    by_name = {v: k for k, v in ref_names.items()}
+    return np.array([by_name.get(names.get(int(c)), -1) for c in cls], np.int32)
+
+
+def tta_predict(models, image_bgr, conf: float, iou: float, img_size: int,
+                flips: bool = True, multiscale: bool = True,
+                model_weights=None, fusion_iou: float = 0.55):
+    """
+    Run every view through every model (one batch per model) and fuse.
+
+    Returns ``(Detections, stats)``; class ids refer to ``models[0].names``.
+    ``stats`` holds ``ms`` (total latency), ``views`` and ``models``.
+    """
+    t0 = time.time()
+    run_size, views = build_views(img_size, flips, multiscale)
+    batch = [render_view(image_bgr, v) for v in views]
+    model_weights = model_weights or [1.0] * len(models)
+    ref_names = models[0].names
+
+    all_b, all_c, all_k, all_w = [], [], [], []
+    for model, mw in zip(models, model_weights):
+        # Slightly lower conf than the user threshold so weak agreeing boxes
+        # can still fuse above it.
+        results = model.predict(batch, conf=conf * 0.5, iou=iou, imgsz=run_size, verbose=False)
+        for v, r in zip(views, results):
+            d = Detections.from_result(r)
+            if not len(d):
+                continue
+            k = d.cls if model is models[0] else _remap_classes(d.cls, model.names, ref_names)
+            ok = k >= 0
+            all_b.append(unmap_boxes(d.xyxy[ok], v, image_bgr.shape))
+            all_c.append(d.conf[ok]); all_k.append(k[ok])
+            all_w.append(np.full(int(ok.sum()), v.weight * mw, np.float32))
+
+    if all_b:
+        fused = weighted_box_fusion(np.concatenate(all_b), np.concatenate(all_c),
+                                    np.concatenate(all_k), np.concatenate(all_w),
+                                    total_weight=sum(v.weight for v in views) * sum(model_weights),
+                                    iou_thr=fusion_iou)
+        fused = fused[fused.conf >= conf]
+    else:
+        fused = Detections()
+    stats = {"ms": (time.time() - t0) * 1000, "views": len(views), "models": len(models)}
+    return fused, stats
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from leafscan.alerts import AlertDispatcher, AlertEngine, FileSink, severe_classes
+
+ROT = {"name": "black_rot", "display": "Black Rot", "conf": 0.9, "box": (10, 10, 50, 50)}
+
+
+class ListSink:
+    def __init__(self, fail_first=0):
+        self.events = []
+        self.fail_first = fail_first
+
+    def send(self, events):
+        if self.fail_first:
+            self.fail_first -= 1
+            raise OSError("down")
+        self.events.extend(events)
+
+
+def test_debounce_per_track():
+    disp = AlertDispatcher([sink := ListSink()])
+    engine = AlertEngine(disp, classes=["Black Rot"], min_conf=0.5, debounce_s=60)
+    assert engine.observe([ROT], "cam", (100, 100)) == 1
+    assert engine.observe([ROT], "cam", (100, 100)) == 0           # same leaf, same spot
+    assert engine.observe([dict(ROT, box=(60, 60, 95, 95))], "cam", (100, 100)) == 1
+    assert engine.observe([ROT], "other-cam", (100, 100)) == 1
+    assert engine.observe([dict(ROT, conf=0.4)], "third", (100, 100)) == 0
+    disp.close()
+    assert len(sink.events) == 3 and sink.events[0]["class"] == "Black Rot"
+
+
+def test_default_classes_are_the_severe_ones():
+    engine = AlertEngine(AlertDispatcher([]), min_conf=0.0)
+    assert engine.classes == set(severe_classes())
+    engine.configure(enabled=False)
+    assert engine.observe([ROT]) == 0
+
+
+def test_retry_then_deliver():
+    disp = AlertDispatcher([sink := ListSink(fail_first=2)], backoff=0.001)
+    disp.submit({"n": 1})
+    disp.close()
+    assert sink.events == [{"n": 1}]
+    assert disp.stats["retries"] == 2 and disp.stats["delivered"] == 1
+
+
+def test_full_queue_drops_oldest_without_blocking():
+    entered, release = threading.Event(), threading.Event()
+
+    class Blocking(ListSink):
+        def send(self, events):
+            entered.set()
+            release.wait(5)
+            super().send(events)
+
+    disp = AlertDispatcher([sink := Blocking()], maxsize=2)
+    disp.submit({"n": 0})
+    assert entered.wait(5)                      # the dispatcher is stuck in the sink
+    t0 = time.perf_counter()
+    for n in range(1, 6):
+        disp.submit({"n": n})
+    assert time.perf_counter() - t0 < 0.1
+    assert disp.stats["dropped"] == 3
+    release.set()
+    disp.close()
+    assert [e["n"] for e in sink.events] == [0, 4, 5]
+
+
+def test_file_sink(tmp_path):
+    FileSink(tmp_path / "a" / "alerts.jsonl").send([{"x": 1}, {"x": 2}])
+    assert (tmp_path / "a" / "alerts.jsonl").read_text().count("\n") == 2
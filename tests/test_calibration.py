@@ -0,0 +1,46 @@
+import numpy as np
+
+from leafscan.calibration import Calibrator, _logit, _sigmoid, fit
+
+
+def synthetic(a, b, n=20_000, seed=0):
+    """Raw scores whose true hit rate is σ(a · logit(score) + b)."""
+    rng = np.random.default_rng(seed)
+    conf = rng.uniform(0.02, 0.98, n)
+    y = rng.uniform(size=n) < _sigmoid(a * _logit(conf) + b)
+    return conf, y
+
+
+def test_platt_recovers_parameters():
+    conf, y = synthetic(0.6, -0.8)
+    c = fit(conf, y, "platt")
+    assert abs(c.a - 0.6) < 0.05 and abs(c.b + 0.8) < 0.08
+    assert c.nll_after < c.nll_before
+    assert c.ece_after < c.ece_before
+    assert c.n == len(conf)
+
+
+def test_temperature_has_no_offset():
+    conf, y = synthetic(0.5, 0.0)
+    c = fit(conf, y, "temperature")
+    assert c.b == 0.0
+    assert abs(c.a - 0.5) < 0.05
+
+
+def test_identity_on_calibrated_scores():
+    conf, y = synthetic(1.0, 0.0)
+    c = fit(conf, y)
+    assert abs(c.a - 1.0) < 0.06 and abs(c.b) < 0.06
+
+
+def test_raw_threshold_inverts_the_map():
+    c = Calibrator(a=0.7, b=-0.4)
+    for p in (0.1, 0.4, 0.5, 0.75, 0.95):
+        assert abs(c(c.raw_threshold(p)) - p) < 1e-6
+
+
+def test_save_and_load(tmp_path):
+    c = Calibrator(method="temperature", a=0.8, n=5)
+    c.save("abc", root=tmp_path)
+    assert Calibrator.load("abc", root=tmp_path) == c
+    assert Calibrator.load("missing", root=tmp_path) is None
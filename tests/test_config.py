@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from leafscan.config import Config, ConfigWatcher, load_config
+
+
+def test_defaults_without_a_file(tmp_path):
+    assert load_config(tmp_path / "missing.yaml", env={}) == Config()
+
+
+def test_yaml_then_env_overrides(tmp_path):
+    path = tmp_path / "leafscan.yaml"
+    path.write_text("detection:\n  conf: 0.45\n  img_size: 768\nperf:\n  pin: true\n")
+    cfg = load_config(path, env={"LEAFSCAN_DETECTION_CONF": "0.6",
+                                 "LEAFSCAN_PERF_TORCH_THREADS": "4",
+                                 "LEAFSCAN_PERF_PIN": "off"})
+    assert cfg.detection.conf == 0.6
+    assert cfg.detection.img_size == 768
+    assert cfg.perf.torch_threads == 4
+    assert cfg.perf.pin is False
+
+
+@pytest.mark.parametrize("env", [
+    {"LEAFSCAN_DETECTION_IMG_SIZE": "800"},
+    {"LEAFSCAN_DETECTION_CONF": "0.05"},
+    {"LEAFSCAN_DETECTION_IOU": "0.95"},
+    {"LEAFSCAN_CAMERA_INDEX": "5"},
+    {"LEAFSCAN_CAMERA_HUD": "left"},
+    {"LEAFSCAN_PERF_PROCS": "-1"},
+    {"LEAFSCAN_PERF_BATCH": "many"},
+])
+def test_invalid_values_are_rejected(tmp_path, env):
+    with pytest.raises(ValueError):
+        load_config(tmp_path / "missing.yaml", env=env)
+
+
+def test_unknown_keys_are_rejected(tmp_path):
+    path = tmp_path / "leafscan.yaml"
+    path.write_text("detection:\n  confidence: 0.5\n")
+    with pytest.raises(ValueError, match="unknown key"):
+        load_config(path, env={})
+    path.write_text("detector:\n  conf: 0.5\n")
+    with pytest.raises(ValueError, match="unknown section"):
+        load_config(path, env={})
+
+
+def test_watcher_keeps_last_good_config(tmp_path, monkeypatch):
+    for k in [k for k in os.environ if k.startswith("LEAFSCAN_")]:
+        monkeypatch.delenv(k)
+    path = tmp_path / "leafscan.yaml"
+    path.write_text("detection:\n  conf: 0.5\n")
+    watcher = ConfigWatcher(path)
+    assert watcher.get().detection.conf == 0.5 and watcher.error is None
+
+    path.write_text("detection:\n  img_size: 800\n")
+    os.utime(path, ns=(1, 1))                   # make sure the mtime changes
+    assert watcher.get().detection.conf == 0.5
+    assert "img_size" in watcher.error
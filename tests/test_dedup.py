@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+from leafscan.core import Detections
+from leafscan.dedup import (DedupIndex, MultiIndexHash, cached_candidates, dhash, phash,
+                            remember_candidates)
+
+
+def test_multi_index_search_matches_linear_scan():
+    rng = np.random.default_rng(0)
+    base = [int(h) for h in np.frombuffer(rng.bytes(8 * 300), np.uint64)]
+    hashes = []
+    for h in base:                               # bursts of near-identical hashes
+        for _ in range(3):
+            for b in rng.choice(64, int(rng.integers(0, 6)), replace=False):
+                h ^= 1 << int(b)
+            hashes.append(h)
+    index = MultiIndexHash()
+    for i, h in enumerate(hashes):
+        index.add(h, i)
+
+    for q in rng.choice(len(hashes), 100):
+        query = hashes[q] ^ (1 << int(rng.integers(64)))
+        for radius in (0, 3, 6, 7):
+            expect = sorted(i for i, h in enumerate(hashes) if (h ^ query).bit_count() <= radius)
+            got = sorted(v for _, _, v in index.search(query, radius))
+            assert got == expect
+    found = index.search(hashes[0], 7)
+    assert [d for d, _, _ in found] == sorted(d for d, _, _ in found)
+
+
+def test_image_hashes_are_stable_and_discriminative():
+    rng = np.random.default_rng(1)
+    img = rng.integers(0, 255, (120, 160, 3), np.uint8)
+    other = rng.integers(0, 255, (120, 160, 3), np.uint8)
+    for fn in (dhash, phash):
+        assert fn(img) == fn(img.copy())
+        assert (fn(img) ^ fn(other)).bit_count() > 10
+
+
+def test_dedup_index_payloads_and_accept_filter():
+    rng = np.random.default_rng(2)
+    img = rng.integers(0, 255, (64, 64, 3), np.uint8)
+    index = DedupIndex(max_distance=4)
+    h, hit = index.check(img)
+    assert hit is None
+    index.add(h, "here")
+    _, hit = index.check(img)
+    assert hit == (0, "here")
+    _, hit = index.check(img, accept=lambda p: p == "elsewhere")
+    assert hit is None
+    assert index.stats()["duplicates"] == 1 and index.lookups == 3
+
+
+def test_threshold_is_per_call_not_shared():
+    rng = np.random.default_rng(3)
+    img = rng.integers(0, 255, (64, 64, 3), np.uint8)
+    index = DedupIndex(max_distance=6)
+    h, _ = index.check(img)
+    index.add(h, "a")
+    near = h ^ 0b111                              # 3 bits away
+    index.hash = lambda image: near
+    assert index.check(img, max_distance=2)[1] is None
+    assert index.check(img)[1] == (3, "a")
+    assert index.max_distance == 6
+
+
+def test_evicted_payloads_are_not_counted():
+    rng = np.random.default_rng(4)
+    imgs = [rng.integers(0, 255, (64, 64, 3), np.uint8) for _ in range(3)]
+    index = DedupIndex(max_payloads=2)
+    for i, img in enumerate(imgs):
+        index.add(index.hash(img), i)
+    assert index.check(imgs[0])[1] is None       # hash known, payload evicted
+    assert index.check(imgs[2])[1] == (0, 2)
+    assert index.duplicates == 1 and index.ratio == 0.5
+
+
+def test_fast_path_flag_survives_a_duplicate_hit():
+    rng = np.random.default_rng(5)
+    img = rng.integers(0, 255, (100, 200, 3), np.uint8)
+    index = DedupIndex()
+    softmax = Detections([[0, 0, 200, 100]], [0.97], [2])
+    h, hit = cached_candidates(index, img)
+    assert hit is None
+    remember_candidates(index, h, img, softmax, from_fast=True)
+
+    bigger = cv2.resize(img, (400, 200))
+    _, hit = cached_candidates(index, bigger)
+    assert hit is not None
+    dist, raw, from_fast = hit
+    assert from_fast is True                      # caller must skip the detector calibrator
+    np.testing.assert_allclose(raw.xyxy, [[0, 0, 400, 200]])
+    np.testing.assert_allclose(raw.conf, [0.97])
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+
+from leafscan.evaluate import (IOU_THRESHOLDS, average_precision, box_iou, compute_metrics,
+                               load_dataset, match_image)
+
+
+def test_box_iou():
+    a = np.array([[0, 0, 10, 10]], np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], np.float32)
+    np.testing.assert_allclose(box_iou(a, b), [[1.0, 50 / 150, 0.0]], rtol=1e-6)
+    assert box_iou(a, np.zeros((0, 4), np.float32)).shape == (1, 0)
+
+
+def test_match_image_is_greedy_by_confidence_and_class_aware():
+    gt = np.array([[0, 0, 10, 10], [20, 0, 30, 10]], np.float32)
+    gt_cls = np.array([0, 1])
+    pred = np.array([[0, 0, 10, 10], [0, 0, 10, 10], [20, 0, 30, 10]], np.float32)
+    conf = np.array([0.5, 0.9, 0.8], np.float32)
+    cls = np.array([0, 0, 0])                       # third box: right place, wrong class
+    tp = match_image(pred, conf, cls, gt, gt_cls)
+    assert tp[:, 0].tolist() == [False, True, False]
+    assert tp.shape == (3, len(IOU_THRESHOLDS))
+
+
+def test_average_precision():
+    tp = np.ones((4, 1), bool)
+    conf = np.array([0.9, 0.8, 0.7, 0.6])
+    assert average_precision(tp, conf, 4)[0] == 1.0
+    # All hits ranked below all misses: precision 0.5 from recall 0 to 1
+    tp = np.array([[False], [False], [True], [True]])
+    assert abs(average_precision(tp, conf, 2)[0] - 0.5) < 1e-9
+    # Half the ground truth never found
+    assert abs(average_precision(np.ones((2, 1), bool), conf[:2], 4)[0] - 51 / 101) < 1e-9
+    assert average_precision(tp, conf, 0)[0] == 0.0
+
+
+def test_compute_metrics_map_and_per_class():
+    cache = {
+        "pred_cls": np.array([0, 0, 1], np.int32),
+        "pred_conf": np.array([0.9, 0.3, 0.8], np.float32),
+        "tp": np.array([[True] * 10, [False] * 10, [True] * 10]),
+        "gt_cls": np.array([0, 1], np.int32),
+        "n_images": 2, "ms_per_image": 10.0,
+    }
+    r = compute_metrics(cache, {0: "apple_scab", 1: "black_rot"}, conf=0.5)
+    assert r.map50 == 1.0 and r.map50_95 == 1.0
+    rows = {row["class"]: row for row in r.per_class}
+    assert rows["apple_scab"]["precision"] == 1.0        # the 0.3 miss is below conf
+    assert rows["black_rot"]["recall"] == 1.0
+    assert r.images == 2 and r.images_per_s == 100.0
+
+
+def _write_split(root, split, n):
+    (root / "images" / split).mkdir(parents=True)
+    (root / "labels" / split).mkdir(parents=True)
+    for i in range(n):
+        cv2.imwrite(str(root / "images" / split / f"{i}.png"), np.zeros((8, 8, 3), np.uint8))
+        (root / "labels" / split / f"{i}.txt").write_text("0 0.5 0.5 0.5 0.5\n")
+
+
+def test_load_dataset_reads_only_the_val_split(tmp_path):
+    _write_split(tmp_path, "train", 3)
+    _write_split(tmp_path, "val", 2)
+    images, labels, _ = load_dataset(tmp_path)
+    assert [p.parent.name for p in images] == ["val", "val"]
+    np.testing.assert_allclose(labels[0], [[0, 0.25, 0.25, 0.75, 0.75]])
+
+    (tmp_path / "data.yaml").write_text("path: .\ntrain: images/train\nval: images/train\n"
+                                        "names: [apple_scab]\n")
+    images, _, names = load_dataset(tmp_path)
+    assert len(images) == 3 and names == {0: "apple_scab"}
+    assert len(load_dataset(tmp_path, split=None)[0]) == 5
@@ -0,0 +1,57 @@
+import numpy as np
+
+from leafscan.calibration import Calibrator
+from leafscan.core import Detections
+from leafscan.evaluate import box_iou
+from leafscan.postprocess import apply_thresholds, nms
+
+
+def random_boxes(rng, n, classes=3):
+    xy = rng.uniform(0, 200, (n, 2))
+    wh = rng.uniform(10, 80, (n, 2))
+    return (np.concatenate([xy, xy + wh], 1).astype(np.float32),
+            rng.uniform(0.01, 1.0, n).astype(np.float32),
+            rng.integers(0, classes, n).astype(np.int32))
+
+
+def nms_reference(xyxy, conf, cls, thr):
+    keep = []
+    for i in np.argsort(-conf):
+        if all(cls[j] != cls[i] or box_iou(xyxy[i:i + 1], xyxy[j:j + 1])[0, 0] <= thr
+               for j in keep):
+            keep.append(i)
+    return np.array(keep, np.int64)
+
+
+def test_nms_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for trial in range(50):
+        xyxy, conf, cls = random_boxes(rng, int(rng.integers(0, 40)))
+        thr = float(rng.uniform(0.1, 0.9))
+        np.testing.assert_array_equal(nms(xyxy, conf, cls, thr),
+                                      nms_reference(xyxy, conf, cls, thr))
+
+
+def test_nms_keeps_overlapping_boxes_of_other_classes():
+    xyxy = np.array([[0, 0, 10, 10], [0, 0, 10, 10]], np.float32)
+    conf = np.array([0.9, 0.8], np.float32)
+    assert len(nms(xyxy, conf, np.array([0, 0]), 0.5)) == 1
+    assert len(nms(xyxy, conf, np.array([0, 1]), 0.5)) == 2
+
+
+def test_apply_thresholds_filters_then_suppresses():
+    rng = np.random.default_rng(1)
+    raw = Detections(*random_boxes(rng, 60))
+    out = apply_thresholds(raw, 0.5, 0.45)
+    assert (out.conf >= 0.5).all()
+    m = raw.conf >= 0.5
+    ref = nms_reference(raw.xyxy[m], raw.conf[m], raw.cls[m], 0.45)
+    np.testing.assert_array_equal(out.conf, raw.conf[m][ref])
+
+
+def test_apply_thresholds_uses_calibrated_scores():
+    raw = Detections([[0, 0, 10, 10], [50, 50, 60, 60]], [0.6, 0.3], [0, 0])
+    calib = Calibrator(a=1.0, b=2.0)            # pushes every score up
+    out = apply_thresholds(raw, 0.5, 0.5, calib)
+    assert len(out) == 2
+    np.testing.assert_allclose(out.conf, calib(raw.conf), rtol=1e-6)
@@ -0,0 +1,39 @@
+import time
+
+import numpy as np
+import pytest
+
+from leafscan.procpool import InferencePool, PendingResult
+
+
+def test_pending_result_times_out_and_fails():
+    p = PendingResult(1.0, 0, 0)
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        p.result(timeout=0.05)
+    assert time.monotonic() - t0 < 1.0
+    p._fail("worker 0 exited with code -9")
+    assert p.done()
+    with pytest.raises(RuntimeError, match="exited"):
+        p.result(timeout=0.05)
+
+
+def test_start_up_failure_is_reported(tmp_path):
+    # No such weights (or no ultralytics): the worker reports instead of hanging
+    t0 = time.monotonic()
+    with pytest.raises(RuntimeError, match="worker 0"):
+        InferencePool(str(tmp_path / "missing.pt"), workers=1, frame_mb=1, start_timeout=60)
+    assert time.monotonic() - t0 < 60
+
+
+def test_round_trip_with_real_weights():
+    pytest.importorskip("ultralytics")
+    from pathlib import Path
+    weights = Path("best.pt")
+    if not weights.exists():
+        pytest.skip("best.pt not present")
+    img = np.zeros((480, 640, 3), np.uint8)
+    with InferencePool(str(weights), workers=1, frame_mb=1) as pool:
+        det = pool.predict(img)          # 640×480×3 > 1 MB slot: downscaled and mapped back
+        assert det.xyxy.shape[1] == 4
+        assert pool.stats()["completed"] == 1 and pool.stats()["error"] is None
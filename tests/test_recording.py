@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+
+from leafscan.core import Detections
+from leafscan.recording import Recorder, RecordingReader, is_recording
+
+
+def frames(n, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        img = np.full((48, 64, 3), 40 * (i % 6), np.uint8)
+        img[rng.integers(48), :] = 255
+        yield img, Detections([[i, i, i + 10, i + 10]], [0.5], [i % 3])
+
+
+def test_round_trip(tmp_path):
+    rec = Recorder(tmp_path / "run", codec="raw", chunk_frames=4)
+    for i, (img, det) in enumerate(frames(10)):
+        rec.write(img, det, t=float(i))
+    rec.close()
+    reader = RecordingReader(tmp_path / "run")
+    assert len(reader) == 10 and reader.meta["frames"] == 10
+    assert reader.fps == 1.0
+    np.testing.assert_array_equal(reader.frame(7), list(frames(10))[7][0])
+    dets = reader.detections()
+    assert len(dets) == 10 and dets[3].cls.tolist() == [0.0]
+
+
+def test_readable_without_close(tmp_path):
+    rec = Recorder(tmp_path / "run", chunk_frames=4)
+    for img, det in frames(6):
+        rec.write(img, det)
+    # The process dies here: no close(), meta still says frames=None
+    assert is_recording(tmp_path / "run")
+    reader = RecordingReader(tmp_path / "run")
+    assert len(reader) == 6 and len(reader.detections()) == 6
+    assert reader.frame(5).shape == (48, 64, 3)
+
+
+def test_torn_write_is_truncated(tmp_path):
+    rec = Recorder(tmp_path / "run", chunk_frames=8)
+    for img, det in frames(5):
+        rec.write(img, det)
+    chunk = tmp_path / "run" / "chunk_00000.bin"
+    chunk.write_bytes(chunk.read_bytes()[:-10])         # last frame's data half on disk
+    with (tmp_path / "run" / "dets.jsonl").open("a") as f:
+        f.write("[[1, 2")                               # and a partial detections line
+    reader = RecordingReader(tmp_path / "run")
+    assert len(reader) == 4 and len(reader.detections()) == 4
+
+
+def test_empty_recording_leaves_nothing(tmp_path):
+    Recorder(tmp_path / "run").close()
+    assert not (tmp_path / "run").exists()
+    (tmp_path / "old").mkdir()
+    (tmp_path / "old" / "meta.json").write_text(json.dumps({"frames": 0}))
+    assert not is_recording(tmp_path / "old")
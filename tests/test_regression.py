@@ -0,0 +1,44 @@
+from leafscan.core import Det
+from leafscan.regression import RegressionReport, Tolerances, check, diff_detections
+
+
+def test_identical_detections_match_exactly():
+    dets = [Det("apple_scab", 0.9, (0, 0, 50, 50)), Det("black_rot", 0.7, (60, 60, 90, 90))]
+    d = diff_detections(dets, list(dets))
+    assert (d["matched"], d["missing"], d["extra"], d["relabelled"]) == (2, 0, 0, 0)
+    assert d["ious"] == [1.0, 1.0] and d["drift"] == [0.0, 0.0]
+
+
+def test_missing_extra_and_relabelled():
+    ref = [Det("apple_scab", 0.9, (0, 0, 50, 50)),
+           Det("black_rot", 0.8, (100, 100, 150, 150)),
+           Det("apple_scab", 0.6, (200, 0, 240, 40))]
+    cand = [Det("apple_scab", 0.85, (2, 2, 50, 50)),           # matched, shifted
+            Det("cedar_apple_rust", 0.7, (100, 100, 150, 150)),  # relabelled
+            Det("healthy", 0.5, (300, 300, 330, 330))]         # extra
+    d = diff_detections(ref, cand)
+    assert (d["matched"], d["relabelled"], d["missing"], d["extra"]) == (1, 1, 1, 2)
+    assert sorted(d["lost_names"]) == ["apple_scab", "black_rot"]
+    assert sorted(d["gained_names"]) == ["cedar_apple_rust", "healthy"]
+    assert abs(d["drift"][0] - 0.05) < 1e-6
+
+
+def test_one_partner_per_box():
+    ref = [Det("apple_scab", 0.9, (0, 0, 50, 50))]
+    cand = [Det("apple_scab", 0.9, (0, 0, 50, 50)), Det("apple_scab", 0.8, (1, 1, 50, 50))]
+    d = diff_detections(ref, cand)
+    assert d["matched"] == 1 and d["extra"] == 1
+
+
+def test_check_applies_every_tolerance():
+    r = RegressionReport(images=10, current="a.pt", candidate="b.pt", reference=100,
+                         matched=95, missing=3, extra=1, relabelled=1, mean_iou=0.95,
+                         conf_drift=0.01,
+                         latency={"current": {"p50": 10.0, "p95": 20.0, "p99": 30.0},
+                                  "candidate": {"p50": 10.5, "p95": 30.0, "p99": 40.0}})
+    failures = check(r, Tolerances())
+    assert any(f.startswith("missing") for f in failures)
+    assert any(f.startswith("latency p95") for f in failures)
+    assert not any(f.startswith(("extra", "relabelled", "mean IoU", "latency p50"))
+                   for f in failures)
+    assert check(r, Tolerances(max_missing=0.05, max_p95_ratio=2.0)) == []
@@ -0,0 +1,62 @@
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from leafscan.report import LOG_DTYPE, TOP_K, DayStats, DetectionLog, aggregate
+
+
+def random_rows(rng, n, B=3, K=4):
+    recs = np.zeros(n, LOG_DTYPE)
+    recs["block"] = rng.integers(0, B, n)
+    recs["cls"] = rng.integers(0, K, n)
+    recs["conf"] = rng.uniform(0, 1, n)
+    recs["leaf_pct"] = np.where(rng.uniform(size=n) < 0.3, np.nan, rng.uniform(0, 80, n))
+    recs["thumb"] = np.where(rng.uniform(size=n) < 0.7, rng.integers(1, 10**9, n), 0)
+    return recs
+
+
+def assert_same(a: DayStats, b: DayStats):
+    assert a.rows == b.rows
+    np.testing.assert_array_equal(a.counts, b.counts)
+    np.testing.assert_allclose(a.conf_sum, b.conf_sum, rtol=1e-9)
+    np.testing.assert_array_equal(a.sev, b.sev)
+    np.testing.assert_array_equal(a.top_conf, b.top_conf)
+
+
+def test_aggregate_matches_a_python_count():
+    rng = np.random.default_rng(0)
+    recs = random_rows(rng, 500)
+    st = aggregate(recs, 3, 4)
+    counts = Counter(zip(recs["block"].tolist(), recs["cls"].tolist()))
+    for (b, k), n in counts.items():
+        assert st.counts[b, k] == n
+        m = (recs["block"] == b) & (recs["cls"] == k)
+        assert abs(st.conf_sum[b, k] - recs["conf"][m].sum()) < 1e-3
+        assert st.sev[b, k].sum() == n
+        top = np.sort(recs["conf"][m & (recs["thumb"] != 0)])[::-1][:TOP_K]
+        np.testing.assert_array_equal(st.top_conf[b, k, :len(top)], top)
+    assert st.sev[..., -1].sum() == np.isnan(recs["leaf_pct"]).sum()
+
+
+def test_merge_equals_aggregate_of_concatenation():
+    rng = np.random.default_rng(1)
+    a, b = random_rows(rng, 300, B=2, K=3), random_rows(rng, 200, B=3, K=4)
+    merged = aggregate(a, 2, 3).merge(aggregate(b, 3, 4))
+    assert_same(merged, aggregate(np.concatenate([a, b]), 3, 4))
+
+
+def test_day_stats_is_incremental(tmp_path):
+    log = DetectionLog(tmp_path)
+    t = datetime(2026, 5, 1, 12).timestamp()
+    log.append_many(dict(disease="apple_scab", conf=0.5 + i / 100, block="B1", t=t, thumb=i + 1)
+                    for i in range(10))
+    day = log.days()[0]
+    assert log.day_stats(day).rows == 10
+    log.append("black_rot", 0.9, "camera", "B2", leaf_pct=30.0, t=t)
+    st = log.day_stats(day)
+    assert st.rows == 11
+    assert_same(st, aggregate(np.fromfile(tmp_path / "days" / f"{day}.bin", LOG_DTYPE),
+                              len(log.blocks), len(log.classes)))
+    # A fresh log instance rebuilds from the cached npz plus the day file
+    assert_same(DetectionLog(tmp_path).day_stats(day), st)
@@ -0,0 +1,35 @@
+import cv2
+import numpy as np
+
+from leafscan.severity import measure_severity
+
+GREEN = (60, 160, 40)      # BGR healthy leaf
+NECROTIC = (20, 20, 20)    # dark centre, outside the foliage colour band
+
+
+def leaf_image(lesion_radius):
+    img = np.full((400, 400, 3), 245, np.uint8)                 # white background
+    cv2.circle(img, (200, 200), 150, GREEN, -1)
+    if lesion_radius:
+        cv2.circle(img, (200, 200), lesion_radius, NECROTIC, -1)
+    return img
+
+
+def test_healthy_leaf_has_no_lesion():
+    rep = measure_severity(leaf_image(0), [[100, 100, 300, 300]], [True])
+    assert len(rep.leaves) == 1 and rep.image_pct < 1.0
+
+
+def test_necrotic_centre_counts_as_leaf_area():
+    rep = measure_severity(leaf_image(50), [[100, 100, 300, 300]], [True])
+    assert len(rep.leaves) == 1
+    leaf = rep.leaves[0]
+    assert abs(leaf.area_px - np.pi * 150 ** 2) / (np.pi * 150 ** 2) < 0.05
+    expect = 100 * (50 / 150) ** 2                               # ≈ 11 %
+    assert abs(leaf.lesion_pct - expect) < 2.0
+    assert rep.det_pct(0) == leaf.lesion_pct
+
+
+def test_healthy_boxes_are_not_lesions():
+    rep = measure_severity(leaf_image(50), [[100, 100, 300, 300]], [False])
+    assert rep.image_pct == 0.0
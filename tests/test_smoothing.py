@@ -0,0 +1,44 @@
+from leafscan.core import Detections
+from leafscan.smoothing import TemporalSmoother
+
+NAMES = {0: "apple_scab", 1: "black_rot", 2: "healthy"}
+BOX = [100, 100, 200, 200]
+
+
+def frame(*dets):
+    """``frame((cls, conf, box), …)`` → Detections."""
+    return Detections([d[2] for d in dets], [d[1] for d in dets], [d[0] for d in dets])
+
+
+def test_reported_only_after_min_hits():
+    s = TemporalSmoother(NAMES, window=10, min_hits=3)
+    assert s.update(frame((0, 0.8, BOX))) == []
+    assert s.update(frame((0, 0.8, BOX))) == []
+    out = s.update(frame((0, 0.8, BOX)))
+    assert len(out) == 1 and out[0].name == "apple_scab" and out[0].hits == 3
+    assert abs(out[0].conf - 0.8) < 1e-5         # bias-corrected EMA of a constant
+
+
+def test_flicker_settles_on_the_majority_class():
+    s = TemporalSmoother(NAMES, window=15, min_hits=3)
+    for i in range(30):
+        cls = 1 if i % 4 == 0 else 0             # one frame in four says black rot
+        out = s.update(frame((cls, 0.7, [b + i % 3 for b in BOX])))
+    assert len(out) == 1 and out[0].name == "apple_scab"
+    assert len({t.id for t in s.stable()}) == 1  # jittered box stays one track
+
+
+def test_separate_leaves_and_expiry():
+    s = TemporalSmoother(NAMES, window=3, min_hits=1)
+    out = s.update(frame((0, 0.9, BOX), (2, 0.6, [400, 400, 500, 500])))
+    assert {t.name for t in out} == {"apple_scab", "healthy"}
+    for _ in range(4):
+        out = s.update(frame((2, 0.6, [400, 400, 500, 500])))
+    assert [t.name for t in out] == ["healthy"]  # unseen for > window frames: freed
+
+
+def test_track_table_is_bounded():
+    s = TemporalSmoother(NAMES, window=100, min_hits=1, max_tracks=4)
+    for i in range(20):
+        s.update(frame((0, 0.9, [i * 50, 0, i * 50 + 40, 40])))
+    assert len(s.stable()) <= 4
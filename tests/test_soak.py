@@ -0,0 +1,26 @@
+import numpy as np
+
+from leafscan.soak import slope_per_1k
+
+
+def test_flat_series_with_spikes_has_no_slope():
+    rng = np.random.default_rng(0)
+    frames = np.arange(0, 100_000, 500)
+    rss = 500_000 + rng.normal(0, 200, len(frames))
+    rss[::17] += 50_000                              # GC / allocator spikes
+    slope, ci = slope_per_1k(frames, rss)
+    assert abs(slope) <= ci
+    assert abs(slope) < 5
+
+
+def test_linear_growth_is_recovered():
+    rng = np.random.default_rng(1)
+    frames = np.arange(0, 100_000, 500)
+    rss = 500_000 + 0.2 * frames + rng.normal(0, 200, len(frames))   # 200 kB / 1k frames
+    slope, ci = slope_per_1k(frames, rss)
+    assert abs(slope - 200) < ci and slope - ci > 150
+
+
+def test_too_few_points_is_inconclusive():
+    assert slope_per_1k([0, 1000, 2000], [1, 2, 3]) == (0.0, float("inf"))
+    assert slope_per_1k([5] * 10, range(10))[1] == float("inf")
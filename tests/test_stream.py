@@ -0,0 +1,67 @@
+import json
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from leafscan.stream import FrameHub, StreamServer, viewer_html
+
+
+@pytest.fixture
+def server():
+    s = StreamServer(port=0, quality=70)
+    yield s
+    s.close()
+
+
+def get(server, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}{path}", timeout=10) as r:
+            return r.status, r.headers, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_frame_round_trip(server):
+    frame = np.full((48, 64, 3), 120, np.uint8)
+    dets = [{"display": "Black Rot", "conf": 0.91234, "box": (1, 2, 3, 4)}]
+    server.hub.publish("s1", frame, dets)
+    server.hub.publish("s1", frame, dets)
+    status, headers, body = get(server, "/frame/s1?after=0")
+    assert status == 200 and body[:2] == b"\xff\xd8"
+    assert headers["X-Seq"] == "2"
+    assert json.loads(headers["X-Detections"])[0]["conf"] == 0.912
+    stats = json.loads(get(server, "/stats/s1")[2])
+    assert stats["frames"] == 1 and stats["published"] == 2
+
+
+def test_bad_requests(server):
+    assert get(server, "/frame/s1?after=x")[0] == 400
+    assert get(server, "/nope")[0] == 404
+    assert get(server, "/other/s1")[0] == 404
+
+
+def test_quality_is_mutable(server):
+    frame = np.random.default_rng(0).integers(0, 255, (120, 160, 3), np.uint8)
+    server.hub.publish("q", frame)
+    big = len(get(server, "/frame/q?after=0")[2])
+    server.quality = 20
+    assert server.hub.quality == 20
+    server.hub.publish("q", frame)
+    assert len(get(server, "/frame/q?after=1")[2]) < big
+
+
+def test_next_times_out_without_a_newer_frame():
+    hub = FrameHub()
+    hub.publish("a", np.zeros((8, 8, 3), np.uint8))
+    assert hub.next("a", 0, timeout=0.01)[0] == 1
+    assert hub.next("a", 1, timeout=0.01) is None
+    hub.drop("a")
+    assert hub.next("a", 0, timeout=0.01) is None
+
+
+def test_viewer_follows_the_page_protocol():
+    html = viewer_html(8765, "abc")
+    assert "http://${" not in html and ".protocol" in html
+    assert "/frame/abc" in html
@@ -0,0 +1,78 @@
+import math
+import time
+
+import numpy as np
+
+from leafscan.survey import M_PER_DEG_LAT, SurveyStore, _ring, distance_m
+
+LAT0, LON0 = 44.5, 7.2
+
+
+def make_store(n=2000, seed=0, spread_m=400.0):
+    rng = np.random.default_rng(seed)
+    store = SurveyStore(cell_m=10.0)
+    m_lon = 111320.0 * math.cos(math.radians(LAT0))
+    dy, dx = rng.uniform(0, spread_m, (2, n))
+    rows = [{"lat": LAT0 + y / M_PER_DEG_LAT, "lon": LON0 + x / m_lon, "ts": 0.0,
+             "disease": ["Apple Scab", "Black Rot"][i % 2], "conf": 0.5,
+             "diseased": bool(i % 3), "image": f"{i}.jpg"}
+            for i, (x, y) in enumerate(zip(dx, dy))]
+    store.add(rows)
+    return store, rows
+
+
+def brute_nearest(store, rows, lat, lon, k):
+    x, y = store._project(lat, lon)
+    d = [math.hypot(*(np.subtract(store._project(r["lat"], r["lon"]), (x, y)))) for r in rows]
+    return sorted(d)[:k]
+
+
+def test_ring_is_the_square_border():
+    assert _ring(3, 4, 0) == [(3, 4)]
+    for r in (1, 2, 5):
+        cells = _ring(0, 0, r)
+        assert len(cells) == len(set(cells)) == 8 * r
+        assert all(max(abs(i), abs(j)) == r for i, j in cells)
+
+
+def test_nearest_matches_brute_force():
+    store, rows = make_store()
+    rng = np.random.default_rng(1)
+    for _ in range(30):
+        lat = LAT0 + rng.uniform(-100, 500) / M_PER_DEG_LAT
+        lon = LON0 + rng.uniform(-100, 500) / 80000
+        for k in (1, 5):
+            got = [r["dist_m"] for r in store.nearest(lat, lon, k)]
+            np.testing.assert_allclose(got, brute_nearest(store, rows, lat, lon, k), atol=1e-6)
+
+
+def test_far_query_is_fast_and_exact():
+    store, rows = make_store(500)
+    t0 = time.perf_counter()
+    got = store.nearest(LAT0 + 9.0, LON0 - 3.0, k=3)     # ~1000 km from the orchard
+    assert time.perf_counter() - t0 < 0.5
+    np.testing.assert_allclose([r["dist_m"] for r in got],
+                               brute_nearest(store, rows, LAT0 + 9.0, LON0 - 3.0, 3), rtol=1e-9)
+
+
+def test_query_bbox_and_heat_counts():
+    store, rows = make_store(800)
+    box = (LAT0 + 100 / M_PER_DEG_LAT, LON0 + 0.001, LAT0 + 250 / M_PER_DEG_LAT, LON0 + 0.003)
+    got = sorted(r["image"] for r in store.query_bbox(*box))
+    expect = sorted(r["image"] for r in rows if box[0] <= r["lat"] <= box[2]
+                    and box[1] <= r["lon"] <= box[3])
+    assert got == expect and got
+    assert sum(w for _, _, w in store.heat_cells(diseased_only=False)) == len(rows)
+    assert sum(w for _, _, w in store.heat_cells()) == sum(r["diseased"] for r in rows)
+
+
+def test_persisted_store_reloads(tmp_path):
+    path = tmp_path / "points.jsonl"
+    _, rows = make_store(50)
+    SurveyStore(path=path).add(rows)
+    again = SurveyStore(path=path)
+    assert len(again) == 50 and again.nearest(rows[7]["lat"], rows[7]["lon"])[0]["image"] == "7.jpg"
+
+
+def test_distance_m():
+    assert abs(distance_m(LAT0, LON0, LAT0 + 1 / M_PER_DEG_LAT * 3, LON0) - 3.0) < 1e-6
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from leafscan.tta import (IMG_SIZES, build_views, render_view, scale_ladder, tta_predict,
+                          unmap_boxes, weighted_box_fusion)
+
+LEAF = (60, 40, 140, 100)       # x1 y1 x2 y2 of the bright square
+
+
+class _Arr:
+    def __init__(self, a):
+        self.a = np.asarray(a, np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.a
+
+
+class _Result:
+    def __init__(self, box):
+        class Boxes:
+            xyxy, conf, cls = _Arr([box]), _Arr([0.8]), _Arr([0])
+
+            def __len__(self):
+                return 1
+        self.boxes = Boxes()
+
+
+class BrightSquareModel:
+    """Detects the bounding box of the white pixels in each view."""
+    names = {0: "black_rot"}
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, batch, **kwargs):
+        self.calls += 1
+        out = []
+        for img in batch:
+            ys, xs = np.nonzero(img[..., 0] == 255)
+            out.append(_Result((xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)))
+        return out
+
+
+def image():
+    img = np.zeros((160, 200, 3), np.uint8)
+    img[LEAF[1]:LEAF[3], LEAF[0]:LEAF[2]] = 255
+    return img
+
+
+def test_scale_ladder():
+    assert scale_ladder(640) == IMG_SIZES[IMG_SIZES.index(640) - 1:IMG_SIZES.index(640) + 2]
+    assert scale_ladder(IMG_SIZES[0])[0] == IMG_SIZES[0]
+
+
+@pytest.mark.parametrize("flips,multiscale", [(True, True), (True, False), (False, True)])
+def test_every_view_maps_back_to_the_original_box(flips, multiscale):
+    _, views = build_views(640, flips, multiscale)
+    assert views[0].hflip is False and views[0].vflip is False
+    model = BrightSquareModel()
+    for v, r in zip(views, model.predict([render_view(image(), v) for v in views])):
+        back = unmap_boxes(r.boxes.xyxy.numpy(), v, image().shape)[0]
+        np.testing.assert_allclose(back, LEAF, atol=2.0 / v.scale)
+
+
+def test_tta_predict_fuses_to_one_box_in_one_batch():
+    model = BrightSquareModel()
+    det, stats = tta_predict([model], image(), 0.25, 0.5, 640)
+    assert model.calls == 1 and stats["views"] == len(build_views(640)[1])
+    assert len(det) == 1
+    np.testing.assert_allclose(det.xyxy[0], LEAF, atol=3.0)
+    assert abs(det.conf[0] - 0.8) < 1e-5
+
+
+def test_wbf_downweights_boxes_few_views_agree_on():
+    xyxy = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], np.float32)
+    conf = np.array([0.9, 0.7, 0.8], np.float32)
+    det = weighted_box_fusion(xyxy, conf, np.zeros(3, np.int32), np.ones(3, np.float32), 2.0)
+    order = np.argsort(det.xyxy[:, 0])
+    np.testing.assert_allclose(det.conf[order], [0.8, 0.4], rtol=1e-6)
+    np.testing.assert_allclose(det.xyxy[order][0], [0.4375, 0.4375, 10.4375, 10.4375], rtol=1e-5)
+    assert len(weighted_box_fusion(xyxy, conf, np.array([0, 1, 0]), np.ones(3), 2.0)) == 3